@@ -1,12 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from pydantic import BaseModel
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+import asyncio
+import hmac
+import os
+import threading
+import time
+import uuid
 
-from db import get_db, User
+from db import get_db, User, Session as UserSession
+from revocation import revocations
+from sync import bus
+from throttle import login_ip_limiter, login_user_limiter, retry_header, stats as throttle_stats
 
 router = APIRouter()
 security = HTTPBearer()
@@ -15,8 +27,176 @@ SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 
+# Resolved principals kept per token so authenticated requests skip the users query
+PRINCIPAL_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))  # 0 disables the cache
+PRINCIPAL_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))  # seconds, capped by token expiry
+
+# bcrypt runs on its own threads (it releases the GIL); past workers + queue
+# limit, new logins get 503 at once instead of queueing behind an attack
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("AUTH_HASH_QUEUE", "16"))
+HASH_RETRY_AFTER = 1  # seconds, sent with 503
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+PRINCIPAL_FIELDS = ("id", "username", "role", "last_login", "created_at")
+
+class PrincipalCache:
+    """Bounded LRU of token -> user snapshot.
+
+    Entries are keyed by the token's signature segment and store the whole
+    token, which is compared on lookup, so a forged payload reusing a valid
+    signature never hits. An entry lives for PRINCIPAL_CACHE_TTL seconds or
+    until the token expires, whichever is sooner, and is dropped as soon as
+    the user is updated, deleted or kicked.
+    """
+
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # signature -> (token, snapshot, expires, jti)
+        self.by_username: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[Tuple[Dict, Optional[str]]]:
+        """(user snapshot, token jti) for a cached token, else None"""
+        if self.max_size <= 0:
+            return None
+        signature = token.rpartition(".")[2]
+        with self._lock:
+            entry = self.entries.get(signature)
+            if entry is not None:
+                cached_token, snapshot, expires, token_id = entry
+                if time.time() < expires and hmac.compare_digest(cached_token, token):
+                    self.entries.move_to_end(signature)
+                    self.hits += 1
+                    return snapshot, token_id
+                if cached_token == token:
+                    self._remove(signature)
+            self.misses += 1
+            return None
+
+    def put(self, token: str, user: User, token_expires: Optional[float], token_id: Optional[str] = None):
+        if self.max_size <= 0:
+            return
+        expires = time.time() + self.ttl
+        if token_expires is not None:
+            expires = min(expires, token_expires)
+        snapshot = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+        signature = token.rpartition(".")[2]
+        with self._lock:
+            self._remove(signature)
+            self.entries[signature] = (token, snapshot, expires, token_id)
+            self.by_username.setdefault(snapshot["username"], set()).add(signature)
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, signature: str):
+        entry = self.entries.pop(signature, None)
+        if entry is not None:
+            signatures = self.by_username.get(entry[1]["username"])
+            if signatures is not None:
+                signatures.discard(signature)
+                if not signatures:
+                    del self.by_username[entry[1]["username"]]
+
+    def invalidate_user(self, username: str):
+        """Forget every cached token of ``username``; the next request re-reads the user"""
+        with self._lock:
+            for signature in list(self.by_username.get(username, ())):
+                self._remove(signature)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.by_username.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations
+        }
+
+principal_cache = PrincipalCache()
+
+class HashPoolBusy(Exception):
+    pass
+
+class HashPool:
+    """Bounded worker pool for password hashing, off the event loop"""
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT, samples: int = 1024):
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.pending = 0  # running + waiting
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.peak_pending = 0
+        # Recent samples in seconds
+        self.queue_wait: deque = deque(maxlen=samples)
+        self.hash_time: deque = deque(maxlen=samples)
+
+    async def run(self, function: Callable, *args):
+        """Run ``function(*args)`` on the pool; raises HashPoolBusy when the queue is full"""
+        with self._lock:
+            if self.pending >= self.workers + self.queue_limit:
+                self.rejected += 1
+                raise HashPoolBusy()
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                finished = time.perf_counter()
+                self.queue_wait.append(started - submitted)
+                self.hash_time.append(finished - started)
+
+        try:
+            return await asyncio.wrap_future(self.executor.submit(job))
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    @staticmethod
+    def _summary(samples) -> Dict:
+        ordered = sorted(samples)
+        if not ordered:
+            return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+        return {
+            "p50_ms": ordered[len(ordered) // 2] * 1000,
+            "p99_ms": ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)] * 1000,
+            "max_ms": ordered[-1] * 1000
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait": self._summary(list(self.queue_wait)),
+            "hash_time": self._summary(list(self.hash_time))
+        }
+
+hash_pool = HashPool()
+
 class LoginRequest(BaseModel):
     username: str
     password: str
@@ -33,10 +213,31 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
-def create_access_token(data: dict):
+async def _on_hash_pool(function: Callable, *args):
+    try:
+        return await hash_pool.run(function, *args)
+    except HashPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password checks in progress, try again shortly",
+            headers={"Retry-After": str(HASH_RETRY_AFTER)},
+        )
+
+async def hash_password(password: str) -> str:
+    """get_password_hash for async handlers: runs on the hash pool, 503 when it is full"""
+    return await _on_hash_pool(get_password_hash, password)
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """verify_password for async handlers: runs on the hash pool, 503 when it is full"""
+    return await _on_hash_pool(verify_password, plain_password, hashed_password)
+
+def create_access_token(data: dict, expire: Optional[datetime] = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    if expire is None:
+        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    # Token id, so a single session can be revoked (see revocation.py)
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_token(token: str):
@@ -48,6 +249,13 @@ def decode_token(token: str):
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     token = credentials.credentials
+    cached = principal_cache.get(token)
+    if cached is not None:
+        snapshot, token_id = cached
+        if token_id is None or not revocations.is_revoked(token_id):
+            # A detached copy per request: nothing is shared between sessions
+            return User(**snapshot)
+
     payload = decode_token(token)
     
     if payload is None:
@@ -56,6 +264,13 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             detail="Invalid authentication credentials",
         )
     
+    token_id = payload.get("jti")
+    if token_id is not None and revocations.is_revoked(token_id):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+        )
+    
     username: str = payload.get("sub")
     if username is None:
         raise HTTPException(
@@ -70,22 +285,55 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             detail="User not found",
         )
     
+    principal_cache.put(token, user, payload.get("exp"), token_id)
     return user
 
+def revoke_sessions(db: Session, user_id: int) -> int:
+    """End every active session of a user and revoke its token at once; returns sessions ended"""
+    sessions = db.query(UserSession).filter(
+        UserSession.user_id == user_id,
+        UserSession.active == True
+    ).all()
+    now = datetime.utcnow()
+    for session in sessions:
+        session.active = False
+        session.ended_at = now
+    db.commit()
+    revocations.revoke(db, ((session.token_id, user_id, session.expires_at) for session in sessions), bus)
+    return len(sessions)
+
 @router.post("/login", response_model=TokenResponse)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, http_request: Request, db: Session = Depends(get_db)):
+    # Throttled before the users query and bcrypt: every IP, and failures per username
+    client_ip = http_request.client.host if http_request.client else "unknown"
+    wait = login_ip_limiter.acquire(client_ip) or login_user_limiter.retry_after(request.username)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers=retry_header(wait),
+        )
+    
     user = db.query(User).filter(User.username == request.username).first()
     
-    if not user or not verify_password(request.password, user.hashed_password):
+    if not user or not await check_password(request.password, user.hashed_password):
+        login_user_limiter.add(request.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
     
     user.last_login = datetime.utcnow()
+    # Each login is a session whose id is the token's jti, so it can be revoked
+    token_id = uuid.uuid4().hex
+    expires_at = user.last_login + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    db.add(UserSession(user_id=user.id, token_id=token_id, expires_at=expires_at))
     db.commit()
     
-    access_token = create_access_token(data={"sub": user.username, "role": user.role})
+    access_token = create_access_token(
+        data={"sub": user.username, "role": user.role, "jti": token_id},
+        expire=expires_at
+    )
     
     return {
         "access_token": access_token,
@@ -100,4 +348,13 @@ async def get_me(current_user: User = Depends(get_current_user)):
         "username": current_user.username,
         "role": current_user.role,
         "last_login": current_user.last_login
-    }
\ No newline at end of file
+    }
+
+@router.get("/stats")
+async def auth_stats(current_user: User = Depends(get_current_user)):
+    return {
+        "hash_pool": hash_pool.stats(),
+        "principal_cache": principal_cache.stats(),
+        "revocations": revocations.stats(),
+        "throttle": throttle_stats()
+    }
@@ -0,0 +1,349 @@
+"""Cross-process fan-out for the event bus.
+
+The EventBus and every ConnectionManager live in one process, so with
+``uvicorn --workers N`` an event published in one worker has to be relayed
+to the others before their sockets can see it. A backplane subscribes to
+the local bus, ships each event to its peers, and republishes what the peers
+send (excluding itself, so nothing bounces back).
+
+    SYNC_BACKPLANE=local   one process, nothing to relay (default)
+    SYNC_BACKPLANE=unix    workers on one host, through a Unix-socket broker
+    SYNC_BACKPLANE=redis   workers on several hosts, through Redis pub/sub
+
+The Unix broker is started by whichever worker takes its lock first and is
+re-elected if that worker goes away. It can also run on its own:
+
+    python backplane.py broker /tmp/network-control-sync.sock
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from typing import Dict, Optional, Set
+
+from sync import EventBus, Subscription, encode_frame
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional: only needed for SYNC_BACKPLANE=redis
+    aioredis = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKPLANE = os.getenv("SYNC_BACKPLANE", "local")
+BACKPLANE_SOCKET = os.getenv("SYNC_BACKPLANE_SOCKET", "/tmp/network-control-sync.sock")
+REDIS_URL = os.getenv("SYNC_REDIS_URL", "redis://localhost:6379/0")
+REDIS_CHANNEL = os.getenv("SYNC_REDIS_CHANNEL", "network-control:sync")
+OUTBOX_SIZE = 4096  # events held while the broker is unreachable
+RECONNECT_DELAY = 1.0
+PEER_BUFFER_LIMIT = 4 * 1024 * 1024  # bytes a broker peer may fall behind before it is dropped
+
+class Backplane:
+    """In-process default: a single worker has no peers, so nothing is relayed.
+
+    Subclasses implement ``_run`` (connect, then move frames both ways until
+    closed) and ``_send``. Frames are ``b"<node> <json>"``, so a process can
+    recognise and skip its own events when the transport echoes them.
+    """
+
+    kind = "local"
+
+    def __init__(self):
+        self.node = uuid.uuid4().hex[:12]
+        self.bus: Optional[EventBus] = None
+        self.subscription: Optional[Subscription] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.outbox: deque = deque()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+
+    async def start(self, event_bus: EventBus):
+        self.bus = event_bus
+        self.loop = asyncio.get_running_loop()
+        if self.kind == "local":
+            return
+        self.subscription = event_bus.subscribe(self._outbound)
+        self.task = self.loop.create_task(self._supervise())
+
+    async def close(self):
+        if self.subscription is not None:
+            self.bus.unsubscribe(self.subscription)
+            self.subscription = None
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self.connected = False
+
+    def _outbound(self, message: Dict):
+        """Bus handler: frame a local event for the peers without blocking the publisher"""
+        event = {key: value for key, value in message.items() if key != "seq"}
+        frame = f"{self.node} {encode_frame(event)}".encode()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._queue(frame)
+        else:
+            # Published from a worker thread
+            self.loop.call_soon_threadsafe(self._queue, frame)
+
+    def _queue(self, frame: bytes):
+        if len(self.outbox) >= OUTBOX_SIZE:
+            self.outbox.popleft()
+            self.dropped += 1
+        self.outbox.append(frame)
+        self.ready.set()
+
+    def _inbound(self, frame: bytes):
+        """Publish an event relayed from another process to this process's subscribers"""
+        node, _, payload = frame.partition(b" ")
+        if node.decode() == self.node or not payload:
+            return
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            self.errors += 1
+            return
+        self.received += 1
+        self.bus.publish(message, exclude=self.subscription)
+
+    async def _drain(self):
+        """Send queued frames until the transport fails"""
+        while True:
+            await self.ready.wait()
+            while self.outbox:
+                await self._send(self.outbox[0])
+                self.outbox.popleft()
+                self.sent += 1
+            self.ready.clear()
+
+    async def _supervise(self):
+        """Keep the transport up, reconnecting after failures"""
+        while True:
+            try:
+                await self._run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"{self.kind} backplane disconnected: {e}")
+            self.connected = False
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _run(self):
+        raise NotImplementedError
+
+    async def _send(self, frame: bytes):
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {
+            "kind": self.kind,
+            "node": self.node,
+            "connected": self.connected,
+            "sent": self.sent,
+            "received": self.received,
+            "queued": len(self.outbox),
+            "dropped": self.dropped,
+            "errors": self.errors
+        }
+
+class LocalBroker:
+    """Relays newline-delimited frames between the processes connected to a Unix socket"""
+
+    def __init__(self, path: str = BACKPLANE_SOCKET):
+        self.path = path
+        self.peers: Set[asyncio.StreamWriter] = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.handlers: Set[asyncio.Task] = set()
+        self.relayed = 0
+        self.evicted = 0
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left behind by a broker that died
+        self.server = await asyncio.start_unix_server(self._serve, path=self.path, limit=PEER_BUFFER_LIMIT)
+        logger.info(f"Sync broker listening on {self.path}")
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            for peer in list(self.peers):
+                peer.close()
+            # Closed peers read EOF, so the handlers finish on their own
+            await asyncio.gather(*self.handlers, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.peers.add(writer)
+        self.handlers.add(asyncio.current_task())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for peer in list(self.peers):
+                    if peer is writer:
+                        continue
+                    if peer.transport.get_write_buffer_size() > PEER_BUFFER_LIMIT:
+                        # A stuck worker must not grow the broker without bound
+                        self.evicted += 1
+                        self.peers.discard(peer)
+                        peer.close()
+                        continue
+                    peer.write(line)
+                self.relayed += 1
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self.peers.discard(writer)
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    def stats(self) -> Dict:
+        return {"peers": len(self.peers), "relayed": self.relayed, "evicted": self.evicted}
+
+class UnixSocketBackplane(Backplane):
+    """Relay through a broker on a Unix socket, hosted by whichever worker holds its lock"""
+
+    kind = "unix"
+
+    def __init__(self, path: str = BACKPLANE_SOCKET):
+        super().__init__()
+        self.path = path
+        self.broker: Optional[LocalBroker] = None
+        self.lock_file = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def _elect(self):
+        """Host the broker if no other process does"""
+        if self.broker is not None:
+            return
+        import fcntl  # POSIX only, like the unix socket itself
+
+        lock_file = open(self.path + ".lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return
+        self.lock_file = lock_file
+        self.broker = LocalBroker(self.path)
+        await self.broker.start()
+
+    async def _run(self):
+        await self._elect()
+        reader, self.writer = await asyncio.open_unix_connection(self.path, limit=PEER_BUFFER_LIMIT)
+        self.connected = True
+        drain = self.loop.create_task(self._drain())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise ConnectionError("broker closed the connection")
+                self._inbound(line.rstrip(b"\n"))
+        finally:
+            drain.cancel()
+            self.writer.close()
+            self.writer = None
+
+    async def _send(self, frame: bytes):
+        self.writer.write(frame + b"\n")
+        await self.writer.drain()
+
+    async def close(self):
+        await super().close()
+        if self.broker is not None:
+            await self.broker.close()
+            self.broker = None
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def stats(self) -> Dict:
+        stats = {**super().stats(), "path": self.path}
+        if self.broker is not None:
+            stats["broker"] = self.broker.stats()
+        return stats
+
+class RedisBackplane(Backplane):
+    """Relay through Redis pub/sub.
+
+    ``client`` may be any object with redis.asyncio's ``publish`` and
+    ``pubsub`` methods, so a local stand-in can take Redis's place.
+    """
+
+    kind = "redis"
+
+    def __init__(self, url: str = REDIS_URL, channel: str = REDIS_CHANNEL, client=None):
+        super().__init__()
+        if client is None:
+            if aioredis is None:
+                raise RuntimeError("SYNC_BACKPLANE=redis requires the redis package")
+            client = aioredis.from_url(url)
+        self.client = client
+        self.channel = channel
+
+    async def _run(self):
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        self.connected = True
+        drain = self.loop.create_task(self._drain())
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    data = message["data"]
+                    self._inbound(data if isinstance(data, bytes) else data.encode())
+        finally:
+            drain.cancel()
+            await pubsub.unsubscribe(self.channel)
+
+    async def _send(self, frame: bytes):
+        await self.client.publish(self.channel, frame)
+
+def create_backplane(kind: str = BACKPLANE) -> Backplane:
+    if kind == "unix" and os.name == "nt":
+        logger.warning("SYNC_BACKPLANE=unix needs Unix domain sockets, using local")
+        kind = "local"
+    if kind == "unix":
+        return UnixSocketBackplane()
+    if kind == "redis":
+        return RedisBackplane()
+    if kind != "local":
+        logger.warning(f"Unknown SYNC_BACKPLANE {kind!r}, using local")
+    return Backplane()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the sync broker for SYNC_BACKPLANE=unix")
+    sub = parser.add_subparsers(dest="command", required=True)
+    broker = sub.add_parser("broker")
+    broker.add_argument("path", nargs="?", default=BACKPLANE_SOCKET)
+    args = parser.parse_args()
+
+    async def serve():
+        import fcntl
+
+        lock_file = open(args.path + ".lock", "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        await LocalBroker(args.path).start()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+if __name__ == "__main__":
+    main()
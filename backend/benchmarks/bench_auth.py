@@ -0,0 +1,82 @@
+"""Measure per-request authentication overhead with and without the principal cache.
+
+Runs against a throwaway database seeded with ``--users`` accounts. The
+first table times ``auth.get_current_user`` on its own (JWT decode plus the
+users query, or a cache hit); the second times a full ``GET /api/auth/me``
+through the app, as a dashboard poll would.
+
+    python benchmarks/bench_auth.py --users 50 --requests 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND)
+
+def timed(function, count: int) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    # The app opens ./network.db: give it a throwaway one
+    os.chdir(tempfile.mkdtemp(prefix="bench-auth-"))
+    from fastapi.security import HTTPAuthorizationCredentials
+    from fastapi.testclient import TestClient
+
+    import auth
+    from db import SessionLocal, User, init_db
+    from main import app
+
+    init_db()
+    db = SessionLocal()
+    for i in range(args.users):
+        db.add(User(username=f"bench-{i}", hashed_password="x", role="admin"))
+    db.commit()
+    db.close()
+    tokens = [auth.create_access_token({"sub": f"bench-{i}", "role": "admin"}) for i in range(args.users)]
+    credentials = [HTTPAuthorizationCredentials(scheme="Bearer", credentials=token) for token in tokens]
+
+    calls = iter(range(10 ** 9))
+
+    def resolve():
+        session = SessionLocal()
+        try:
+            auth.get_current_user(credentials[next(calls) % len(credentials)], session)
+        finally:
+            session.close()
+
+    with TestClient(app) as client:
+        headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+
+        def request():
+            response = client.get("/api/auth/me", headers=headers[next(calls) % len(headers)])
+            assert response.status_code == 200
+
+        results = {}
+        for label, size in (("uncached", 0), ("cached", auth.PRINCIPAL_CACHE_SIZE)):
+            auth.principal_cache.max_size = size
+            auth.principal_cache.clear()
+            for function in (resolve, request):
+                function()  # warm up (and fill the cache)
+            results[label] = (timed(resolve, args.requests), timed(request, args.requests // 4))
+
+    print(f"{args.users} users, {args.requests} lookups; cache {auth.principal_cache.stats()}")
+    print(f"{'':>10} {'get_current_user':>17} {'GET /api/auth/me':>17}")
+    for label, (resolve_us, request_us) in results.items():
+        print(f"{label:>10} {resolve_us:>15.1f}us {request_us:>15.1f}us")
+    uncached, cached = results["uncached"], results["cached"]
+    print(f"{'speedup':>10} {uncached[0] / cached[0]:>16.1f}x {uncached[1] / cached[1]:>16.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Measure WebSocket fan-out spread over worker processes through the Unix backplane.
+
+The same total number of in-memory clients is served by one process, then
+split across ``--workers`` processes that are joined by a UnixSocketBackplane.
+A publisher process emits ``--events`` device updates; the benchmark reports
+the time until every client in every worker has all of them.
+
+    python benchmarks/bench_backplane.py --clients 2000 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backplane import UnixSocketBackplane
+from sync import ConnectionManager, EventBus
+
+SOCKET_PATH = "/tmp/network-control-bench.sock"
+
+class CountingSocket:
+    def __init__(self, expected: int, done: asyncio.Event, remaining: list):
+        self.expected = expected
+        self.done = done
+        self.remaining = remaining
+        self.messages = 0
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_text(self, frame):
+        self.messages += 1
+        if self.messages == self.expected:
+            self.remaining[0] -= 1
+            if not self.remaining[0]:
+                self.done.set()
+
+async def serve(clients: int, events: int, bus: EventBus) -> asyncio.Event:
+    """Attach ``clients`` sockets to a manager on ``bus``; the event is set once all got every event"""
+    manager = ConnectionManager(max_queue=events + 2, window=0)
+    manager.attach(bus)
+    done, remaining = asyncio.Event(), [clients]
+    for _ in range(clients):
+        # sync_hello plus one frame per event
+        await manager.connect(CountingSocket(events + 1, done, remaining))
+    return done
+
+async def run_worker(clients: int, events: int, ready, results):
+    bus = EventBus()
+    done = await serve(clients, events, bus)
+    backplane = UnixSocketBackplane(SOCKET_PATH)
+    await backplane.start(bus)
+    while not backplane.connected:
+        await asyncio.sleep(0.01)
+    ready.release()
+    await done.wait()
+    results.put(time.perf_counter())
+    await backplane.close()
+
+def worker(clients: int, events: int, ready, results):
+    asyncio.run(run_worker(clients, events, ready, results))
+
+async def single_process(clients: int, events: int) -> float:
+    bus = EventBus()
+    done = await serve(clients, events, bus)
+    start = time.perf_counter()
+    for i in range(events):
+        bus.publish({"type": "device_updated", "device_id": i, "status": "active"})
+    await done.wait()
+    return time.perf_counter() - start
+
+async def multi_process(clients: int, events: int, workers: int) -> float:
+    context = multiprocessing.get_context("fork")
+    ready, results = context.Semaphore(0), context.Queue()
+    bus = EventBus()
+    # The publisher starts first, so it hosts the broker
+    backplane = UnixSocketBackplane(SOCKET_PATH)
+    await backplane.start(bus)
+    while not backplane.connected:
+        await asyncio.sleep(0.01)
+
+    processes = [
+        context.Process(target=worker, args=(clients // workers, events, ready, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        while not ready.acquire(block=False):
+            await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    for i in range(events):
+        bus.publish({"type": "device_updated", "device_id": i, "status": "active"})
+    finished = []
+    for _ in processes:
+        while results.empty():
+            await asyncio.sleep(0.001)
+        finished.append(results.get())
+    for process in processes:
+        process.join()
+    await backplane.close()
+    return max(finished) - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2000, help="total clients")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    deliveries = args.clients * args.events
+    elapsed = asyncio.run(single_process(args.clients, args.events))
+    print(f"{args.clients} clients x {args.events} events, {os.cpu_count()} CPUs")
+    print(f"{'setup':>22} {'elapsed':>9} {'deliveries/sec':>15}")
+    print(f"{'single process':>22} {elapsed:>8.2f}s {deliveries / elapsed:>15,.0f}")
+    for workers in args.workers:
+        elapsed = asyncio.run(multi_process(args.clients, args.events, workers))
+        print(f"{f'{workers} workers + broker':>22} {elapsed:>8.2f}s {deliveries / elapsed:>15,.0f}")
+
+if __name__ == "__main__":
+    main()
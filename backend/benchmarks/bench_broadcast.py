@@ -0,0 +1,159 @@
+"""Measure WebSocket broadcast latency as the number of dashboard clients grows.
+
+Clients are in-memory stand-ins for Starlette WebSockets whose send_json
+takes ``--send-latency`` seconds; one of them is stalled for ``--stall``
+seconds per message, like a frozen browser tab. For each client count the
+benchmark reports how long the publisher is held up by one broadcast with
+the old sequential await-every-socket loop and with ConnectionManager's
+per-client queues, plus the time until every healthy client has the event.
+A second table compares json-encoding a scan-sized event for every client
+against encoding it once, and a third sends a burst of device updates with
+and without the micro-batching window.
+
+    python benchmarks/bench_broadcast.py --clients 1 10 100 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sync import ConnectionManager, encode_frame, entity_upsert
+
+class FakeWebSocket:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.received = asyncio.Event()
+        self.messages = 0
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_json(self, message):
+        # Starlette's send_json encodes for every socket
+        await self.send_text(json.dumps(message))
+
+    async def send_text(self, frame):
+        await asyncio.sleep(self.latency)
+        self.messages += 1
+        self.received.set()
+
+async def sequential_broadcast(sockets, message):
+    """The pre-queue ConnectionManager.broadcast loop"""
+    for socket in sockets:
+        await socket.send_json(message)
+
+def scan_payload(hosts: int):
+    """A scan_complete-sized event carrying ``hosts`` device records"""
+    return {
+        "type": "scan_complete",
+        "job_id": "bench",
+        "devices": [
+            {"ip": f"10.0.{i >> 8}.{i & 255}", "mac": f"02:00:00:00:{i >> 8:02x}:{i & 255:02x}", "hostname": f"host-{i}"}
+            for i in range(hosts)
+        ]
+    }
+
+def encode_cost(clients: int, message, rounds: int = 5):
+    """Seconds per broadcast spent serializing: per client vs once"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _ in range(clients):
+            json.dumps(message)
+    per_client = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode_frame(message)
+    once = (time.perf_counter() - start) / rounds
+    return per_client, once
+
+async def run(clients: int, send_latency: float, stall: float, rounds: int):
+    sockets = [FakeWebSocket(send_latency) for _ in range(clients - 1)] + [FakeWebSocket(stall)]
+    healthy = sockets[:-1]
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        await sequential_broadcast(sockets, {"type": "device_updated", "device_id": i})
+    sequential = (time.perf_counter() - start) / rounds
+
+    manager = ConnectionManager(max_queue=rounds + 1, window=0)
+    for socket in sockets:
+        await manager.connect(socket)
+    publish = 0.0
+    start = time.perf_counter()
+    for i in range(rounds):
+        for socket in healthy:
+            socket.received.clear()
+        t = time.perf_counter()
+        await manager.broadcast({"type": "device_updated", "device_id": i})
+        publish += time.perf_counter() - t
+        await asyncio.gather(*(socket.received.wait() for socket in healthy))
+    delivered = (time.perf_counter() - start) / rounds
+    stats = manager.stats()
+    await manager.close()
+    return sequential, publish / rounds, delivered, stats
+
+async def burst(clients: int, events: int, devices: int, window: float):
+    """Publish ``events`` updates spread over ``devices`` devices; return frames and bytes sent"""
+    sockets = [FakeWebSocket(0) for _ in range(clients)]
+    manager = ConnectionManager(max_queue=events + 2, window=window)
+    for socket in sockets:
+        await manager.connect(socket)
+    await asyncio.sleep(0.01)
+    before = manager.stats()["outbound"]
+    for i in range(events):
+        device = {"id": i % devices, "status": "active", "hostname": f"host-{i % devices}", "seq": i}
+        await manager.broadcast({
+            "type": "device_updated",
+            "device_id": device["id"],
+            "changes": [entity_upsert("device", device)]
+        })
+    await asyncio.sleep(window + 0.01)
+    while manager.stats()["queued"]:
+        await asyncio.sleep(0.01)
+    after = manager.stats()["outbound"]
+    await manager.close()
+    return after["frames"] - before["frames"], after["bytes"] - before["bytes"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--send-latency", type=float, default=0.0005)
+    parser.add_argument("--stall", type=float, default=0.25)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--payload-hosts", type=int, default=250)
+    parser.add_argument("--burst", type=int, default=500, help="events per burst")
+    parser.add_argument("--burst-devices", type=int, default=50)
+    parser.add_argument("--window", type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'sequential':>12} {'publish':>10} {'all healthy':>12} {'max depth':>10}")
+    for clients in args.clients:
+        sequential, publish, delivered, stats = asyncio.run(
+            run(clients, args.send_latency, args.stall, args.rounds)
+        )
+        print(f"{clients:>8} {sequential * 1000:>10.1f}ms {publish * 1e6:>8.1f}us "
+              f"{delivered * 1000:>10.1f}ms {stats['max_queue_depth']:>10}")
+
+    message = scan_payload(args.payload_hosts)
+    print(f"\nserialization per broadcast ({len(encode_frame(message))} byte frame)")
+    print(f"{'clients':>8} {'per client':>12} {'encode once':>12}")
+    for clients in args.clients:
+        per_client, once = encode_cost(clients, message)
+        print(f"{clients:>8} {per_client * 1000:>10.2f}ms {once * 1000:>10.3f}ms")
+
+    print(f"\nburst of {args.burst} updates over {args.burst_devices} devices")
+    print(f"{'clients':>8} {'frames':>10} {'bytes':>12} {'batched frames':>15} {'batched bytes':>14}")
+    for clients in args.clients:
+        frames, size = asyncio.run(burst(clients, args.burst, args.burst_devices, 0))
+        batched_frames, batched_size = asyncio.run(burst(clients, args.burst, args.burst_devices, args.window))
+        print(f"{clients:>8} {frames:>10} {size:>12,} {batched_frames:>15} {batched_size:>14,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Measure TCP connect-probe throughput against a local listener farm.
+
+Half of the probed loopback addresses run a listener (SYN-ACK path), the
+other half refuse the connection (RST path); both count as alive. A
+``--filtered`` fraction of addresses get a listener whose accept queue is
+full, so SYNs are silently dropped like a firewalled host. The asyncio
+ConnectProber is compared with a 50-thread blocking connect pool, both
+with a 1 second budget for silent hosts.
+
+    python benchmarks/bench_connect.py --hosts 2000 --filtered 0.1
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scanner import ConnectProber
+
+PORT = 18765
+
+def loopback(i: int) -> str:
+    return f"127.1.{(i >> 8) & 255}.{i & 255}"
+
+def listen(ip: str, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((ip, PORT))
+    sock.listen(backlog)
+    return sock
+
+def start_farm(hosts: int, filtered: int):
+    """Return (sockets to close, addresses that should answer)"""
+    sockets = []
+    for i in range(filtered, hosts, 2):
+        sockets.append(listen(loopback(i), 1024))
+    for i in range(filtered):
+        sockets.append(listen(loopback(i), 0))
+        # Fill the accept queue so further SYNs are dropped
+        for _ in range(2):
+            filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            filler.setblocking(False)
+            filler.connect_ex((loopback(i), PORT))
+            sockets.append(filler)
+    return sockets, hosts - filtered
+
+def blocking_probe(ip: str) -> bool:
+    try:
+        socket.create_connection((ip, PORT), timeout=1).close()
+        return True
+    except ConnectionRefusedError:
+        return True
+    except OSError:
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=2000)
+    parser.add_argument("--filtered", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=512)
+    args = parser.parse_args()
+
+    filtered = int(args.hosts * args.filtered)
+    sockets, expected = start_farm(args.hosts, filtered)
+    targets = [loopback(i) for i in range(args.hosts)]
+    try:
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=50) as pool:
+            threaded = sum(pool.map(blocking_probe, targets))
+        threaded_elapsed = time.perf_counter() - start
+
+        prober = ConnectProber(tcp_ports=(PORT,), concurrency=args.concurrency)
+        start = time.perf_counter()
+        alive = asyncio.run(prober.scan(targets, deadline=1.0))
+        async_elapsed = time.perf_counter() - start
+    finally:
+        for sock in sockets:
+            sock.close()
+
+    print(f"hosts={args.hosts} filtered={filtered} expected_alive={expected}")
+    print(f"thread pool (50 workers):  {threaded_elapsed:6.2f}s alive={threaded} "
+          f"({args.hosts / threaded_elapsed:,.0f} probes/sec)")
+    print(f"ConnectProber ({args.concurrency} sockets): {async_elapsed:6.2f}s alive={len(alive)} "
+          f"({args.hosts / async_elapsed:,.0f} probes/sec)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Compare concurrent API throughput with sync and async database sessions.
+
+The app is served by uvicorn on a loopback port (throwaway database seeded
+with ``--devices`` devices and ``--alerts`` alerts). Next to the real routes,
+which use ``get_async_db``, the benchmark mounts copies of the old handlers
+under ``/legacy``: the same queries through the synchronous ``SessionLocal``
+inside ``async def``, so every query blocks the event loop. For each route,
+``--concurrency`` clients in a separate process send requests back to back
+for ``--duration`` seconds while a probe polls ``/health`` every 10ms; the
+probe's latency is what any other request (or WebSocket) sees meanwhile.
+
+Past 15 concurrent requests (the sync engine's pool of 5 + 10 overflow) the
+sync handlers deadlock: a handler waiting for a pooled connection blocks the
+loop that would return one, until the 30s pool timeout, and the next waiter
+does the same. Requests still unanswered ``--duration`` + 5s in count as
+errors. The async session waits for the pool without blocking the loop, so
+async routes are measured first, before a stalled server can skew them.
+
+    python benchmarks/bench_db.py --concurrency 8 --duration 5
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench_sync import ServerThread, free_port, percentiles
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND)
+
+ROUTES = [
+    ("devices", "/api/devices/?limit=100"),
+    ("alerts", "/api/alerts/?limit=50"),
+    ("alert stats", "/api/alerts/stats"),
+    ("firewall logs", "/api/firewall/logs?limit=50"),
+]
+
+# ---- old handlers, for the "before" numbers ----
+
+def legacy_router():
+    from typing import List
+
+    from fastapi import APIRouter, Depends
+    from sqlalchemy.orm import Session
+
+    from auth import get_current_user
+    from db import Alert, Device, FirewallLog, get_db
+    from routers.alerts import AlertResponse
+    from routers.devices import DeviceResponse
+    from routers.firewall import FirewallLogResponse
+
+    router = APIRouter()
+
+    @router.get("/api/devices/", response_model=List[DeviceResponse])
+    async def devices(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), user=Depends(get_current_user)):
+        return db.query(Device).offset(skip).limit(limit).all()
+
+    @router.get("/api/alerts/", response_model=List[AlertResponse])
+    async def alerts(skip: int = 0, limit: int = 50, db: Session = Depends(get_db), user=Depends(get_current_user)):
+        return db.query(Alert).order_by(Alert.timestamp.desc()).offset(skip).limit(limit).all()
+
+    @router.get("/api/alerts/stats")
+    async def alert_stats(db: Session = Depends(get_db), user=Depends(get_current_user)):
+        return {
+            "total": db.query(Alert).count(),
+            "unread": db.query(Alert).filter(Alert.read == False).count(),
+            "by_level": {
+                "info": db.query(Alert).filter(Alert.level == "info").count(),
+                "warning": db.query(Alert).filter(Alert.level == "warning").count(),
+                "danger": db.query(Alert).filter(Alert.level == "danger").count()
+            }
+        }
+
+    @router.get("/api/firewall/logs", response_model=List[FirewallLogResponse])
+    async def firewall_logs(skip: int = 0, limit: int = 50, db: Session = Depends(get_db), user=Depends(get_current_user)):
+        return db.query(FirewallLog).order_by(FirewallLog.timestamp.desc()).offset(skip).limit(limit).all()
+
+    return router
+
+def seed(devices: int, alerts: int):
+    from db import Alert, Device, FirewallLog, SessionLocal
+
+    now = datetime.utcnow()
+    db = SessionLocal()
+    db.add_all(
+        Device(mac=f"02:00:00:00:{i >> 8:02x}:{i & 255:02x}", ip=f"10.0.{i >> 8}.{i & 255}", hostname=f"host-{i}")
+        for i in range(devices)
+    )
+    db.add_all(
+        Alert(message=f"bench alert {i}", level=("info", "warning", "danger")[i % 3],
+              timestamp=now - timedelta(seconds=i), read=i % 2 == 0)
+        for i in range(alerts)
+    )
+    db.add_all(
+        FirewallLog(action="block", target_ip=f"10.0.0.{i & 255}", admin="admin",
+                    timestamp=now - timedelta(seconds=i), success=True, details="ok")
+        for i in range(alerts // 4)
+    )
+    db.commit()
+    db.close()
+
+# ---- clients (child process) ----
+
+async def load(base: str, path: str, token: str, concurrency: int, duration: float):
+    import httpx
+
+    latencies, probe, errors = [], [], [0]
+    deadline = time.perf_counter() + duration
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=concurrency + 1)
+
+    async with httpx.AsyncClient(base_url=base, headers=headers, limits=limits, timeout=duration + 5) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                except httpx.TimeoutException:
+                    errors[0] += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors[0] += 1
+
+        async def health():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    await client.get("/health")
+                except httpx.TimeoutException:
+                    pass
+                probe.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.01)
+
+        start = time.perf_counter()
+        await asyncio.gather(health(), *(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests_per_sec": len(latencies) / elapsed,
+        "latency_ms": percentiles(latencies),
+        "health_ms": percentiles(probe),
+        "errors": errors[0]
+    }
+
+def client_process(base: str, path: str, token: str, concurrency: int, duration: float, pipe):
+    pipe.send(asyncio.run(load(base, path, token, concurrency, duration)))
+
+# ---- server (this process) ----
+
+def run(base: str, path: str, token: str, args) -> dict:
+    parent, child = multiprocessing.Pipe()
+    worker = multiprocessing.get_context("spawn").Process(
+        target=client_process,
+        args=(base, path, token, args.concurrency, args.duration, child)
+    )
+    worker.start()
+    result = parent.recv()
+    worker.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--alerts", type=int, default=20000)
+    args = parser.parse_args()
+
+    # The app opens ./network.db: give it a throwaway one
+    os.chdir(tempfile.mkdtemp(prefix="bench-db-"))
+    import auth
+    from db import init_db
+    from main import app
+
+    init_db()
+    seed(args.devices, args.alerts)
+    app.include_router(legacy_router(), prefix="/legacy")
+    token = auth.create_access_token({"sub": "admin", "role": "admin"})
+
+    port = free_port()
+    server = ServerThread(app, port)
+    server.start()
+    while not server.server.started:
+        time.sleep(0.05)
+    base = f"http://127.0.0.1:{port}"
+
+    print(f"{args.concurrency} concurrent clients, {args.duration:g}s per run, {os.cpu_count()} CPUs")
+    print(f"{'route':>14} {'session':>8} {'req/s':>8} {'p50':>9} {'p99':>9} {'/health p99':>12} {'errors':>7}")
+    for session, prefix in (("async", ""), ("sync", "/legacy")):
+        for label, path in ROUTES:
+            result = run(base, prefix + path, token, args)
+            print(f"{label:>14} {session:>8} {result['requests_per_sec']:>8,.0f} "
+                  f"{result['latency_ms']['p50'] or 0:>7.1f}ms {result['latency_ms']['p99'] or 0:>7.1f}ms "
+                  f"{result['health_ms']['p99'] or 0:>10.1f}ms {result['errors']:>7}")
+
+    server.server.should_exit = True
+    server.join(timeout=10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Measure event-loop stalls during a burst of password checks.
+
+``--burst`` concurrent logins each verify a bcrypt hash, either inline on
+the event loop (the old login handler) or through auth.HashPool. A 10ms
+heartbeat task records how late the loop wakes up, which is what every
+WebSocket and API request on the same loop experiences. Checks the pool
+rejects (queue full) are counted along with how quickly they were answered.
+
+    python benchmarks/bench_hash.py --burst 40 --workers 4 --queue 16
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from auth import HashPool, HashPoolBusy, get_password_hash, verify_password
+
+async def heartbeat(lag: list, interval: float = 0.01):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag.append(time.perf_counter() - start - interval)
+
+async def run(burst: int, hashed: str, pool: HashPool = None):
+    lag, rejections = [], []
+    beat = asyncio.create_task(heartbeat(lag))
+    await asyncio.sleep(0.05)
+
+    async def login():
+        start = time.perf_counter()
+        if pool is None:
+            verify_password("admin123", hashed)
+            return True
+        try:
+            return await pool.run(verify_password, "admin123", hashed)
+        except HashPoolBusy:
+            rejections.append(time.perf_counter() - start)
+            return False
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(burst)))
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.05)  # let the heartbeat record the last stall
+    beat.cancel()
+    return {
+        "elapsed": elapsed,
+        "verified": sum(results),
+        "rejected": len(rejections),
+        "reject_ms": max(rejections, default=0) * 1000,
+        "lag_max_ms": max(lag, default=0) * 1000
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=16)
+    args = parser.parse_args()
+
+    hashed = get_password_hash("admin123")
+    print(f"burst of {args.burst} logins, {os.cpu_count()} CPUs")
+    print(f"{'mode':>24} {'elapsed':>8} {'verified':>9} {'rejected':>9} {'reject in':>10} {'max loop lag':>13}")
+    modes = [
+        ("inline on the loop", None),
+        (f"pool {args.workers}w, unbounded", HashPool(args.workers, args.burst)),
+        (f"pool {args.workers}w, queue {args.queue}", HashPool(args.workers, args.queue)),
+    ]
+    for label, pool in modes:
+        result = asyncio.run(run(args.burst, hashed, pool))
+        print(f"{label:>24} {result['elapsed']:>7.2f}s {result['verified']:>9} {result['rejected']:>9} "
+              f"{result['reject_ms']:>8.2f}ms {result['lag_max_ms']:>11.1f}ms")
+        if pool is not None:
+            stats = pool.stats()
+            print(f"{'':>24} queue wait p99 {stats['queue_wait']['p99_ms']:.0f}ms, "
+                  f"hash p50 {stats['hash_time']['p50_ms']:.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Measure passive discovery parser throughput on a synthetic capture.
+
+Builds a pcap with a mix of ARP, DHCP, mDNS and unrelated TCP frames from
+``--devices`` distinct hosts, then replays it through ``parse_frame`` and
+through ``PassiveDiscovery`` (with a no-op reconcile).
+
+    python benchmarks/bench_passive.py --packets 200000
+"""
+import argparse
+import os
+import socket
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from passive import PassiveDiscovery, iter_pcap, parse_frame
+
+BROADCAST = b"\xff" * 6
+
+def mac_bytes(i: int) -> bytes:
+    return bytes([0x02, 0, 0, (i >> 16) & 255, (i >> 8) & 255, i & 255])
+
+def ip_bytes(i: int) -> bytes:
+    return socket.inet_aton(f"10.0.{(i >> 8) & 255}.{i & 255}")
+
+def ipv4_udp(src_mac: bytes, src_ip: bytes, dst_ip: bytes, sport: int, dport: int, payload: bytes) -> bytes:
+    udp = struct.pack("!HHHH", sport, dport, 8 + len(payload), 0) + payload
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(udp), 0, 0, 64, 17, 0, src_ip, dst_ip) + udp
+    return BROADCAST + src_mac + b"\x08\x00" + ip
+
+def arp_frame(i: int) -> bytes:
+    arp = struct.pack("!HHBBH6s4s6s4s", 1, 0x0800, 6, 4, 1, mac_bytes(i), ip_bytes(i), b"\x00" * 6, ip_bytes(1))
+    return BROADCAST + mac_bytes(i) + b"\x08\x06" + arp
+
+def dhcp_frame(i: int) -> bytes:
+    name = f"host-{i}".encode()
+    bootp = struct.pack("!BBBBIHH4s4s4s4s16s64s128s", 1, 1, 6, 0, i, 0, 0,
+                        b"\x00" * 4, b"\x00" * 4, b"\x00" * 4, b"\x00" * 4,
+                        mac_bytes(i), b"", b"")
+    options = b"\x63\x82\x53\x63" + b"\x35\x01\x03" + b"\x32\x04" + ip_bytes(i)
+    options += bytes([12, len(name)]) + name + b"\xff"
+    return ipv4_udp(mac_bytes(i), b"\x00" * 4, b"\xff" * 4, 68, 67, bootp + options)
+
+def mdns_frame(i: int) -> bytes:
+    name = b"".join(bytes([len(p)]) + p for p in (f"host-{i}".encode(), b"local")) + b"\x00"
+    dns = struct.pack("!HHHHHH", 0, 0x8400, 0, 1, 0, 0) + name + struct.pack("!HHIH", 1, 0x8001, 120, 4) + ip_bytes(i)
+    return ipv4_udp(mac_bytes(i), ip_bytes(i), socket.inet_aton("224.0.0.251"), 5353, 5353, dns)
+
+def tcp_frame(i: int) -> bytes:
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 40, 0, 0, 64, 6, 0, ip_bytes(i), ip_bytes(1)) + b"\x00" * 20
+    return mac_bytes(1) + mac_bytes(i) + b"\x08\x00" + ip
+
+def build_pcap(packets: int, devices: int) -> bytes:
+    builders = (arp_frame, dhcp_frame, mdns_frame, tcp_frame)
+    chunks = [struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1)]
+    for n in range(packets):
+        frame = builders[n % len(builders)]((n * 7919) % devices + 2)
+        chunks.append(struct.pack("<IIII", 0, 0, len(frame), len(frame)))
+        chunks.append(frame)
+    return b"".join(chunks)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packets", type=int, default=200000)
+    parser.add_argument("--devices", type=int, default=2000)
+    args = parser.parse_args()
+
+    data = build_pcap(args.packets, args.devices)
+
+    start = time.perf_counter()
+    sightings = sum(1 for frame in iter_pcap(data) if parse_frame(frame) is not None)
+    parse_elapsed = time.perf_counter() - start
+
+    engine = PassiveDiscovery(lambda batch: {"new_devices": len(batch), "updated_devices": 0})
+    start = time.perf_counter()
+    for frame in iter_pcap(data):
+        if engine.ingest(frame):
+            engine.flush()
+    engine.flush()
+    ingest_elapsed = time.perf_counter() - start
+
+    print(f"packets={args.packets} sightings={sightings} devices={len(engine.flushed)}")
+    print(f"parse_frame: {args.packets / parse_elapsed:,.0f} packets/sec")
+    print(f"ingest:      {args.packets / ingest_elapsed:,.0f} packets/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare per-row ORM reconciliation with the bulk upsert path.
+
+Each run reconciles a synthetic scan into a fresh in-memory SQLite database:
+a first pass where every device is new, then a rescan where a tenth of the
+devices changed IP.
+
+    python benchmarks/bench_reconcile.py --hosts 4000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db import Base, Device, Alert
+from routers.devices import bulk_reconcile
+
+def per_row_reconcile(db, discovered):
+    """The original one-query-per-host loop"""
+    for device_data in discovered:
+        existing = db.query(Device).filter(Device.mac == device_data["mac"]).first()
+        if existing:
+            existing.ip = device_data["ip"]
+            existing.hostname = device_data["hostname"]
+            existing.last_seen = datetime.utcnow()
+            existing.updated_at = datetime.utcnow()
+        else:
+            db.add(Device(
+                mac=device_data["mac"],
+                ip=device_data["ip"],
+                hostname=device_data["hostname"],
+                role="Others",
+                status="active"
+            ))
+            db.add(Alert(
+                message=f"New device detected: {device_data['hostname']} ({device_data['ip']})",
+                level="info",
+                timestamp=datetime.utcnow()
+            ))
+    db.commit()
+
+def make_scan(hosts: int, shift: int = 0):
+    return [
+        {
+            "ip": f"10.{(i + shift) >> 16 & 255}.{(i + shift) >> 8 & 255}.{(i + shift) & 255}",
+            "mac": f"02:00:00:{i >> 16 & 255:02x}:{i >> 8 & 255:02x}:{i & 255:02x}",
+            "hostname": f"host-{i}",
+            "status": "active"
+        }
+        for i in range(hosts)
+    ]
+
+def timed(reconcile, hosts: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    first = make_scan(hosts)
+    rescan = [dict(d) for d in first]
+    for d in rescan[::10]:
+        d["ip"] = d["ip"].replace("10.", "11.", 1)
+
+    start = time.perf_counter()
+    reconcile(db, first)
+    initial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reconcile(db, rescan)
+    repeat = time.perf_counter() - start
+
+    assert db.query(Device).count() == hosts
+    assert db.query(Alert).count() == hosts
+    db.close()
+    return initial, repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=4000)
+    args = parser.parse_args()
+
+    for name, reconcile in (("per-row ORM", per_row_reconcile), ("bulk upsert", bulk_reconcile)):
+        initial, repeat = timed(reconcile, args.hosts)
+        print(f"{name:12s} initial={initial * 1000:8.1f}ms rescan={repeat * 1000:8.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compare the asyncio ICMP scan engine with the thread-pool ping path.
+
+Both paths run against a simulated responder: a fixed set of addresses
+answers after ``--rtt`` seconds, every other address times out. The thread
+path spawns a trivial subprocess per probe so the fork/exec cost of ``ping``
+is part of the measurement.
+
+    python benchmarks/bench_scan.py --range 10.0.0.0/24 --alive 40
+"""
+import argparse
+import asyncio
+import ipaddress
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import network
+from scanner import EchoScanner
+
+class SimulatedTransport:
+    """In-process ICMP responder backed by a socketpair"""
+
+    def __init__(self, alive, rtt: float):
+        self.alive = alive
+        self.rtt = rtt
+        self.reader, self.writer = socket.socketpair()
+        self.reader.setblocking(False)
+
+    def fileno(self) -> int:
+        return self.reader.fileno()
+
+    def send(self, ip: str, seq: int):
+        if ip in self.alive:
+            asyncio.get_running_loop().call_later(
+                self.rtt, self.writer.send, f"{ip} {seq}\n".encode()
+            )
+
+    def recv(self):
+        try:
+            data = self.reader.recv(65536)
+        except BlockingIOError:
+            return []
+        replies = []
+        for line in data.decode().splitlines():
+            ip, seq = line.split()
+            replies.append((ip, int(seq)))
+        return replies
+
+    def close(self):
+        self.reader.close()
+        self.writer.close()
+
+def run_threaded(hosts, alive, rtt: float, timeout: float) -> float:
+    def fake_ping(ip: str, timeout_s: int = 1, pacer=None) -> bool:
+        subprocess.run(["true"])
+        time.sleep(rtt if ip in alive else timeout)
+        return ip in alive
+
+    network.ping_host = fake_ping
+    network.get_hostname = lambda ip: "bench"
+    network.get_mac_address = lambda ip: "00:00:00:00:00:00"
+
+    start = time.perf_counter()
+    found = network.scan_network_threaded(str(hosts))
+    elapsed = time.perf_counter() - start
+    assert len(found) == len(alive), (len(found), len(alive))
+    return elapsed
+
+def run_async(hosts, alive, rtt: float, timeout: float, window: int) -> float:
+    async def main():
+        transport = SimulatedTransport(alive, rtt)
+        try:
+            scanner = EchoScanner(transport, window=window, timeout=timeout)
+            return await scanner.scan(str(ip) for ip in hosts.hosts())
+        finally:
+            transport.close()
+
+    start = time.perf_counter()
+    found = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    assert len(found) == len(alive), (len(found), len(alive))
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--range", default="10.0.0.0/24")
+    parser.add_argument("--alive", type=int, default=40)
+    parser.add_argument("--rtt", type=float, default=0.002)
+    parser.add_argument("--timeout", type=float, default=0.2)
+    parser.add_argument("--window", type=int, default=256)
+    args = parser.parse_args()
+
+    hosts = ipaddress.IPv4Network(args.range, strict=False)
+    addresses = [str(ip) for ip in hosts.hosts()]
+    alive = set(random.Random(0).sample(addresses, min(args.alive, len(addresses))))
+
+    threaded = run_threaded(hosts, alive, args.rtt, args.timeout)
+    asynchronous = run_async(hosts, alive, args.rtt, args.timeout, args.window)
+
+    print(f"hosts={len(addresses)} alive={len(alive)} timeout={args.timeout}s")
+    print(f"thread pool (50 workers): {threaded:.3f}s")
+    print(f"asyncio engine (window={args.window}): {asynchronous:.3f}s")
+    print(f"speedup: {threaded / asynchronous:.1f}x")
+
+if __name__ == "__main__":
+    main()
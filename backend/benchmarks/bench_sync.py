@@ -0,0 +1,290 @@
+"""Load-test the /ws/sync channel of an in-process backend.
+
+The FastAPI app is served by uvicorn on a loopback port from a background
+thread (with a throwaway database), and simulated dashboards connect from a
+separate process so their CPU and memory are not charged to the server. A
+``--slow`` share of them read one frame every ``--slow-delay`` seconds, like
+a browser tab on a bad link. Device updates are published through the
+event bus at ``--rate`` per second for ``--duration`` seconds; each carries
+its publish time, so healthy clients can measure delivery latency.
+
+Reported per client count: p50/p90/p99 delivery latency, deliveries and
+frames per second, server RSS per connection, event-loop lag and the
+ConnectionManager drop/coalesce counters. ``--output`` writes everything as
+JSON so runs can be compared over time.
+
+    python benchmarks/bench_sync.py --clients 10 100 500 --rate 200 --duration 5 --output sync.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import psutil
+import websockets
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND)
+
+END_EVENT = "bench_end"
+
+def percentiles(samples, points=(50, 90, 99)):
+    if not samples:
+        return {f"p{point}": None for point in points} | {"max": None}
+    ordered = sorted(samples)
+    result = {f"p{point}": ordered[min(len(ordered) - 1, len(ordered) * point // 100)] for point in points}
+    result["max"] = ordered[-1]
+    return result
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# ---- clients (child process) ----
+
+async def healthy_client(url: str, latencies: list, counts: dict):
+    async with websockets.connect(url, max_size=None) as ws:
+        counts["connected"] += 1
+        async for frame in ws:
+            now = time.time_ns()
+            counts["frames"] += 1
+            message = json.loads(frame)
+            events = message["events"] if message.get("type") == "batch" else [message]
+            for event in events:
+                if "sent_ns" in event:
+                    latencies.append((now - event["sent_ns"]) / 1e6)
+                    counts["first_sent"] = min(counts["first_sent"], event["sent_ns"])
+                    counts["last_received"] = max(counts["last_received"], now)
+                elif event.get("type") == END_EVENT:
+                    return
+
+async def slow_client(url: str, delay: float, counts: dict):
+    async with websockets.connect(url, max_size=None, max_queue=1) as ws:
+        counts["connected"] += 1
+        async for _ in ws:
+            counts["slow_frames"] += 1
+            await asyncio.sleep(delay)
+
+async def run_clients(url: str, clients: int, slow: int, slow_delay: float, timeout: float, pipe):
+    latencies = []
+    counts = {"connected": 0, "frames": 0, "slow_frames": 0, "first_sent": float("inf"), "last_received": 0}
+    healthy = []
+    slow_tasks = []
+    for i in range(clients):
+        if i < slow:
+            slow_tasks.append(asyncio.create_task(slow_client(url, slow_delay, counts)))
+        else:
+            healthy.append(asyncio.create_task(healthy_client(url, latencies, counts)))
+        if i % 100 == 99:
+            await asyncio.sleep(0.05)  # stay under the listen backlog
+    while counts["connected"] < clients:
+        await asyncio.sleep(0.05)
+    pipe.send("connected")
+
+    _, pending = await asyncio.wait(healthy, timeout=timeout)
+    for task in [*pending, *slow_tasks]:
+        task.cancel()
+    await asyncio.gather(*healthy, *slow_tasks, return_exceptions=True)
+    elapsed = (counts["last_received"] - counts["first_sent"]) / 1e9 if latencies else 0
+    pipe.send({
+        "latency_ms": percentiles(latencies),
+        "deliveries": len(latencies),
+        "deliveries_per_sec": len(latencies) / elapsed if elapsed > 0 else None,
+        "frames_received": counts["frames"],
+        "slow_frames_received": counts["slow_frames"],
+        "unfinished_clients": len(pending)
+    })
+
+def client_process(url: str, clients: int, slow: int, slow_delay: float, timeout: float, pipe):
+    asyncio.run(run_clients(url, clients, slow, slow_delay, timeout, pipe))
+
+# ---- server (this process) ----
+
+class LagProbe:
+    """Samples how late a 10ms sleep wakes up on the server's event loop"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append((time.perf_counter() - start - self.interval) * 1000)
+
+    def take(self):
+        samples, self.samples = self.samples, []
+        return samples
+
+class ServerThread(threading.Thread):
+    def __init__(self, app, port: int):
+        super().__init__(daemon=True)
+        import uvicorn
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.probe = LagProbe()
+        self.loop = None
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        probe = asyncio.create_task(self.probe.run())
+        await self.server.serve()
+        probe.cancel()
+
+    def call(self, function):
+        """Run ``function`` on the server loop, so it sees a consistent state"""
+        async def call():
+            return function()
+        return asyncio.run_coroutine_threadsafe(call(), self.loop).result()
+
+def device_event(i: int, devices: int):
+    device_id = i % devices + 1
+    return {
+        "type": "device_updated",
+        "device_id": device_id,
+        "status": "active",
+        "sent_ns": time.time_ns(),
+        "changes": [{
+            "entity": "device",
+            "op": "upsert",
+            "id": device_id,
+            "version": i + 1,
+            "data": {
+                "id": device_id,
+                "mac": f"02:00:00:00:{device_id >> 8:02x}:{device_id & 255:02x}",
+                "ip": f"10.0.{device_id >> 8}.{device_id & 255}",
+                "hostname": f"host-{device_id}",
+                "vendor": "Example Networks",
+                "role": "Others",
+                "status": "active",
+                "last_seen": datetime.utcnow().isoformat()
+            }
+        }]
+    }
+
+def run_scenario(server: ServerThread, bus, manager, url: str, clients: int, args) -> dict:
+    process = psutil.Process()
+    slow = int(clients * args.slow)
+    parent, child = multiprocessing.Pipe()
+    worker = multiprocessing.get_context("spawn").Process(
+        target=client_process,
+        args=(url, clients, slow, args.slow_delay, args.duration + args.drain, child)
+    )
+    rss_before = process.memory_info().rss
+    worker.start()
+    parent.recv()  # every client is connected
+    time.sleep(0.5)
+    rss_after = process.memory_info().rss
+    before = server.call(manager.stats)
+    server.probe.take()
+
+    events = int(args.rate * args.duration)
+    start = time.perf_counter()
+    for i in range(events):
+        # Absolute schedule, so a slow publish does not lower the rate
+        delay = start + i / args.rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        bus.publish(device_event(i, args.devices))
+    published = time.perf_counter() - start
+    bus.publish({"type": END_EVENT})
+
+    report = parent.recv()
+    lag = server.probe.take()
+    after = server.call(manager.stats)
+    worker.join()
+    while server.call(lambda: len(manager.clients)):
+        time.sleep(0.05)
+
+    frames = after["outbound"]["frames"] - before["outbound"]["frames"]
+    sent_bytes = after["outbound"]["bytes"] - before["outbound"]["bytes"]
+    return {
+        "clients": clients,
+        "slow_clients": slow,
+        "events_published": events,
+        "publish_rate": events / published,
+        **report,
+        "server_frames_per_sec": frames / published,
+        "server_bytes_per_sec": sent_bytes / published,
+        "memory": {
+            "rss_before": rss_before,
+            "rss_connected": rss_after,
+            "per_connection_kb": (rss_after - rss_before) / clients / 1024
+        },
+        "loop_lag_ms": percentiles(lag),
+        "dropped": after["dropped"] - before["dropped"],
+        "coalesced": after["coalesced"] - before["coalesced"],
+        "evicted": after["evicted"] - before["evicted"],
+        "peak_queue_depth": after["peak_queue_depth"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--slow", type=float, default=0.1, help="share of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds a slow client spends per frame")
+    parser.add_argument("--rate", type=float, default=200, help="events published per second")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--drain", type=float, default=10, help="seconds healthy clients get to catch up")
+    parser.add_argument("--devices", type=int, default=250, help="distinct devices the updates cycle through")
+    parser.add_argument("--window-ms", type=float, default=None, help="override SYNC_BATCH_WINDOW_MS")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    # The app opens ./network.db: give it a throwaway one
+    os.chdir(tempfile.mkdtemp(prefix="bench-sync-"))
+    from main import app, manager
+    from sync import bus
+    if args.window_ms is not None:
+        manager.window = args.window_ms / 1000
+
+    port = free_port()
+    server = ServerThread(app, port)
+    server.start()
+    while not server.server.started:
+        time.sleep(0.05)
+    url = f"ws://127.0.0.1:{port}/ws/sync"
+
+    results = []
+    print(f"{'clients':>8} {'p50':>8} {'p99':>8} {'deliveries/s':>13} {'frames/s':>9} "
+          f"{'KB/conn':>8} {'lag p99':>8} {'dropped':>8}")
+    for clients in args.clients:
+        result = run_scenario(server, bus, manager, url, clients, args)
+        results.append(result)
+        latency = result["latency_ms"]
+        print(f"{clients:>8} {latency['p50'] or 0:>6.1f}ms {latency['p99'] or 0:>6.1f}ms "
+              f"{result['deliveries_per_sec'] or 0:>13,.0f} {result['server_frames_per_sec']:>9,.0f} "
+              f"{result['memory']['per_connection_kb']:>8.1f} {result['loop_lag_ms']['p99'] or 0:>6.1f}ms "
+              f"{result['dropped']:>8}")
+
+    server.server.should_exit = True
+    server.join(timeout=10)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({
+                "generated_at": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+                "batch_window_ms": manager.window * 1000,
+                "drop_policy": manager.policy,
+                "config": {key: value for key, value in vars(args).items() if key != "output"},
+                "results": results
+            }, f, indent=2)
+        print(f"wrote {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Measure the cost of login throttling and what it saves under a password-guessing burst.
+
+The first table times ``SlidingWindowLimiter.acquire`` for ``--keys``
+distinct clients from ``--threads`` threads, with the memory the limiter
+holds afterwards. The second sends ``--attempts`` wrong-password logins for
+one account through the app (throwaway database) with throttling off and on,
+and reports how many reached bcrypt and how long the burst took.
+
+    python benchmarks/bench_throttle.py --keys 100000 --threads 4 --attempts 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND)
+
+def fill(keys: int, threads: int, max_keys: int):
+    from throttle import SlidingWindowLimiter
+
+    limiter = SlidingWindowLimiter("bench", 100, 60, max_keys=max_keys)
+    per_thread = keys // threads
+
+    def hammer(offset: int):
+        for i in range(per_thread):
+            limiter.acquire(f"10.{offset}.{i >> 8 & 255}.{i & 255}")
+
+    workers = [threading.Thread(target=hammer, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9, limiter
+
+def limiter_cost(keys: int, threads: int, max_keys: int):
+    ns, limiter = fill(keys, threads, max_keys)
+    # Memory from a second run: tracing allocations would skew the timing
+    tracemalloc.start()
+    _, traced = fill(keys, threads, max_keys)
+    memory = tracemalloc.get_traced_memory()[0]
+    del traced
+    tracemalloc.stop()
+    return ns, memory, limiter.stats()
+
+def login_burst(attempts: int, throttled: bool):
+    import auth
+    import throttle
+    from fastapi.testclient import TestClient
+    from main import app
+
+    limits = ((throttle.login_ip_limiter, throttle.LOGIN_IP_LIMIT), (throttle.login_user_limiter, throttle.LOGIN_USER_LIMIT))
+    for limiter, limit in limits:
+        limiter.shards = [type(shard)() for shard in limiter.shards]
+        limiter.limit = limit if throttled else 0
+    checks = auth.hash_pool.completed
+    codes = {}
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        for _ in range(attempts):
+            response = client.post("/api/auth/login", json={"username": "admin", "password": "guess"})
+            codes[response.status_code] = codes.get(response.status_code, 0) + 1
+        elapsed = time.perf_counter() - start
+    return elapsed, auth.hash_pool.completed - checks, codes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--max-keys", type=int, default=65536)
+    parser.add_argument("--attempts", type=int, default=50)
+    args = parser.parse_args()
+
+    # The app opens ./network.db: give it a throwaway one
+    os.chdir(tempfile.mkdtemp(prefix="bench-throttle-"))
+
+    ns, memory, stats = limiter_cost(args.keys, args.threads, args.max_keys)
+    print(f"{args.keys} keys from {args.threads} threads: {ns:.0f}ns per acquire, "
+          f"{stats['keys']} keys held ({memory / 1024 / 1024:.1f} MB), {stats['evicted']} evicted")
+
+    print(f"\n{args.attempts} wrong-password logins for one account")
+    print(f"{'throttling':>11} {'elapsed':>9} {'bcrypt checks':>14} {'responses':>20}")
+    for throttled in (False, True):
+        elapsed, checks, codes = login_burst(args.attempts, throttled)
+        print(f"{'on' if throttled else 'off':>11} {elapsed:>8.2f}s {checks:>14} {str(codes):>20}")
+
+if __name__ == "__main__":
+    main()
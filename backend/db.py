@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -7,6 +9,13 @@ import os
 DATABASE_URL = "sqlite:///./network.db"
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The same file through aiosqlite, for request handlers: queries run on the
+# driver's thread and the event loop keeps serving other requests meanwhile
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+# aiosqlite defaults to NullPool, which opens a connection (and its thread) per request
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool)
+# No expiry on commit: an expired attribute would need a lazy load, which async sessions cannot do
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 class Device(Base):
@@ -15,6 +24,7 @@ class Device(Base):
     mac = Column(String, unique=True, index=True)
     ip = Column(String)
     hostname = Column(String)
+    vendor = Column(String, nullable=True)  # IEEE OUI registry organization
     role = Column(String, default="Others")  # Admin, Volunteer, Others
     last_seen = Column(DateTime, default=datetime.utcnow)
     status = Column(String, default="active")  # active, blocked, kicked
@@ -45,6 +55,15 @@ class Session(Base):
     active = Column(Boolean, default=True)
     started_at = Column(DateTime, default=datetime.utcnow)
     ended_at = Column(DateTime, nullable=True)
+    token_id = Column(String, nullable=True)  # jti of the login's access token
+    expires_at = Column(DateTime, nullable=True)
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    jti = Column(String, primary_key=True)
+    user_id = Column(Integer, index=True)
+    expires_at = Column(DateTime, index=True)  # the token's exp; the row is useless after it
+    revoked_at = Column(DateTime, default=datetime.utcnow)
 
 class FirewallLog(Base):
     __tablename__ = "firewall_logs"
@@ -59,6 +78,18 @@ class FirewallLog(Base):
 def init_db():
     Base.metadata.create_all(bind=engine)
     
+    # create_all() never alters existing tables, so add columns introduced later
+    added_columns = {
+        "devices": {"vendor": "VARCHAR"},
+        "sessions": {"token_id": "VARCHAR", "expires_at": "DATETIME"},
+    }
+    with engine.begin() as conn:
+        for table, wanted in added_columns.items():
+            columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+            for column, column_type in wanted.items():
+                if column not in columns:
+                    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    
     # Create default admin user if none exists
     db = SessionLocal()
     try:
@@ -81,4 +112,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""DNS wire-format name helpers shared by the mDNS sniffer and the PTR resolver"""
+
+def skip_dns_name(frame: memoryview, pos: int, end: int) -> int:
+    while pos < end:
+        length = frame[pos]
+        if length == 0:
+            return pos + 1
+        if length & 0xC0 == 0xC0:
+            return pos + 2
+        pos += length + 1
+    return end
+
+def read_dns_name(frame: memoryview, pos: int, base: int, end: int) -> str:
+    labels = []
+    for _ in range(32):  # bound pointer chains
+        if pos >= end:
+            break
+        length = frame[pos]
+        if length == 0:
+            break
+        if length & 0xC0 == 0xC0:
+            if pos + 1 >= end:
+                break
+            pos = base + (((length & 0x3F) << 8) | frame[pos + 1])
+            continue
+        labels.append(bytes(frame[pos + 1:pos + 1 + length]).decode("utf-8", "replace"))
+        pos += length + 1
+    return ".".join(labels)
@@ -1,23 +1,50 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from typing import Optional
 import uvicorn
+import os
 
 # Routers
 from routers import devices, users, alerts, firewall, snort, evil_limiter
 import auth
-from sync import ConnectionManager
-from db import init_db
+from sync import ConnectionManager, bus, CLIENT_TOPIC
+from backplane import create_backplane
+from revocation import revocations
+from db import async_engine, init_db
+from throttle import api_limiter, retry_header
 
+# The only socket holder: every router publishes to the shared bus
 manager = ConnectionManager()
+manager.attach(bus)
+revocations.attach(bus)
+# Relays bus events between uvicorn workers (SYNC_BACKPLANE)
+backplane = create_backplane()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
+    revocations.load()
+    await backplane.start(bus)
+    scheduler = None
+    if os.getenv("ADAPTIVE_RESCAN", "0") == "1":
+        scheduler = devices.create_rescan_scheduler()
+        scheduler.start()
+    passive = None
+    if os.getenv("PASSIVE_DISCOVERY", "0") == "1":
+        passive = devices.create_passive_discovery()
+        passive.start(os.getenv("PASSIVE_INTERFACE") or None)
     yield
     # Shutdown
-    pass
+    if scheduler is not None:
+        await scheduler.stop()
+    if passive is not None:
+        await passive.stop()
+    await manager.close()
+    await backplane.close()
+    await async_engine.dispose()
 
 # FastAPI App
 app = FastAPI(
@@ -27,6 +54,21 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Per-IP request limit for the whole API (API_RATE_LIMIT, off by default);
+# added before CORS so 429 responses still carry CORS headers
+@app.middleware("http")
+async def throttle_api(request: Request, call_next):
+    if api_limiter.limit > 0 and request.url.path.startswith("/api/"):
+        client_ip = request.client.host if request.client else "unknown"
+        wait = api_limiter.acquire(client_ip)
+        if wait:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests, try again later"},
+                headers=retry_header(wait)
+            )
+    return await call_next(request)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -69,15 +111,22 @@ async def health_check():
         }
     }
 
+# Event bus counters
+@app.get("/api/sync/stats")
+async def sync_stats(current_user: auth.User = Depends(auth.get_current_user)):
+    return {**bus.stats(), "websockets": manager.stats(), "backplane": backplane.stats()}
+
 # WebSocket for real-time sync
 @app.websocket("/ws/sync")
-async def websocket_sync(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_sync(websocket: WebSocket, since: Optional[int] = None, epoch: Optional[str] = None):
+    await manager.connect(websocket, since, epoch)
     try:
         while True:
             data = await websocket.receive_json()
-            await manager.broadcast(data)
-    except WebSocketDisconnect:
+            if not manager.handle_message(websocket, data):
+                bus.publish(data, topic=CLIENT_TOPIC)
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the socket was already closed as a slow consumer
         manager.disconnect(websocket)
 
 # Entry point
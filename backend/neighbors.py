@@ -0,0 +1,85 @@
+import os
+import re
+import time
+import subprocess
+import threading
+from typing import Dict, Optional
+
+PROC_ARP_PATH = "/proc/net/arp"
+EMPTY_MAC = "00:00:00:00:00:00"
+
+_IP_RE = re.compile(r"\b(\d{1,3}(?:\.\d{1,3}){3})\b")
+_MAC_RE = re.compile(r"\b([0-9a-fA-F]{1,2}(?:[:-][0-9a-fA-F]{1,2}){5})\b")
+
+def normalize_mac(mac: str) -> str:
+    """Normalize a MAC to lowercase, colon separated, zero padded octets"""
+    return ":".join(part.zfill(2) for part in re.split("[:-]", mac.lower()))
+
+def read_proc_arp(path: str = PROC_ARP_PATH) -> Dict[str, str]:
+    """Parse the Linux kernel neighbor table in a single read"""
+    table = {}
+    with open(path) as f:
+        next(f, None)  # header
+        for line in f:
+            parts = line.split()
+            # IP address, HW type, Flags, HW address, Mask, Device
+            if len(parts) < 4 or parts[2] == "0x0":
+                continue
+            if parts[3] != EMPTY_MAC:
+                table[parts[0]] = parts[3].lower()
+    return table
+
+def read_arp_command() -> Dict[str, str]:
+    """Parse the whole `arp -a` table (Windows/macOS) from one process launch"""
+    table = {}
+    output = subprocess.check_output(["arp", "-a"], text=True)
+    for line in output.split("\n"):
+        ip = _IP_RE.search(line)
+        mac = _MAC_RE.search(line)
+        if ip and mac:
+            normalized = normalize_mac(mac.group(1))
+            if normalized != EMPTY_MAC and normalized != "ff:ff:ff:ff:ff:ff":
+                table[ip.group(1)] = normalized
+    return table
+
+class NeighborTable:
+    """Snapshot of the OS neighbor (ARP) table with O(1) IP -> MAC lookups.
+
+    The snapshot is only re-read when a lookup misses or when a scan
+    finishes. Misses are rate limited when the source is a subprocess.
+    """
+
+    def __init__(self, proc_path: str = PROC_ARP_PATH):
+        self.proc_path = proc_path
+        self.use_proc = os.path.exists(proc_path)
+        self.min_refresh_interval = 0.0 if self.use_proc else 1.0
+        self.entries: Dict[str, str] = {}
+        self.last_refresh = 0.0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def refresh(self) -> Dict[str, str]:
+        """Re-read the neighbor table and swap in the new snapshot"""
+        with self._lock:
+            try:
+                if self.use_proc:
+                    entries = read_proc_arp(self.proc_path)
+                else:
+                    entries = read_arp_command()
+            except Exception:
+                entries = self.entries
+            self.entries = entries
+            self.last_refresh = time.monotonic()
+            self.refreshes += 1
+            return entries
+
+    def get(self, ip: str) -> Optional[str]:
+        """Look up a MAC, refreshing the snapshot once on a miss"""
+        mac = self.entries.get(ip)
+        if mac is not None:
+            return mac
+        if time.monotonic() - self.last_refresh >= self.min_refresh_interval:
+            mac = self.refresh().get(ip)
+        return mac
+
+neighbor_table = NeighborTable()
@@ -1,9 +1,31 @@
 import platform
 import subprocess
 import socket
-from typing import List, Dict
+from typing import Callable, List, Dict, Tuple
 import ipaddress
 import concurrent.futures
+import multiprocessing
+import asyncio
+import os
+import psutil
+
+from scanner import (
+    EchoScanner, ConnectProber, open_transport,
+    DEFAULT_WINDOW, DEFAULT_TIMEOUT, DEFAULT_TCP_PORTS
+)
+from neighbors import NeighborTable, neighbor_table, EMPTY_MAC
+from resolver import reverse_resolver
+from pacing import ProbePacer, probe_pacer
+
+SHARD_PREFIX = 24         # large prefixes are split into /24 shards
+MIN_PREFIX = 16           # never sweep more than a /16 per interface
+
+# Second-stage TCP connect probing for hosts that ignore ping. Opt-in: it sends
+# a connect per port to every silent address, which IDSes flag as a port scan
+CONNECT_FALLBACK = os.getenv("SCAN_CONNECT_FALLBACK", "0") == "1"
+CONNECT_PORTS = tuple(
+    int(port) for port in os.getenv("SCAN_CONNECT_PORTS", "").split(",") if port.strip()
+) or DEFAULT_TCP_PORTS
 
 def get_local_ip():
     """Get the local IP address of the machine"""
@@ -26,9 +48,51 @@ def get_network_range():
     except Exception:
         return "192.168.1.0/24"
 
-def ping_host(ip: str, timeout: int = 1) -> bool:
+def get_local_networks() -> List[str]:
+    """Every IPv4 prefix attached to an up, non-loopback local interface"""
+    try:
+        addrs = psutil.net_if_addrs()
+        stats = psutil.net_if_stats()
+    except Exception:
+        return [get_network_range()]
+    
+    networks = []
+    for name, entries in addrs.items():
+        if name in stats and not stats[name].isup:
+            continue
+        for entry in entries:
+            if entry.family != socket.AF_INET or not entry.netmask:
+                continue
+            try:
+                address = ipaddress.IPv4Address(entry.address)
+                network = ipaddress.IPv4Network(f"{entry.address}/{entry.netmask}", strict=False)
+            except ValueError:
+                continue
+            if address.is_loopback or address.is_link_local or network.prefixlen >= 31:
+                continue
+            if network.prefixlen < MIN_PREFIX:
+                network = ipaddress.IPv4Network(f"{entry.address}/{MIN_PREFIX}", strict=False)
+            networks.append(network)
+    
+    if not networks:
+        return [get_network_range()]
+    return [str(network) for network in ipaddress.collapse_addresses(networks)]
+
+def split_shards(networks: List[str], shard_prefix: int = SHARD_PREFIX) -> List[str]:
+    """Split prefixes larger than ``shard_prefix`` into equally sized shards"""
+    shards = []
+    for network_range in networks:
+        network = ipaddress.IPv4Network(network_range, strict=False)
+        if network.prefixlen >= shard_prefix:
+            shards.append(str(network))
+        else:
+            shards.extend(str(subnet) for subnet in network.subnets(new_prefix=shard_prefix))
+    return shards
+
+def ping_host(ip: str, timeout: int = 1, pacer: ProbePacer = None) -> bool:
     """Ping a host to check if it's alive"""
     system = platform.system().lower()
+    (pacer or probe_pacer).acquire_sync(ip)
     
     if system == "windows":
         command = ["ping", "-n", "1", "-w", str(timeout * 1000), ip]
@@ -48,56 +112,132 @@ def ping_host(ip: str, timeout: int = 1) -> bool:
 
 def get_hostname(ip: str) -> str:
     """Get hostname from IP address"""
-    try:
-        hostname = socket.gethostbyaddr(ip)[0]
-        return hostname
-    except Exception:
-        return "Unknown"
+    return reverse_resolver.lookup_sync(ip) or "Unknown"
 
-def get_mac_address(ip: str) -> str:
-    """Get MAC address from IP using ARP"""
-    system = platform.system().lower()
+def get_mac_address(ip: str, table: NeighborTable = None) -> str:
+    """Get MAC address from IP using the neighbor table snapshot"""
+    if table is None:
+        table = neighbor_table
+    return table.get(ip) or EMPTY_MAC
+
+def describe_host(ip: str, resolve_names: bool = True) -> Dict:
+    """Build the device dict for a host that is known to be alive"""
+    return {
+        "ip": ip,
+        "hostname": get_hostname(ip) if resolve_names else "Unknown",
+        "mac": get_mac_address(ip),
+        "status": "active"
+    }
+
+def scan_single_host(ip: str, pacer: ProbePacer = None, resolve_names: bool = True) -> Dict:
+    """Scan a single host and return device info"""
+    if ping_host(ip, pacer=pacer):
+        return describe_host(ip, resolve_names)
+    return None
+
+async def async_scan_network(
+    network_range: str = None,
+    window: int = DEFAULT_WINDOW,
+    timeout: float = DEFAULT_TIMEOUT,
+    pacer: ProbePacer = None,
+    transport=None,
+    connect_fallback: bool = CONNECT_FALLBACK,
+    resolve_names: bool = True,
+    on_host: Callable[[Dict], None] = None,
+    on_progress: Callable[[int, int], None] = None
+) -> List[Dict]:
+    """Scan the network from a single ICMP socket with a bounded in-flight window.
+
+    Addresses that do not answer ICMP get a second, TCP connect pass over
+    ``CONNECT_PORTS`` when ``connect_fallback`` is set. Host names are looked up
+    through ``reverse_resolver`` unless ``resolve_names`` is off.
+
+    ``on_host(device)`` fires for every live host as soon as it is described and
+    ``on_progress(scanned, total)`` after every ICMP probe. Both run on the event
+    loop. Probes are paced by ``pacer``, the process-wide ``probe_pacer`` by default.
+    """
+    if network_range is None:
+        network_range = get_network_range()
     
     try:
-        if system == "windows":
-            output = subprocess.check_output(["arp", "-a", ip], text=True)
-            for line in output.split("\n"):
-                if ip in line:
-                    parts = line.split()
-                    for i, part in enumerate(parts):
-                        if ip in part and i + 1 < len(parts):
-                            mac = parts[i + 1]
-                            if "-" in mac or ":" in mac:
-                                return mac.replace("-", ":")
-        else:
-            output = subprocess.check_output(["arp", "-n", ip], text=True)
-            for line in output.split("\n"):
-                if ip in line:
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        mac = parts[2] if system == "linux" else parts[3]
-                        if ":" in mac:
-                            return mac
+        network = ipaddress.IPv4Network(network_range, strict=False)
     except Exception:
-        pass
+        return []
     
-    return "00:00:00:00:00:00"
-
-def scan_single_host(ip: str) -> Dict:
-    """Scan a single host and return device info"""
-    if ping_host(ip):
-        hostname = get_hostname(ip)
-        mac = get_mac_address(ip)
-        return {
+    loop = asyncio.get_running_loop()
+    pacer = pacer or probe_pacer
+    hosts = [str(ip) for ip in network.hosts()]
+    lookups = []
+    scanned = 0
+    
+    async def describe(ip: str) -> Dict:
+        hostname = await reverse_resolver.resolve(ip) if resolve_names else None
+        if neighbor_table.use_proc:
+            mac = get_mac_address(ip)
+        else:
+            # `arp -a` fallback launches a process
+            mac = await loop.run_in_executor(None, get_mac_address, ip)
+        device = {
             "ip": ip,
-            "hostname": hostname,
+            "hostname": hostname or "Unknown",
             "mac": mac,
             "status": "active"
         }
-    return None
+        if on_host is not None:
+            on_host(device)
+        return device
+    
+    def settled(ip: str, alive: bool):
+        nonlocal scanned
+        scanned += 1
+        if alive:
+            lookups.append(asyncio.ensure_future(describe(ip)))
+        if on_progress is not None:
+            on_progress(scanned, len(hosts))
+    
+    owns_transport = transport is None
+    if owns_transport:
+        transport = open_transport()
+    
+    if transport is None:
+        def threadsafe(callback):
+            if callback is None:
+                return None
+            return lambda *args: loop.call_soon_threadsafe(callback, *args)
+        
+        devices = await loop.run_in_executor(
+            None, scan_network_threaded, network_range,
+            threadsafe(on_host), threadsafe(on_progress), pacer, resolve_names
+        )
+        answered = {device["ip"] for device in devices}
+    else:
+        devices = []
+        try:
+            scanner = EchoScanner(transport, window=window, timeout=timeout, pacer=pacer)
+            answered = set(await scanner.scan(hosts, on_result=settled))
+        finally:
+            if owns_transport:
+                transport.close()
+    
+    if connect_fallback:
+        silent = [ip for ip in hosts if ip not in answered]
+        prober = ConnectProber(CONNECT_PORTS, pacer=pacer)
+        for ip in await prober.scan(silent):
+            lookups.append(asyncio.ensure_future(describe(ip)))
+    
+    return devices + list(await asyncio.gather(*lookups))
 
-def scan_network(network_range: str = None) -> List[Dict]:
-    """Scan the local network for active devices"""
+def scan_network_threaded(
+    network_range: str = None,
+    on_host: Callable[[Dict], None] = None,
+    on_progress: Callable[[int, int], None] = None,
+    pacer: ProbePacer = None,
+    resolve_names: bool = True
+) -> List[Dict]:
+    """Scan the network with one ping subprocess per host.
+
+    Pings are paced by ``pacer``, the process-wide ``probe_pacer`` by default.
+    """
     if network_range is None:
         network_range = get_network_range()
     
@@ -110,15 +250,115 @@ def scan_network(network_range: str = None) -> List[Dict]:
     
     # Use ThreadPoolExecutor for parallel scanning
     with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
-        futures = {executor.submit(scan_single_host, str(ip)): ip for ip in network.hosts()}
+        futures = {
+            executor.submit(scan_single_host, str(ip), pacer, resolve_names): ip
+            for ip in network.hosts()
+        }
         
-        for future in concurrent.futures.as_completed(futures):
+        for scanned, future in enumerate(concurrent.futures.as_completed(futures), 1):
             result = future.result()
             if result:
                 devices.append(result)
+                if on_host is not None:
+                    on_host(result)
+            if on_progress is not None:
+                on_progress(scanned, len(futures))
+    
+    # Fill in MACs whose ARP entry appeared after their own lookup
+    neighbor_table.refresh()
+    for device in devices:
+        if device["mac"] == EMPTY_MAC:
+            device["mac"] = get_mac_address(device["ip"])
     
     return devices
 
-def is_suspicious_request(ip: str, request_count: int, threshold: int = 100) -> bool:
-    """Check if request count from IP is suspicious"""
-    return request_count > threshold
\ No newline at end of file
+def scan_shard(shard: str, rate: float = None) -> Tuple[List[Dict], Tuple[int, float, List[float]]]:
+    """Process-pool entry point: sweep one shard in its own event loop.
+
+    ``rate`` is this worker's share of the global probe budget; the per-subnet
+    limit applies unchanged since a shard is a single subnet. Names are left
+    to the parent, whose resolver cache outlives the worker. Returns the live
+    hosts and the pacer counters for ``ProbePacer.merge``.
+    """
+    pacer = ProbePacer(rate=rate, subnet_rate=probe_pacer.subnet_rate)
+    devices = asyncio.run(async_scan_network(shard, pacer=pacer, resolve_names=False))
+    return devices, (pacer.probes, pacer.waited, list(pacer.recent))
+
+def merge_devices(devices: List[Dict]) -> List[Dict]:
+    """Drop duplicate sightings of the same address (overlapping interfaces)"""
+    merged = {}
+    for device in devices:
+        current = merged.get(device["ip"])
+        if current is None or (current["mac"] == EMPTY_MAC and device["mac"] != EMPTY_MAC):
+            merged[device["ip"]] = device
+    return list(merged.values())
+
+async def async_scan_networks(
+    networks: List[str] = None,
+    processes: int = None,
+    on_host: Callable[[Dict], None] = None,
+    on_progress: Callable[[int, int], None] = None
+) -> List[Dict]:
+    """Scan every local prefix, sharding large ranges across a process pool.
+
+    The global rate of ``probe_pacer`` is split evenly between the shard
+    workers, and their probe counts are merged back into it. Workers only
+    find live hosts; names are resolved here through ``reverse_resolver``.
+    Progress and per-host callbacks fire as each shard completes.
+    """
+    if networks is None:
+        networks = get_local_networks()
+    shards = split_shards(networks)
+    
+    if len(shards) == 1:
+        return merge_devices(await async_scan_network(
+            shards[0], on_host=on_host, on_progress=on_progress
+        ))
+    
+    sizes = {shard: len(list(ipaddress.IPv4Network(shard).hosts())) for shard in shards}
+    total = sum(sizes.values())
+    workers = min(len(shards), processes or os.cpu_count() or 1)
+    per_worker_rate = probe_pacer.rate / workers if probe_pacer.rate else None
+    loop = asyncio.get_running_loop()
+    seen = set()
+    devices = []
+    scanned = 0
+    
+    async def describe(device: Dict) -> Dict:
+        device["hostname"] = await reverse_resolver.resolve(device["ip"]) or "Unknown"
+        if on_host is not None:
+            on_host(device)
+        return device
+    
+    # spawn: never fork a process that has a running event loop and threads
+    context = multiprocessing.get_context("spawn")
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        async def run(shard: str):
+            return shard, await loop.run_in_executor(pool, scan_shard, shard, per_worker_rate)
+        
+        for future in asyncio.as_completed([run(shard) for shard in shards]):
+            shard, (shard_devices, pacing) = await future
+            probe_pacer.merge(*pacing)
+            scanned += sizes[shard]
+            fresh = [device for device in shard_devices if device["ip"] not in seen]
+            seen.update(device["ip"] for device in fresh)
+            devices += await asyncio.gather(*(describe(device) for device in fresh))
+            if on_progress is not None:
+                on_progress(scanned, total)
+    finally:
+        # Never join the workers on the loop: a cancelled scan drops its queued
+        # shards and lets the running ones finish in the background
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    return merge_devices(devices)
+
+def scan_network(network_range: str = None) -> List[Dict]:
+    """Scan the local network for active devices"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(async_scan_network(network_range))
+    
+    # Already inside an event loop (e.g. called from an async handler)
+    return scan_network_threaded(network_range)
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""Compact IEEE OUI registry (MA-L, MA-M, MA-S/IAB) for MAC vendor lookups.
+
+The registry is compiled into a single binary file of sorted integer prefix
+tables that is memory-mapped on first use, so importing this module costs
+nothing and a lookup is a handful of binary searches over the mapped pages.
+
+Rebuild the bundled index from IEEE registry exports (``oui.txt``, ``mam.txt``,
+``oui36.txt``, ``iab.txt`` or the matching ``.csv`` files):
+
+    python oui.py build data/oui.bin oui.txt iab.txt mam.csv oui36.csv
+"""
+import argparse
+import bisect
+import csv
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+OUI_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "oui.bin")
+
+MAGIC = b"OUI1"
+HEADER = struct.Struct("<4sII")  # magic, vendor count, table count
+TABLE = struct.Struct("<II")  # prefix bits, entry count
+
+_SEPARATORS = str.maketrans("", "", ":-. ")
+_HEX_LINE = re.compile(r"^\s*([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})\s+\(hex\)")
+_BASE16_LINE = re.compile(r"^\s*([0-9A-Fa-f]{6})(?:-([0-9A-Fa-f]{6}))?\s+\(base 16\)\s*(.*)$")
+
+def mac_to_int(mac: str) -> Optional[int]:
+    """Parse a MAC in any common notation to a 48-bit integer"""
+    digits = mac.translate(_SEPARATORS)
+    if len(digits) != 12:
+        return None
+    try:
+        return int(digits, 16)
+    except ValueError:
+        return None
+
+def _range_entry(oui: int, low: int, high: int) -> Tuple[int, int]:
+    """Turn an OUI plus a low-24-bit block range into (prefix, prefix bits)"""
+    suffix_bits = (high - low + 1).bit_length() - 1
+    return ((oui << 24) | low) >> suffix_bits, 48 - suffix_bits
+
+def parse_registry_text(path: str) -> Iterator[Tuple[int, int, str]]:
+    """Yield (prefix, bits, organization) from an IEEE ``.txt`` registry export"""
+    oui = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            hex_line = _HEX_LINE.match(line)
+            if hex_line:
+                oui = int("".join(hex_line.groups()), 16)
+                continue
+            base16 = _BASE16_LINE.match(line)
+            if not base16:
+                continue
+            start, end, organization = base16.groups()
+            organization = organization.strip()
+            if end is None:
+                # MA-L: the base 16 column is the OUI itself
+                yield int(start, 16), 24, organization
+            elif oui is not None:
+                prefix, bits = _range_entry(oui, int(start, 16), int(end, 16))
+                yield prefix, bits, organization
+
+def parse_registry_csv(path: str) -> Iterator[Tuple[int, int, str]]:
+    """Yield (prefix, bits, organization) from an IEEE ``.csv`` registry export"""
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        for row in csv.DictReader(f):
+            assignment = (row.get("Assignment") or "").strip()
+            if assignment:
+                yield int(assignment, 16), len(assignment) * 4, (row.get("Organization Name") or "").strip()
+
+def compile_registry(sources: Iterable[str], output: str) -> Dict[int, int]:
+    """Compile registry exports into the binary index; returns entries per prefix length"""
+    tables: Dict[int, Dict[int, str]] = {}
+    for path in sources:
+        parse = parse_registry_csv if path.lower().endswith(".csv") else parse_registry_text
+        for prefix, bits, organization in parse(path):
+            tables.setdefault(bits, {})[prefix] = organization
+
+    vendors: Dict[str, int] = {}
+    layout = []
+    for bits in sorted(tables, reverse=True):
+        entries = sorted(tables[bits].items())
+        keys = array("Q", (prefix for prefix, _ in entries))
+        indexes = array("I", (vendors.setdefault(name, len(vendors)) for _, name in entries))
+        layout.append((bits, keys, indexes))
+
+    blob = bytearray()
+    offsets = array("I", [0])
+    for name in vendors:
+        blob += name.encode("utf-8")
+        offsets.append(len(blob))
+
+    if sys.byteorder != "little":
+        for _, keys, indexes in layout:
+            keys.byteswap()
+            indexes.byteswap()
+        offsets.byteswap()
+
+    header = HEADER.pack(MAGIC, len(vendors), len(layout))
+    header += b"".join(TABLE.pack(bits, len(keys)) for bits, keys, _ in layout)
+    header += b"\x00" * (-len(header) % 8)  # keep the uint64 tables aligned
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "wb") as f:
+        f.write(header)
+        for _, keys, _ in layout:
+            f.write(keys.tobytes())
+        for _, _, indexes in layout:
+            f.write(indexes.tobytes())
+        f.write(offsets.tobytes())
+        f.write(blob)
+    return {bits: len(keys) for bits, keys, _ in layout}
+
+class OuiIndex:
+    """Longest-prefix vendor lookup over a memory-mapped compiled registry"""
+
+    def __init__(self, path: str = OUI_INDEX_PATH):
+        self.path = path
+        self.tables: List[Tuple[int, object, object]] = []
+        self.vendor_cache: Dict[int, str] = {}
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def _cast(self, view: memoryview, start: int, count: int, fmt: str):
+        size = struct.calcsize(fmt)
+        chunk = view[start:start + count * size]
+        if sys.byteorder == "little":
+            return chunk.cast(fmt)
+        values = array(fmt, chunk.tobytes())
+        values.byteswap()
+        return values
+
+    def load(self) -> bool:
+        """Map the index file; returns False when no index is bundled"""
+        with self._lock:
+            if self.loaded:
+                return bool(self.tables)
+            self.loaded = True
+            try:
+                with open(self.path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return False
+
+            view = memoryview(self._map)
+            magic, vendor_count, table_count = HEADER.unpack_from(view, 0)
+            if magic != MAGIC:
+                return False
+            specs = [TABLE.unpack_from(view, HEADER.size + i * TABLE.size) for i in range(table_count)]
+            offset = HEADER.size + table_count * TABLE.size
+            offset += -offset % 8
+
+            keys = []
+            for _, count in specs:
+                keys.append(self._cast(view, offset, count, "Q"))
+                offset += count * 8
+            tables = []
+            for (bits, count), table_keys in zip(specs, keys):
+                tables.append((bits, table_keys, self._cast(view, offset, count, "I")))
+                offset += count * 4
+            self.vendor_offsets = self._cast(view, offset, vendor_count + 1, "I")
+            self.vendor_blob = view[offset + (vendor_count + 1) * 4:]
+            self.tables = tables
+            return True
+
+    def vendor(self, index: int) -> str:
+        name = self.vendor_cache.get(index)
+        if name is None:
+            start, end = self.vendor_offsets[index], self.vendor_offsets[index + 1]
+            name = bytes(self.vendor_blob[start:end]).decode("utf-8")
+            self.vendor_cache[index] = name
+        return name
+
+    def lookup(self, mac: str) -> Optional[str]:
+        """Organization owning ``mac``, or None for unknown and locally administered addresses"""
+        value = mac_to_int(mac)
+        if not value or value & (0x02 << 40) or not self.load():
+            return None
+        for bits, keys, indexes in self.tables:
+            key = value >> (48 - bits)
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                return self.vendor(indexes[i])
+        return None
+
+    def lookup_many(self, macs: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Resolve a batch of MACs with one sorted sweep per prefix table"""
+        results: Dict[str, Optional[str]] = {}
+        pending = []
+        for mac in macs:
+            results[mac] = None
+            value = mac_to_int(mac)
+            if value and not value & (0x02 << 40):
+                pending.append((value, mac))
+        if not pending or not self.load():
+            return results
+
+        pending.sort()
+        for bits, keys, indexes in self.tables:
+            shift = 48 - bits
+            lo, size = 0, len(keys)
+            unresolved = []
+            for value, mac in pending:
+                key = value >> shift
+                # Keys ascend with the sorted MACs, so each search starts where the last ended
+                lo = bisect.bisect_left(keys, key, lo)
+                if lo < size and keys[lo] == key:
+                    results[mac] = self.vendor(indexes[lo])
+                else:
+                    unresolved.append((value, mac))
+            pending = unresolved
+            if not pending:
+                break
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": bool(self.tables),
+            "entries": {bits: len(keys) for bits, keys, _ in self.tables},
+            "vendors_decoded": len(self.vendor_cache)
+        }
+
+oui_index = OuiIndex()
+
+def lookup_vendor(mac: str) -> Optional[str]:
+    return oui_index.lookup(mac)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile IEEE OUI registry exports into the vendor index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("output")
+    build.add_argument("sources", nargs="+")
+    lookup = sub.add_parser("lookup")
+    lookup.add_argument("macs", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        counts = compile_registry(args.sources, args.output)
+        print(f"Wrote {args.output}: " + ", ".join(f"/{bits}: {n}" for bits, n in counts.items()))
+    else:
+        for mac, vendor in oui_index.lookup_many(args.macs).items():
+            print(f"{mac}  {vendor or '-'}")
+
+if __name__ == "__main__":
+    main()
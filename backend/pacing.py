@@ -0,0 +1,141 @@
+import asyncio
+import ipaddress
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, Optional
+
+# Sweep bandwidth, tunable per deployment (probes/sec and burst size)
+SCAN_RATE = float(os.getenv("SCAN_RATE", "2000"))
+SCAN_BURST = int(os.getenv("SCAN_BURST", "64"))
+SCAN_SUBNET_RATE = float(os.getenv("SCAN_SUBNET_RATE", "500"))
+SCAN_SUBNET_BURST = int(os.getenv("SCAN_SUBNET_BURST", "32"))
+SUBNET_PREFIX = 24
+
+class TokenBucket:
+    """Token bucket where callers reserve tokens and sleep off any deficit"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float, tokens: float = 1.0) -> float:
+        """Take ``tokens`` and return how long the caller must wait before using them"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= tokens
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+class ProbePacer:
+    """Global and per-subnet probe rate limiting shared by every prober.
+
+    A rate of ``None`` or 0 disables that limit. ``stats()`` reports the
+    achieved probe rate over the last ``window`` probes.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = SCAN_RATE,
+        burst: int = SCAN_BURST,
+        subnet_rate: Optional[float] = SCAN_SUBNET_RATE,
+        subnet_burst: int = SCAN_SUBNET_BURST,
+        subnet_prefix: int = SUBNET_PREFIX,
+        max_subnets: int = 4096,
+        window: int = 1024
+    ):
+        self.configure(rate, burst, subnet_rate, subnet_burst)
+        self.subnet_prefix = subnet_prefix
+        self.max_subnets = max_subnets
+        self.subnets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.recent = deque(maxlen=window)
+        self.probes = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        rate: Optional[float] = None,
+        burst: int = SCAN_BURST,
+        subnet_rate: Optional[float] = None,
+        subnet_burst: int = SCAN_SUBNET_BURST
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.subnet_rate = subnet_rate
+        self.subnet_burst = subnet_burst
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.subnets = OrderedDict()
+
+    def _subnet_bucket(self, ip: str) -> TokenBucket:
+        key = str(ipaddress.IPv4Network(f"{ip}/{self.subnet_prefix}", strict=False))
+        bucket = self.subnets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.subnet_rate, self.subnet_burst)
+            self.subnets[key] = bucket
+            while len(self.subnets) > self.max_subnets:
+                self.subnets.popitem(last=False)
+        else:
+            self.subnets.move_to_end(key)
+        return bucket
+
+    def reserve(self, ip: str) -> float:
+        """Account for one probe to ``ip`` and return the delay before sending it"""
+        with self._lock:
+            now = time.monotonic()
+            delay = 0.0
+            if self.bucket is not None:
+                delay = self.bucket.reserve(now)
+            if self.subnet_rate:
+                delay = max(delay, self._subnet_bucket(ip).reserve(now))
+            self.probes += 1
+            self.waited += delay
+            self.recent.append(now + delay)
+            return delay
+
+    async def acquire(self, ip: str):
+        delay = self.reserve(ip)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, ip: str):
+        delay = self.reserve(ip)
+        if delay > 0:
+            time.sleep(delay)
+
+    def merge(self, probes: int, waited: float, sent: Iterable[float]):
+        """Fold in the counters of a pacer that ran in a shard worker process.
+
+        ``sent`` are ``time.monotonic()`` send times, which share one clock
+        across the processes of a host.
+        """
+        with self._lock:
+            self.probes += probes
+            self.waited += waited
+            window = self.recent.maxlen
+            self.recent = deque(sorted([*self.recent, *sent])[-window:], maxlen=window)
+
+    def achieved_rate(self) -> float:
+        with self._lock:
+            if len(self.recent) < 2:
+                return 0.0
+            span = self.recent[-1] - self.recent[0]
+            return (len(self.recent) - 1) / span if span > 0 else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "rate_limit": self.rate,
+            "burst": self.burst,
+            "subnet_rate_limit": self.subnet_rate,
+            "subnet_burst": self.subnet_burst,
+            "probes": self.probes,
+            "achieved_rate": self.achieved_rate(),
+            "total_wait_seconds": self.waited,
+            "subnets_tracked": len(self.subnets)
+        }
+
+probe_pacer = ProbePacer()
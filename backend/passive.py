@@ -0,0 +1,331 @@
+import asyncio
+import socket
+import struct
+import time
+import logging
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from dnswire import read_dns_name, skip_dns_name
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ETH_P_ALL = 0x0003
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_ARP = 0x0806
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+
+DHCP_PORTS = (67, 68)
+MDNS_PORT = 5353
+DHCP_MAGIC = b"\x63\x82\x53\x63"
+
+PCAP_LINKTYPE_ETHERNET = 1
+
+_u16 = struct.Struct("!H").unpack_from
+_dns_header = struct.Struct("!HHHHHH").unpack_from
+_dns_rr = struct.Struct("!HHIH").unpack_from
+
+# (mac, ip, hostname or None)
+Observation = Tuple[str, str, Optional[str]]
+
+def _ip(frame: memoryview, offset: int) -> str:
+    return socket.inet_ntoa(frame[offset:offset + 4])
+
+def _mac(frame: memoryview, offset: int) -> str:
+    return frame[offset:offset + 6].hex(":")
+
+def parse_arp(frame: memoryview, offset: int) -> Optional[Observation]:
+    """Sender hardware/protocol address of an Ethernet/IPv4 ARP packet"""
+    if len(frame) < offset + 28:
+        return None
+    # htype=1, ptype=0x0800, hlen=6, plen=4
+    if frame[offset + 4] != 6 or frame[offset + 5] != 4:
+        return None
+    spa = _ip(frame, offset + 14)
+    if spa == "0.0.0.0":  # ARP probe, no address yet
+        return None
+    return _mac(frame, offset + 8), spa, None
+
+def parse_dhcp(frame: memoryview, offset: int) -> Optional[Observation]:
+    """Client MAC, address and host name from a BOOTP/DHCP message"""
+    if len(frame) < offset + 240 or frame[offset + 236:offset + 240] != DHCP_MAGIC:
+        return None
+    op = frame[offset]
+    mac = _mac(frame, offset + 28)
+    ciaddr = _ip(frame, offset + 12)
+    yiaddr = _ip(frame, offset + 16)
+
+    requested = None
+    hostname = None
+    message_type = None
+    pos = offset + 240
+    end = len(frame)
+    while pos < end:
+        code = frame[pos]
+        if code == 255:
+            break
+        if code == 0:
+            pos += 1
+            continue
+        if pos + 1 >= end:
+            break
+        length = frame[pos + 1]
+        value = pos + 2
+        if value + length > end:
+            return None  # truncated (snaplen) or malformed
+        if code == 53 and length >= 1:
+            message_type = frame[value]
+        elif code == 50 and length == 4:
+            requested = _ip(frame, value)
+        elif code == 12 and length:
+            hostname = bytes(frame[value:value + length]).decode("utf-8", "replace")
+        pos = value + length
+
+    if op == 2:
+        # Server reply: only an ACK commits the lease
+        ip = yiaddr if message_type == 5 else None
+    else:
+        ip = requested or (ciaddr if ciaddr != "0.0.0.0" else None)
+    if ip is None or ip == "0.0.0.0":
+        return None
+    return mac, ip, hostname
+
+def parse_mdns(frame: memoryview, offset: int, mac: str, src_ip: str) -> Optional[Observation]:
+    """Announced host name from the A record of an mDNS response"""
+    end = len(frame)
+    if end < offset + 12:
+        return None
+    _, flags, qdcount, ancount, _, _ = _dns_header(frame, offset)
+    if not flags & 0x8000:
+        return mac, src_ip, None
+    pos = offset + 12
+    for _ in range(qdcount):
+        pos = skip_dns_name(frame, pos, end) + 4
+    for _ in range(ancount):
+        name_pos = pos
+        pos = skip_dns_name(frame, pos, end)
+        if pos + 10 > end:
+            break
+        rtype, _, _, rdlength = _dns_rr(frame, pos)
+        pos += 10
+        if pos + rdlength > end:
+            return None
+        if rtype == 1 and rdlength == 4 and _ip(frame, pos) == src_ip:
+            name = read_dns_name(frame, name_pos, offset, end)
+            return mac, src_ip, name[:-6] if name.endswith(".local") else name
+        pos += rdlength
+    return mac, src_ip, None
+
+def parse_frame(frame: memoryview) -> Optional[Observation]:
+    """Extract a device sighting from an Ethernet frame without copying it"""
+    if len(frame) < 14:
+        return None
+    offset = 12
+    ethertype = _u16(frame, offset)[0]
+    while ethertype in ETHERTYPE_VLAN and len(frame) >= offset + 6:
+        offset += 4
+        ethertype = _u16(frame, offset)[0]
+    offset += 2
+
+    if ethertype == ETHERTYPE_ARP:
+        return parse_arp(frame, offset)
+    if ethertype != ETHERTYPE_IPV4 or len(frame) < offset + 28:
+        return None
+    if frame[offset + 9] != 17:  # UDP only
+        return None
+    udp = offset + (frame[offset] & 0x0F) * 4
+    if len(frame) < udp + 8:
+        return None
+    sport = _u16(frame, udp)[0]
+    dport = _u16(frame, udp + 2)[0]
+    if sport in DHCP_PORTS and dport in DHCP_PORTS:
+        return parse_dhcp(frame, udp + 8)
+    if dport == MDNS_PORT or sport == MDNS_PORT:
+        src_ip = _ip(frame, offset + 12)
+        if src_ip == "0.0.0.0":
+            return None
+        return parse_mdns(frame, udp + 8, _mac(frame, 6), src_ip)
+    return None
+
+def iter_pcap(data) -> Iterator[memoryview]:
+    """Yield each Ethernet frame of a classic libpcap capture as a memoryview slice"""
+    view = memoryview(data)
+    if len(view) < 24:
+        return
+    magic = bytes(view[:4])
+    if magic in (b"\xd4\xc3\xb2\xa1", b"\x4d\x3c\xb2\xa1"):
+        endian = "<"
+    elif magic in (b"\xa1\xb2\xc3\xd4", b"\xa1\xb2\x3c\x4d"):
+        endian = ">"
+    else:
+        raise ValueError("Not a libpcap capture file")
+    linktype = struct.unpack_from(endian + "I", view, 20)[0]
+    if linktype != PCAP_LINKTYPE_ETHERNET:
+        raise ValueError(f"Unsupported pcap link type {linktype}")
+
+    record = struct.Struct(endian + "IIII")
+    pos = 24
+    end = len(view)
+    while pos + 16 <= end:
+        _, _, caplen, _ = record.unpack_from(view, pos)
+        pos += 16
+        if pos + caplen > end:
+            break
+        yield view[pos:pos + caplen]
+        pos += caplen
+
+class PassiveDiscovery:
+    """Collect device sightings from ARP/DHCP/mDNS traffic and upsert them in batches.
+
+    Sightings are coalesced per MAC; a MAC whose address and name have not
+    changed is re-written at most once per ``refresh_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        reconcile: Callable[[List[Dict]], Dict],
+        batch_size: int = 512,
+        flush_interval: float = 5.0,
+        refresh_interval: float = 60.0
+    ):
+        self.reconcile = reconcile
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.pending: Dict[str, Dict] = {}
+        self.flushed: Dict[str, Tuple[str, Optional[str], float]] = {}
+        self.packets = 0
+        self.sightings = 0
+        self.malformed = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def observe(self, observation: Observation, now: float = None) -> bool:
+        """Queue a sighting; returns True when the batch is full"""
+        mac, ip, hostname = observation
+        if mac == "00:00:00:00:00:00" or mac == "ff:ff:ff:ff:ff:ff":
+            return False
+        self.sightings += 1
+        previous = self.flushed.get(mac)
+        if previous is not None and previous[0] == ip and (hostname is None or previous[1] == hostname):
+            now = time.monotonic() if now is None else now
+            if now - previous[2] < self.refresh_interval:
+                return False
+        queued = self.pending.get(mac)
+        if queued is not None and hostname is None:
+            hostname = queued["hostname"]
+        self.pending[mac] = {"mac": mac, "ip": ip, "hostname": hostname}
+        return len(self.pending) >= self.batch_size
+
+    def ingest(self, frame: memoryview) -> bool:
+        self.packets += 1
+        try:
+            observation = parse_frame(frame)
+        except (struct.error, IndexError, ValueError, OSError):
+            # One bad frame must not abort a pcap replay or the sniffer's reader
+            self.malformed += 1
+            return False
+        if observation is None:
+            return False
+        return self.observe(observation)
+
+    def take_batch(self) -> List[Dict]:
+        batch = list(self.pending.values())
+        self.pending = {}
+        now = time.monotonic()
+        for device in batch:
+            previous = self.flushed.get(device["mac"])
+            hostname = device["hostname"] or (previous[1] if previous else None)
+            self.flushed[device["mac"]] = (device["ip"], hostname, now)
+        return batch
+
+    def flush(self) -> Dict:
+        batch = self.take_batch()
+        if not batch:
+            return {"new_devices": 0, "updated_devices": 0, "total": 0}
+        return self.reconcile(batch)
+
+    def ingest_pcap(self, path: str) -> Dict:
+        """Replay a pcap file through the parser and write the sightings"""
+        with open(path, "rb") as f:
+            data = f.read()
+        totals = {"packets": 0, "new_devices": 0, "updated_devices": 0}
+        for frame in iter_pcap(data):
+            totals["packets"] += 1
+            if self.ingest(frame):
+                summary = self.flush()
+                totals["new_devices"] += summary["new_devices"]
+                totals["updated_devices"] += summary["updated_devices"]
+        summary = self.flush()
+        totals["new_devices"] += summary["new_devices"]
+        totals["updated_devices"] += summary["updated_devices"]
+        return totals
+
+    async def run_socket(self, interface: str = None):
+        """Sniff from an AF_PACKET socket (Linux, needs CAP_NET_RAW)"""
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        if interface:
+            sock.bind((interface, 0))
+        sock.setblocking(False)
+        buffer = bytearray(65536)
+        view = memoryview(buffer)
+        wake = asyncio.Event()
+
+        def on_readable():
+            while True:
+                try:
+                    size = sock.recv_into(buffer)
+                except (BlockingIOError, InterruptedError):
+                    return
+                if self.ingest(view[:size]):
+                    wake.set()
+
+        loop.add_reader(sock.fileno(), on_readable)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+                batch = self.take_batch()
+                if batch:
+                    try:
+                        await loop.run_in_executor(None, self.reconcile, batch)
+                    except Exception as e:
+                        logger.error(f"Passive discovery flush failed: {e}")
+        finally:
+            loop.remove_reader(sock.fileno())
+            sock.close()
+
+    def start(self, interface: str = None) -> asyncio.Task:
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run_socket(interface))
+            self.task.add_done_callback(self._on_done)
+        return self.task
+
+    def _on_done(self, task: asyncio.Task):
+        # Typically PermissionError: raw sockets need root or CAP_NET_RAW
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Passive discovery stopped: {task.exception()!r}")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                pass  # logged by _on_done when the task failed
+            self.task = None
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.task is not None and not self.task.done(),
+            "packets": self.packets,
+            "sightings": self.sightings,
+            "malformed": self.malformed,
+            "pending": len(self.pending),
+            "devices_seen": len(self.flushed)
+        }
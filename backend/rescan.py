@@ -0,0 +1,220 @@
+import asyncio
+import ipaddress
+import random
+import time
+import logging
+import concurrent.futures
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from db import SessionLocal, Device
+from network import scan_single_host, get_local_networks
+from sync import entity_patch
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class HostState:
+    __slots__ = ("ip", "last_seen", "last_miss", "misses", "next_probe", "online")
+
+    def __init__(self, ip: str, next_probe: float, online: bool = False):
+        self.ip = ip
+        self.last_seen: Optional[float] = None
+        self.last_miss: Optional[float] = None
+        self.misses = 0
+        self.next_probe = next_probe
+        self.online = online
+
+class AdaptiveScheduler:
+    """Incremental rescanning driven by per-IP liveness history.
+
+    Hosts that answered are re-probed every ``live_interval`` seconds. Hosts
+    that miss back off exponentially up to ``max_interval``, which is also the
+    upper bound on how long a new device can go undetected. A previously live
+    host is marked offline after ``offline_after`` consecutive misses.
+    """
+
+    def __init__(
+        self,
+        reconcile: Callable[[List[Dict]], Dict],
+        broadcast: Callable[[Dict], Awaitable[None]] = None,
+        network_range: str = None,
+        live_interval: float = 30.0,
+        cold_interval: float = 120.0,
+        max_interval: float = 900.0,
+        offline_after: int = 3,
+        max_workers: int = 32,
+        probe: Callable[[str], Optional[Dict]] = scan_single_host
+    ):
+        self.reconcile = reconcile
+        self.broadcast = broadcast
+        self.network_range = network_range
+        self.live_interval = live_interval
+        self.cold_interval = cold_interval
+        self.max_interval = max_interval
+        self.offline_after = offline_after
+        self.max_workers = max_workers
+        self.probe = probe
+        self.hosts: Dict[str, HostState] = {}
+        self.probes_sent = 0
+        self.cycles = 0
+        self.started_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def seed(self, known_ips: List[str], now: float = None):
+        """Create state for every address in range, known devices due first"""
+        now = time.monotonic() if now is None else now
+        networks = [self.network_range] if self.network_range else get_local_networks()
+        known = set(known_ips)
+        rng = random.Random()
+        self.hosts = {}
+        addresses = (
+            address
+            for network_range in networks
+            for address in ipaddress.IPv4Network(network_range, strict=False).hosts()
+        )
+        for address in addresses:
+            ip = str(address)
+            if ip in known:
+                self.hosts[ip] = HostState(ip, now, online=True)
+            else:
+                # Spread the first cold pass out instead of sweeping in one burst
+                self.hosts[ip] = HostState(ip, now + rng.uniform(0, self.cold_interval))
+
+    def interval(self, state: HostState) -> float:
+        if state.misses == 0:
+            return self.live_interval
+        base = self.live_interval if state.last_seen is not None else self.cold_interval
+        return min(base * (2 ** (state.misses - 1)), self.max_interval)
+
+    def due(self, now: float = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        return [ip for ip, state in self.hosts.items() if state.next_probe <= now]
+
+    def record(self, ip: str, alive: bool, now: float = None) -> Optional[str]:
+        """Update liveness history and return 'online'/'offline' on a transition"""
+        now = time.monotonic() if now is None else now
+        state = self.hosts[ip]
+        transition = None
+        if alive:
+            if not state.online:
+                transition = "online"
+            state.online = True
+            state.last_seen = now
+            state.misses = 0
+        else:
+            state.last_miss = now
+            state.misses += 1
+            if state.online and state.misses >= self.offline_after:
+                state.online = False
+                transition = "offline"
+        state.next_probe = now + self.interval(state)
+        return transition
+
+    def stats(self) -> Dict:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        return {
+            "running": self.task is not None and not self.task.done(),
+            "hosts_tracked": len(self.hosts),
+            "hosts_online": sum(1 for state in self.hosts.values() if state.online),
+            "probes_sent": self.probes_sent,
+            "cycles": self.cycles,
+            "probes_per_minute": self.probes_sent * 60 / elapsed if elapsed else 0,
+            "max_detection_delay": self.max_interval
+        }
+
+    def _load_known_ips(self) -> List[str]:
+        db = SessionLocal()
+        try:
+            return [ip for (ip,) in db.query(Device.ip).filter(Device.status != "offline")]
+        finally:
+            db.close()
+
+    def _apply_transitions(self, online: List[str], offline: List[str]) -> List[Dict]:
+        """Flip active/offline status without touching blocked or kicked devices.
+
+        Returns device patches for the rows that actually changed.
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            changes = []
+            for ips, current, values in (
+                (online, "offline", {"status": "active", "last_seen": now, "updated_at": now}),
+                (offline, "active", {"status": "offline", "updated_at": now})
+            ):
+                if not ips:
+                    continue
+                query = db.query(Device).filter(Device.ip.in_(ips), Device.status == current)
+                ids = [device_id for (device_id,) in query.with_entities(Device.id)]
+                query.update(values, synchronize_session=False)
+                changes += [entity_patch("device", device_id, values) for device_id in ids]
+            db.commit()
+            return changes
+        finally:
+            db.close()
+
+    async def run_once(self, executor: concurrent.futures.Executor) -> Dict:
+        """Probe every due host once and persist what changed"""
+        loop = asyncio.get_running_loop()
+        due = self.due()
+        if not due:
+            return {"probed": 0}
+
+        results = await asyncio.gather(*(loop.run_in_executor(executor, self.probe, ip) for ip in due))
+        self.probes_sent += len(due)
+        self.cycles += 1
+
+        now = time.monotonic()
+        found, online, offline = [], [], []
+        for ip, result in zip(due, results):
+            transition = self.record(ip, result is not None, now)
+            if result is not None:
+                found.append(result)
+            if transition == "online":
+                online.append(ip)
+            elif transition == "offline":
+                offline.append(ip)
+
+        summary = {"new_devices": 0}
+        if found:
+            summary = await loop.run_in_executor(None, self.reconcile, found)
+        if online or offline:
+            changes = await loop.run_in_executor(None, self._apply_transitions, online, offline)
+            if self.broadcast is not None:
+                await self.broadcast({
+                    "type": "device_status_changed",
+                    "online": online,
+                    "offline": offline,
+                    "changes": changes
+                })
+        return {"probed": len(due), "found": len(found), "online": online, "offline": offline, **summary}
+
+    async def run_forever(self, tick: float = 1.0):
+        loop = asyncio.get_running_loop()
+        known = await loop.run_in_executor(None, self._load_known_ips)
+        self.seed(known)
+        self.started_at = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                try:
+                    await self.run_once(executor)
+                except Exception as e:
+                    logger.error(f"Adaptive rescan cycle failed: {e}")
+                next_due = min((state.next_probe for state in self.hosts.values()), default=None)
+                delay = tick if next_due is None else max(tick, next_due - time.monotonic())
+                await asyncio.sleep(min(delay, self.live_interval))
+
+    def start(self) -> asyncio.Task:
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run_forever())
+        return self.task
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
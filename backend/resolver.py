@@ -0,0 +1,286 @@
+import asyncio
+import random
+import socket
+import struct
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dnswire import read_dns_name, skip_dns_name
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESOLV_CONF_PATH = "/etc/resolv.conf"
+HOSTS_PATH = "/etc/hosts"
+DNS_PORT = 53
+DNS_TYPE_PTR = 12
+DNS_RCODE_NOERROR = 0
+DNS_RCODE_NXDOMAIN = 3
+
+_dns_header = struct.Struct("!HHHHHH")
+_dns_rr = struct.Struct("!HHIH")
+
+def read_nameservers(path: str = RESOLV_CONF_PATH) -> List[str]:
+    """IPv4 nameservers listed in resolv.conf"""
+    servers = []
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == "nameserver" and ":" not in parts[1]:
+                    servers.append(parts[1])
+    except OSError:
+        pass
+    return servers
+
+def read_hosts_file(path: str = HOSTS_PATH) -> Dict[str, str]:
+    """First name listed for each IPv4 address in the hosts file"""
+    names = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split("#", 1)[0].split()
+                if len(parts) >= 2 and ":" not in parts[0]:
+                    names.setdefault(parts[0], parts[1])
+    except OSError:
+        pass
+    return names
+
+def ptr_name(ip: str) -> str:
+    """The in-addr.arpa name of an IPv4 address"""
+    return ".".join(reversed(ip.split("."))) + ".in-addr.arpa"
+
+def build_ptr_query(query_id: int, ip: str) -> bytes:
+    """DNS query for the in-addr.arpa PTR record of an IPv4 address"""
+    qname = b"".join(bytes([len(label)]) + label.encode() for label in ptr_name(ip).split(".")) + b"\x00"
+    return _dns_header.pack(query_id, 0x0100, 1, 0, 0, 0) + qname + struct.pack("!HH", DNS_TYPE_PTR, 1)
+
+def parse_ptr_response(data: bytes) -> Tuple[int, str, Optional[str], Optional[int], Optional[bool]]:
+    """Return (query id, question name, host name, ttl, negative).
+
+    ``negative`` is True for NXDOMAIN or a NOERROR reply without a PTR record
+    and None for any other RCODE (SERVFAIL, REFUSED...), which says nothing
+    about the name.
+    """
+    view = memoryview(data)
+    end = len(view)
+    query_id, flags, qdcount, ancount, _, _ = _dns_header.unpack_from(view, 0)
+    pos = _dns_header.size
+    question = read_dns_name(view, pos, 0, end) if qdcount else ""
+    for _ in range(qdcount):
+        pos = skip_dns_name(view, pos, end) + 4
+    rcode = flags & 0x0F
+    if rcode == DNS_RCODE_NXDOMAIN:
+        return query_id, question, None, None, True
+    if rcode != DNS_RCODE_NOERROR:
+        return query_id, question, None, None, None
+    for _ in range(ancount):
+        pos = skip_dns_name(view, pos, end)
+        if pos + _dns_rr.size > end:
+            break
+        rtype, _, ttl, rdlength = _dns_rr.unpack_from(view, pos)
+        pos += _dns_rr.size
+        if rtype == DNS_TYPE_PTR:
+            return query_id, question, read_dns_name(view, pos, 0, end).rstrip("."), ttl, False
+        pos += rdlength
+    # NOERROR with no PTR record is a negative answer too
+    return query_id, question, None, None, True
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, resolver: "ReverseResolver"):
+        self.resolver = resolver
+
+    def datagram_received(self, data: bytes, addr):
+        try:
+            query_id, question, hostname, ttl, negative = parse_ptr_response(data)
+        except (struct.error, IndexError):
+            return
+        pending = self.resolver.queries.get(query_id)
+        if pending is None:
+            return
+        future, server, name = pending
+        # Only the nameserver that was asked, answering the question it was asked:
+        # a late reply to a reused id or a spoofed packet is dropped
+        if addr[:2] != server or question.lower() != name:
+            return
+        del self.resolver.queries[query_id]
+        if not future.done():
+            future.set_result((hostname, ttl, negative))
+
+class ReverseResolver:
+    """Concurrent PTR lookups with a bounded TTL/LRU cache.
+
+    Positive answers live for the record TTL (clamped to ``min_ttl``/``max_ttl``),
+    negative answers (NXDOMAIN, or no PTR record) for ``negative_ttl``. Server
+    failures and timeouts are not cached, so a resolver that is briefly down
+    does not hide names. Concurrent lookups of
+    the same address share one in-flight query. Without a usable resolv.conf
+    lookups fall back to ``socket.gethostbyaddr`` in the default executor.
+    """
+
+    def __init__(
+        self,
+        nameservers: List[str] = None,
+        timeout: float = 1.0,
+        max_entries: int = 4096,
+        min_ttl: float = 60.0,
+        max_ttl: float = 3600.0,
+        negative_ttl: float = 300.0
+    ):
+        self.nameservers = read_nameservers() if nameservers is None else nameservers
+        self.static_names = read_hosts_file() if self.nameservers else {}
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.cache: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.queries: Dict[int, Tuple[asyncio.Future, Tuple[str, int], str]] = {}  # id -> (future, server, qname)
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def cached(self, ip: str) -> Tuple[bool, Optional[str]]:
+        """Return (hit, hostname) from the cache, evicting the entry if expired"""
+        with self._lock:
+            entry = self.cache.get(ip)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if entry[1] <= time.monotonic():
+                del self.cache[ip]
+                self.misses += 1
+                return False, None
+            self.cache.move_to_end(ip)
+            self.hits += 1
+            return True, entry[0]
+
+    def store(self, ip: str, hostname: Optional[str], ttl: float = None):
+        if hostname is None:
+            ttl = self.negative_ttl
+        else:
+            ttl = min(max(ttl if ttl is not None else self.min_ttl, self.min_ttl), self.max_ttl)
+        with self._lock:
+            self.cache[ip] = (hostname, time.monotonic() + ttl)
+            self.cache.move_to_end(ip)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+
+    def lookup_sync(self, ip: str) -> Optional[str]:
+        """Blocking lookup through the same cache, for thread-pool callers"""
+        hit, hostname = self.cached(ip)
+        if hit:
+            return hostname
+        try:
+            hostname = socket.gethostbyaddr(ip)[0]
+        except socket.herror:
+            hostname = None
+        except Exception:
+            return None
+        self.store(ip, hostname)
+        return hostname
+
+    async def _ensure_transport(self):
+        loop = asyncio.get_running_loop()
+        # scan_network() runs each sweep in a fresh loop; sockets cannot follow it
+        if self.transport is not None and (self.transport.is_closing() or self._loop is not loop):
+            self.close()
+        if self.transport is None:
+            self.queries = {}
+            self.transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DnsProtocol(self), family=socket.AF_INET
+            )
+            self._loop = loop
+
+    async def _query(self, ip: str) -> Optional[str]:
+        if not self.nameservers:
+            loop = asyncio.get_running_loop()
+            try:
+                hostname = await asyncio.wait_for(
+                    loop.run_in_executor(None, lambda: socket.gethostbyaddr(ip)[0]), self.timeout
+                )
+            except socket.herror:
+                hostname = None
+            except Exception:
+                return None
+            self.store(ip, hostname)
+            return hostname
+
+        if ip in self.static_names:
+            self.store(ip, self.static_names[ip], self.max_ttl)
+            return self.static_names[ip]
+
+        await self._ensure_transport()
+        loop = asyncio.get_running_loop()
+        # Split the deadline across nameservers
+        per_server = self.timeout / len(self.nameservers)
+        name = ptr_name(ip)
+        failed = False
+        for server in self.nameservers:
+            query_id = random.getrandbits(16)
+            while query_id in self.queries:
+                query_id = random.getrandbits(16)
+            future = loop.create_future()
+            self.queries[query_id] = (future, (server, DNS_PORT), name)
+            try:
+                self.transport.sendto(build_ptr_query(query_id, ip), (server, DNS_PORT))
+                hostname, ttl, negative = await asyncio.wait_for(future, per_server)
+            except (asyncio.TimeoutError, OSError):
+                self.queries.pop(query_id, None)
+                continue
+            if hostname is not None or negative:
+                self.store(ip, hostname, ttl)
+                return hostname
+            failed = True  # SERVFAIL, REFUSED...: ask the next server
+        if failed:
+            self.failures += 1
+        else:
+            self.timeouts += 1
+        return None
+
+    async def resolve(self, ip: str) -> Optional[str]:
+        """Resolve an address to a host name, or None when it has no PTR record"""
+        hit, hostname = self.cached(ip)
+        if hit:
+            return hostname
+        future = self.inflight.get(ip)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = asyncio.ensure_future(self._query(ip))
+            self.inflight[ip] = future
+            future.add_done_callback(lambda _: self.inflight.pop(ip, None))
+        return await asyncio.shield(future)
+
+    async def resolve_many(self, ips: Iterable[str]) -> Dict[str, Optional[str]]:
+        ips = list(ips)
+        names = await asyncio.gather(*(self.resolve(ip) for ip in ips))
+        return dict(zip(ips, names))
+
+    def close(self):
+        if self.transport is not None:
+            try:
+                self.transport.close()
+            except RuntimeError:
+                pass  # owning loop already closed
+            self.transport = None
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "inflight": len(self.inflight)
+        }
+
+reverse_resolver = ReverseResolver()
@@ -0,0 +1,114 @@
+"""Revoked access tokens, checked on every authenticated request.
+
+Tokens carry a ``jti`` that names the login session. Revoking one writes a
+``revoked_tokens`` row (so it survives restarts) and adds the id to an
+in-memory dict, so a check is one hash lookup. Every entry keeps the token's
+own expiry: once that passes, the JWT is rejected anyway, so the entry is
+dropped from memory and from the table and the list never grows past the
+tokens still alive. Other workers learn about revocations from a
+``tokens_revoked`` event on the bus's internal topic.
+"""
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from db import RevokedToken, SessionLocal
+from sync import EventBus, INTERNAL_TOPIC
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _epoch(value: datetime) -> float:
+    # Naive UTC datetimes, as stored by the rest of the schema
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+class RevocationList:
+    def __init__(self):
+        self.expires: Dict[str, float] = {}  # jti -> token exp (epoch seconds)
+        self.heap: List[Tuple[float, str]] = []  # (exp, jti), earliest first
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.rejected = 0
+        self.expired = 0
+
+    def attach(self, event_bus: EventBus):
+        """Apply revocations published by other workers"""
+        event_bus.subscribe(self._on_event, topics=[INTERNAL_TOPIC])
+
+    def load(self, db: Optional[Session] = None) -> int:
+        """Read live revocations from the database and delete expired ones"""
+        own = db is None
+        db = db or SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.query(RevokedToken).filter(RevokedToken.expires_at <= now).delete()
+            db.commit()
+            rows = db.query(RevokedToken.jti, RevokedToken.expires_at).all()
+        finally:
+            if own:
+                db.close()
+        self._add((jti, _epoch(expires_at)) for jti, expires_at in rows)
+        logger.info(f"Loaded {len(rows)} revoked tokens")
+        return len(rows)
+
+    def is_revoked(self, jti: str) -> bool:
+        self.checks += 1
+        if self.heap and self.heap[0][0] <= time.time():
+            self._prune()
+        if jti in self.expires:
+            self.rejected += 1
+            return True
+        return False
+
+    def revoke(self, db: Session, tokens: Iterable[Tuple[str, int, datetime]], event_bus: Optional[EventBus] = None) -> int:
+        """Persist and apply revocations of (jti, user_id, expires_at); returns how many are new"""
+        now = datetime.utcnow()
+        live = [(jti, user_id, expires_at) for jti, user_id, expires_at in tokens if jti and expires_at and expires_at > now]
+        for jti, user_id, expires_at in live:
+            db.merge(RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at, revoked_at=now))
+        db.query(RevokedToken).filter(RevokedToken.expires_at <= now).delete()
+        db.commit()
+
+        entries = [(jti, _epoch(expires_at)) for jti, _, expires_at in live]
+        added = self._add(entries)
+        if entries and event_bus is not None:
+            event_bus.publish({"type": "tokens_revoked", "tokens": entries})
+        return added
+
+    def _on_event(self, message: Dict):
+        if message.get("type") == "tokens_revoked":
+            self._add((jti, expires) for jti, expires in message.get("tokens", ()))
+
+    def _add(self, entries: Iterable[Tuple[str, float]]) -> int:
+        added = 0
+        with self._lock:
+            for jti, expires in entries:
+                if jti not in self.expires:
+                    added += 1
+                self.expires[jti] = expires
+                heapq.heappush(self.heap, (expires, jti))
+        return added
+
+    def _prune(self):
+        now = time.time()
+        with self._lock:
+            while self.heap and self.heap[0][0] <= now:
+                expires, jti = heapq.heappop(self.heap)
+                if self.expires.get(jti) == expires:
+                    del self.expires[jti]
+                    self.expired += 1
+
+    def stats(self) -> Dict:
+        return {
+            "revoked": len(self.expires),
+            "checks": self.checks,
+            "rejected": self.rejected,
+            "expired": self.expired
+        }
+
+revocations = RevocationList()
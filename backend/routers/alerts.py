@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
 
-from db import get_db, Alert
+from db import get_async_db, Alert
 from auth import get_current_user, User
+from sync import bus, entity_patch, entity_delete, entity_reset
 
 router = APIRouter()
 
@@ -24,67 +26,86 @@ async def get_alerts(
     skip: int = 0,
     limit: int = 50,
     unread_only: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Alert)
+    query = select(Alert)
     
     if unread_only:
-        query = query.filter(Alert.read == False)
+        query = query.where(Alert.read == False)
     
-    alerts = query.order_by(Alert.timestamp.desc()).offset(skip).limit(limit).all()
-    return alerts
+    alerts = await db.scalars(query.order_by(Alert.timestamp.desc()).offset(skip).limit(limit))
+    return alerts.all()
 
 @router.patch("/{alert_id}/read")
 async def mark_alert_read(
     alert_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    alert = db.query(Alert).filter(Alert.id == alert_id).first()
+    alert = await db.get(Alert, alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
     alert.read = True
-    db.commit()
+    await db.commit()
+    
+    bus.publish({
+        "type": "alert_updated",
+        "alert_id": alert_id,
+        "changes": [entity_patch("alert", alert_id, {"read": True})]
+    })
     
     return {"success": True}
 
 @router.post("/mark-all-read")
 async def mark_all_read(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    db.query(Alert).filter(Alert.read == False).update({"read": True})
-    db.commit()
+    await db.execute(update(Alert).where(Alert.read == False).values(read=True))
+    await db.commit()
+    
+    bus.publish({"type": "alerts_changed", "changes": [entity_reset("alert")]})
     
     return {"success": True}
 
 @router.delete("/{alert_id}")
 async def delete_alert(
     alert_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    alert = db.query(Alert).filter(Alert.id == alert_id).first()
+    alert = await db.get(Alert, alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
-    db.delete(alert)
-    db.commit()
+    await db.delete(alert)
+    await db.commit()
+    
+    bus.publish({
+        "type": "alert_deleted",
+        "alert_id": alert_id,
+        "changes": [entity_delete("alert", alert_id)]
+    })
     
     return {"success": True}
 
 @router.get("/stats")
 async def get_alert_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    total = db.query(Alert).count()
-    unread = db.query(Alert).filter(Alert.read == False).count()
-    info = db.query(Alert).filter(Alert.level == "info").count()
-    warning = db.query(Alert).filter(Alert.level == "warning").count()
-    danger = db.query(Alert).filter(Alert.level == "danger").count()
+    # One pass over the table instead of a query per counter
+    total, unread, info, warning, danger = (await db.execute(
+        select(
+            func.count(),
+            func.count(case((Alert.read == False, 1))),
+            func.count(case((Alert.level == "info", 1))),
+            func.count(case((Alert.level == "warning", 1))),
+            func.count(case((Alert.level == "danger", 1)))
+        ).select_from(Alert)
+    )).one()
     
     return {
         "total": total,
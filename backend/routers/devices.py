@@ -1,18 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import case, insert, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
-from db import get_db, Device, Alert
+from db import get_async_db, SessionLocal, Device, Alert
 from auth import get_current_user, User
-from network import scan_network, get_network_range
+from scan_jobs import scan_jobs
+from rescan import AdaptiveScheduler
+from passive import PassiveDiscovery
+from resolver import reverse_resolver
+from pacing import probe_pacer
+from oui import oui_index
 import sys
 sys.path.append('..')
-from sync import ConnectionManager
+from sync import bus, entity_upsert, entity_delete, entity_reset, MAX_DELTA_ENTITIES
+from routers.alerts import AlertResponse
 
 router = APIRouter()
-manager = ConnectionManager()
+
+UNKNOWN_HOSTNAME = "Unknown"
+SORTABLE_COLUMNS = ("vendor", "hostname", "ip", "mac", "role", "status", "last_seen")
+
+# Started from main.py when ADAPTIVE_RESCAN / PASSIVE_DISCOVERY are enabled
+rescan_scheduler = None
+passive_discovery = None
 
 class DeviceCreate(BaseModel):
     mac: str
@@ -29,6 +44,7 @@ class DeviceResponse(BaseModel):
     mac: str
     ip: str
     hostname: str
+    vendor: Optional[str] = None
     role: str
     last_seen: datetime
     status: str
@@ -41,82 +57,210 @@ class DeviceResponse(BaseModel):
 async def get_devices(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    sort: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    devices = db.query(Device).offset(skip).limit(limit).all()
-    return devices
+    query = select(Device)
+    if sort is not None:
+        if sort not in SORTABLE_COLUMNS:
+            raise HTTPException(status_code=400, detail=f"Cannot sort by {sort}")
+        column = getattr(Device, sort)
+        # Devices without a value (e.g. unregistered vendor) go last
+        query = query.order_by(column.is_(None), column, Device.id)
+    devices = await db.scalars(query.offset(skip).limit(limit))
+    return devices.all()
+
+def bulk_reconcile(db: Session, discovered: List[dict]) -> dict:
+    """Upsert scan results in one batch and raise alerts for new devices"""
+    now = datetime.utcnow()
+    
+    # Last sighting wins when a MAC shows up more than once. A sighting without
+    # a name (passive discovery, failed reverse lookup) never clobbers a known one.
+    by_mac = {
+        device_data["mac"]: {**device_data, "hostname": device_data.get("hostname") or UNKNOWN_HOSTNAME}
+        for device_data in discovered
+    }
+    
+    known = {
+        mac: (ip, hostname, status)
+        for mac, ip, hostname, status in db.query(Device.mac, Device.ip, Device.hostname, Device.status)
+    }
+    
+    new, changed, unchanged = [], [], []
+    for mac, device_data in by_mac.items():
+        if mac not in known:
+            new.append(device_data)
+        elif known[mac][0] != device_data["ip"] or known[mac][2] == "offline" or (
+            device_data["hostname"] != UNKNOWN_HOSTNAME and known[mac][1] != device_data["hostname"]
+        ):
+            changed.append(device_data)
+        else:
+            unchanged.append(device_data)
+    
+    if by_mac:
+        vendors = oui_index.lookup_many(by_mac)
+        stmt = sqlite_insert(Device)
+        hostname = case(
+            (stmt.excluded.hostname == UNKNOWN_HOSTNAME, Device.hostname),
+            else_=stmt.excluded.hostname
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Device.mac],
+            set_={
+                "ip": stmt.excluded.ip,
+                "hostname": hostname,
+                "vendor": stmt.excluded.vendor,
+                "last_seen": stmt.excluded.last_seen,
+                # Seen again: back from offline, while blocked/kicked stay as they are
+                "status": case((Device.status == "offline", "active"), else_=Device.status),
+                # Only bump updated_at when something actually changed
+                "updated_at": case(
+                    (
+                        or_(Device.ip != stmt.excluded.ip, Device.hostname != hostname, Device.status == "offline"),
+                        stmt.excluded.updated_at
+                    ),
+                    else_=Device.updated_at
+                )
+            }
+        )
+        db.execute(stmt, [
+            {
+                "mac": mac,
+                "ip": device_data["ip"],
+                "hostname": device_data["hostname"],
+                "vendor": vendors[mac],
+                "role": "Others",
+                "status": "active",
+                "last_seen": now,
+                "updated_at": now
+            }
+            for mac, device_data in by_mac.items()
+        ])
+    
+    alerts = []
+    if new:
+        alerts = db.scalars(insert(Alert).returning(Alert), [
+            {
+                "message": f"New device detected: {device_data['hostname']} ({device_data['ip']})",
+                "level": "info",
+                "timestamp": now,
+                "read": False
+            }
+            for device_data in new
+        ]).all()
+    
+    db.commit()
+    
+    return {
+        "new_devices": len(new),
+        "updated_devices": len(changed) + len(unchanged),
+        "changed_devices": len(changed),
+        "total": len(discovered),
+        "changes": reconcile_changes(db, new + changed, alerts)
+    }
+
+def reconcile_changes(db: Session, touched: List[dict], alerts: List[Alert]) -> List[dict]:
+    """Delta records for devices a reconcile added or changed, and the alerts it raised"""
+    changes = []
+    if len(touched) > MAX_DELTA_ENTITIES:
+        changes.append(entity_reset("device"))
+    elif touched:
+        rows = db.query(Device).filter(Device.mac.in_([device_data["mac"] for device_data in touched]))
+        changes += [entity_upsert("device", DeviceResponse.model_validate(row).model_dump(mode="json")) for row in rows]
+    if len(alerts) > MAX_DELTA_ENTITIES:
+        changes.append(entity_reset("alert"))
+    else:
+        changes += [entity_upsert("alert", AlertResponse.model_validate(alert).model_dump(mode="json")) for alert in alerts]
+    return changes
+
+def reconcile_devices(discovered: List[dict]) -> dict:
+    """Write scan results to the device table from a worker thread and publish what changed"""
+    db = SessionLocal()
+    try:
+        summary = bulk_reconcile(db, discovered)
+    finally:
+        db.close()
+    changes = summary.pop("changes")
+    if changes:
+        bus.publish({"type": "devices_changed", "changes": changes})
+    return summary
+
+def create_rescan_scheduler(**kwargs) -> AdaptiveScheduler:
+    """Create the adaptive rescan scheduler wired to this router's reconcile path"""
+    global rescan_scheduler
+    rescan_scheduler = AdaptiveScheduler(reconcile_devices, bus.broadcast, **kwargs)
+    return rescan_scheduler
+
+def create_passive_discovery(**kwargs) -> PassiveDiscovery:
+    """Create the passive ARP/DHCP/mDNS discovery engine wired to the bulk upsert"""
+    global passive_discovery
+    passive_discovery = PassiveDiscovery(reconcile_devices, **kwargs)
+    return passive_discovery
 
 @router.post("/scan")
 async def scan_devices(
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Scan network and update device database"""
-    try:
-        # Perform network scan
-        discovered = scan_network()
-        
-        new_devices = 0
-        updated_devices = 0
-        
-        for device_data in discovered:
-            existing = db.query(Device).filter(Device.mac == device_data["mac"]).first()
-            
-            if existing:
-                # Update existing device
-                existing.ip = device_data["ip"]
-                existing.hostname = device_data["hostname"]
-                existing.last_seen = datetime.utcnow()
-                existing.updated_at = datetime.utcnow()
-                updated_devices += 1
-            else:
-                # Create new device
-                new_device = Device(
-                    mac=device_data["mac"],
-                    ip=device_data["ip"],
-                    hostname=device_data["hostname"],
-                    role="Others",
-                    status="active"
-                )
-                db.add(new_device)
-                new_devices += 1
-                
-                # Create alert for new device
-                alert = Alert(
-                    message=f"New device detected: {device_data['hostname']} ({device_data['ip']})",
-                    level="info",
-                    timestamp=datetime.utcnow()
-                )
-                db.add(alert)
-        
-        db.commit()
-        
-        # Broadcast update via WebSocket
-        await manager.broadcast({
-            "type": "scan_complete",
-            "new_devices": new_devices,
-            "updated_devices": updated_devices,
-            "total": len(discovered)
-        })
-        
-        return {
-            "success": True,
-            "discovered": len(discovered),
-            "new_devices": new_devices,
-            "updated_devices": updated_devices
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Start a background network scan, or join the one already in progress"""
+    job, created = scan_jobs.submit(bus.broadcast, reconcile_devices)
+    return {
+        "success": True,
+        "job_id": job.id,
+        "created": created,
+        "status": job.status
+    }
+
+@router.get("/rescan/stats")
+async def get_rescan_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """Get adaptive rescan probe counters"""
+    if rescan_scheduler is None:
+        return {"running": False}
+    return rescan_scheduler.stats()
+
+@router.get("/passive/stats")
+async def get_passive_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """Get passive discovery packet counters"""
+    if passive_discovery is None:
+        return {"running": False}
+    return passive_discovery.stats()
+
+@router.get("/resolver/stats")
+async def get_resolver_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """Get reverse-DNS cache counters"""
+    return reverse_resolver.stats()
+
+@router.get("/pacing/stats")
+async def get_pacing_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """Get configured probe limits and the achieved probe rate"""
+    return probe_pacer.stats()
+
+@router.get("/scan/{job_id}")
+async def get_scan_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Get status and progress of a scan job"""
+    job = scan_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    return job.to_dict()
 
 @router.get("/{device_id}", response_model=DeviceResponse)
 async def get_device(
     device_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    device = db.query(Device).filter(Device.id == device_id).first()
+    device = await db.get(Device, device_id)
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
     return device
@@ -125,10 +269,10 @@ async def get_device(
 async def update_device(
     device_id: int,
     update: DeviceUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    device = db.query(Device).filter(Device.id == device_id).first()
+    device = await db.get(Device, device_id)
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
     
@@ -138,17 +282,18 @@ async def update_device(
         device.status = update.status
     
     device.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(device)
+    await db.commit()
+    await db.refresh(device)
     
     # Broadcast update
-    await manager.broadcast({
+    bus.publish({
         "type": "device_updated",
         "device_id": device.id,
         "mac": device.mac,
         "role": device.role,
         "status": device.status,
-        "updated_by": current_user.username
+        "updated_by": current_user.username,
+        "changes": [entity_upsert("device", DeviceResponse.model_validate(device).model_dump(mode="json"))]
     })
     
     return {"success": True, "device": DeviceResponse.from_orm(device)}
@@ -156,21 +301,22 @@ async def update_device(
 @router.delete("/{device_id}")
 async def delete_device(
     device_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    device = db.query(Device).filter(Device.id == device_id).first()
+    device = await db.get(Device, device_id)
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
     
-    db.delete(device)
-    db.commit()
+    await db.delete(device)
+    await db.commit()
     
     # Broadcast deletion
-    await manager.broadcast({
+    bus.publish({
         "type": "device_deleted",
         "device_id": device_id,
-        "deleted_by": current_user.username
+        "deleted_by": current_user.username,
+        "changes": [entity_delete("device", device_id)]
     })
     
     return {"success": True, "message": "Device deleted"}
\ No newline at end of file
@@ -1,18 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
 
-from db import get_db, FirewallLog, Device, Alert
+from db import get_db, get_async_db, FirewallLog, Device, Alert
 from auth import get_current_user, User
 from firewall import block_ip, unblock_ip
 import sys
 sys.path.append('..')
-from sync import ConnectionManager
+from sync import bus, entity_upsert, entity_patch
+from routers.alerts import AlertResponse
 
 router = APIRouter()
-manager = ConnectionManager()
 
 class FirewallAction(BaseModel):
     ip: str
@@ -80,14 +82,22 @@ async def perform_firewall_action(
     
     db.commit()
     
+    changes = [
+        entity_upsert("firewall_log", FirewallLogResponse.model_validate(log_entry).model_dump(mode="json")),
+        entity_upsert("alert", AlertResponse.model_validate(alert).model_dump(mode="json"))
+    ]
+    if device:
+        changes.append(entity_patch("device", device.id, {"status": device.status, "updated_at": device.updated_at}))
+    
     # Broadcast update
-    await manager.broadcast({
+    bus.publish({
         "type": "firewall_action",
         "action": action,
         "ip": ip,
         "success": result["success"],
         "message": result["message"],
-        "admin": current_user.username
+        "admin": current_user.username,
+        "changes": changes
     })
     
     return result
@@ -132,12 +142,17 @@ async def kick_device(
     db.commit()
     
     # Broadcast
-    await manager.broadcast({
+    bus.publish({
         "type": "device_kicked",
         "device_id": device_id,
         "ip": device.ip,
         "hostname": device.hostname,
-        "kicked_by": current_user.username
+        "kicked_by": current_user.username,
+        "changes": [
+            entity_patch("device", device.id, {"status": device.status, "updated_at": device.updated_at}),
+            entity_upsert("firewall_log", FirewallLogResponse.model_validate(log_entry).model_dump(mode="json")),
+            entity_upsert("alert", AlertResponse.model_validate(alert).model_dump(mode="json"))
+        ]
     })
     
     return {"success": result["success"], "message": result["message"]}
@@ -146,25 +161,30 @@ async def kick_device(
 async def get_firewall_logs(
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    logs = db.query(FirewallLog).order_by(
+    logs = await db.scalars(select(FirewallLog).order_by(
         FirewallLog.timestamp.desc()
-    ).offset(skip).limit(limit).all()
-    return logs
+    ).offset(skip).limit(limit))
+    return logs.all()
 
 @router.get("/stats")
 async def get_firewall_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    total_actions = db.query(FirewallLog).count()
-    blocks = db.query(FirewallLog).filter(FirewallLog.action == "block").count()
-    unblocks = db.query(FirewallLog).filter(FirewallLog.action == "unblock").count()
-    kicks = db.query(FirewallLog).filter(FirewallLog.action == "kick").count()
-    successes = db.query(FirewallLog).filter(FirewallLog.success == True).count()
-    failures = db.query(FirewallLog).filter(FirewallLog.success == False).count()
+    # All six counters in a single scan of the log
+    total_actions, blocks, unblocks, kicks, successes, failures = (await db.execute(
+        select(
+            func.count(),
+            func.count(case((FirewallLog.action == "block", 1))),
+            func.count(case((FirewallLog.action == "unblock", 1))),
+            func.count(case((FirewallLog.action == "kick", 1))),
+            func.count(case((FirewallLog.success == True, 1))),
+            func.count(case((FirewallLog.success == False, 1)))
+        ).select_from(FirewallLog)
+    )).one()
     
     return {
         "total_actions": total_actions,
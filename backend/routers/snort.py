@@ -3,8 +3,10 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Literal
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
-from db import get_db, Base
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, case, delete, func, select
+from db import get_db, get_async_db, Base
+from sync import bus, entity_patch, entity_delete, entity_reset
 import subprocess
 import os
 import re
@@ -258,25 +260,32 @@ async def get_snort_status():
 
 
 @router.get("/stats", response_model=SnortStats)
-async def get_snort_stats(db: Session = Depends(get_db)):
+async def get_snort_stats(db: AsyncSession = Depends(get_async_db)):
     """Get Snort statistics"""
-    from sqlalchemy import func
     from datetime import date
     
-    total_rules = db.query(SnortRule).count()
-    enabled_rules = db.query(SnortRule).filter(SnortRule.enabled == True).count()
-    custom_rules = db.query(SnortRule).filter(SnortRule.custom == True).count()
-    
-    total_alerts = db.query(SnortAlert).count()
-    unack_alerts = db.query(SnortAlert).filter(SnortAlert.acknowledged == False).count()
+    # One query per table instead of one per counter
+    total_rules, enabled_rules, custom_rules = (await db.execute(
+        select(
+            func.count(),
+            func.count(case((SnortRule.enabled == True, 1))),
+            func.count(case((SnortRule.custom == True, 1)))
+        ).select_from(SnortRule)
+    )).one()
     
     today = datetime.combine(date.today(), datetime.min.time())
-    alerts_today = db.query(SnortAlert).filter(SnortAlert.timestamp >= today).count()
-    
-    critical_alerts = db.query(SnortAlert).filter(SnortAlert.severity == "critical").count()
-    high_alerts = db.query(SnortAlert).filter(SnortAlert.severity == "high").count()
-    medium_alerts = db.query(SnortAlert).filter(SnortAlert.severity == "medium").count()
-    low_alerts = db.query(SnortAlert).filter(SnortAlert.severity == "low").count()
+    (total_alerts, unack_alerts, alerts_today,
+     critical_alerts, high_alerts, medium_alerts, low_alerts) = (await db.execute(
+        select(
+            func.count(),
+            func.count(case((SnortAlert.acknowledged == False, 1))),
+            func.count(case((SnortAlert.timestamp >= today, 1))),
+            func.count(case((SnortAlert.severity == "critical", 1))),
+            func.count(case((SnortAlert.severity == "high", 1))),
+            func.count(case((SnortAlert.severity == "medium", 1))),
+            func.count(case((SnortAlert.severity == "low", 1)))
+        ).select_from(SnortAlert)
+    )).one()
     
     return SnortStats(
         total_rules=total_rules,
@@ -448,53 +457,65 @@ async def get_alerts(
     severity: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get Snort alerts with optional filtering"""
-    query = db.query(SnortAlert).order_by(SnortAlert.timestamp.desc())
+    query = select(SnortAlert).order_by(SnortAlert.timestamp.desc())
     
     if acknowledged is not None:
-        query = query.filter(SnortAlert.acknowledged == acknowledged)
+        query = query.where(SnortAlert.acknowledged == acknowledged)
     if severity:
-        query = query.filter(SnortAlert.severity == severity)
+        query = query.where(SnortAlert.severity == severity)
     
-    alerts = query.offset(skip).limit(limit).all()
-    return alerts
+    alerts = await db.scalars(query.offset(skip).limit(limit))
+    return alerts.all()
 
 
 @router.patch("/alerts/{alert_id}/acknowledge")
-async def acknowledge_alert(alert_id: int, db: Session = Depends(get_db)):
+async def acknowledge_alert(alert_id: int, db: AsyncSession = Depends(get_async_db)):
     """Acknowledge an alert"""
-    alert = db.query(SnortAlert).filter(SnortAlert.id == alert_id).first()
+    alert = await db.get(SnortAlert, alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
     alert.acknowledged = True
-    db.commit()
+    await db.commit()
+    bus.publish({
+        "type": "snort_update",
+        "alert_id": alert_id,
+        "changes": [entity_patch("snort_alert", alert_id, {"acknowledged": True})]
+    })
     return {"message": "Alert acknowledged"}
 
 
 @router.delete("/alerts/{alert_id}")
-async def delete_alert(alert_id: int, db: Session = Depends(get_db)):
+async def delete_alert(alert_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete an alert"""
-    alert = db.query(SnortAlert).filter(SnortAlert.id == alert_id).first()
+    alert = await db.get(SnortAlert, alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
-    db.delete(alert)
-    db.commit()
+    await db.delete(alert)
+    await db.commit()
+    bus.publish({
+        "type": "snort_update",
+        "alert_id": alert_id,
+        "changes": [entity_delete("snort_alert", alert_id)]
+    })
     return {"message": "Alert deleted"}
 
 
 @router.post("/alerts/clear")
-async def clear_alerts(acknowledged_only: bool = True, db: Session = Depends(get_db)):
+async def clear_alerts(acknowledged_only: bool = True, db: AsyncSession = Depends(get_async_db)):
     """Clear alerts (acknowledged only by default)"""
-    query = db.query(SnortAlert)
+    query = delete(SnortAlert)
     if acknowledged_only:
-        query = query.filter(SnortAlert.acknowledged == True)
+        query = query.where(SnortAlert.acknowledged == True)
     
-    count = query.delete()
-    db.commit()
+    count = (await db.execute(query)).rowcount
+    await db.commit()
+    if count:
+        bus.publish({"type": "snort_update", "changes": [entity_reset("snort_alert")]})
     return {"message": f"Cleared {count} alerts"}
 
 
@@ -5,13 +5,13 @@ from typing import List, Optional
 from datetime import datetime
 
 from db import get_db, User, Alert, Session as UserSession
-from auth import get_current_user, get_password_hash
+from auth import get_current_user, hash_password, principal_cache, revoke_sessions
 import sys
 sys.path.append('..')
-from sync import ConnectionManager
+from sync import bus, entity_upsert, entity_delete
+from routers.alerts import AlertResponse
 
 router = APIRouter()
-manager = ConnectionManager()
 
 class UserCreate(BaseModel):
     username: str
@@ -64,7 +64,7 @@ async def create_user(
     
     new_user = User(
         username=user.username,
-        hashed_password=get_password_hash(user.password),
+        hashed_password=await hash_password(user.password),
         role=user.role
     )
     db.add(new_user)
@@ -72,11 +72,12 @@ async def create_user(
     db.refresh(new_user)
     
     # Broadcast new user
-    await manager.broadcast({
+    bus.publish({
         "type": "user_created",
         "username": new_user.username,
         "role": new_user.role,
-        "created_by": current_user.username
+        "created_by": current_user.username,
+        "changes": [entity_upsert("user", UserResponse.model_validate(new_user).model_dump(mode="json"))]
     })
     
     return new_user
@@ -93,12 +94,13 @@ async def update_user(
         raise HTTPException(status_code=404, detail="User not found")
     
     if update.password:
-        user.hashed_password = get_password_hash(update.password)
+        user.hashed_password = await hash_password(update.password)
     if update.role:
         user.role = update.role
     
     db.commit()
     db.refresh(user)
+    principal_cache.invalidate_user(user.username)
     
     return {"success": True, "user": UserResponse.from_orm(user)}
 
@@ -119,11 +121,14 @@ async def delete_user(
     username = user.username
     db.delete(user)
     db.commit()
+    revoke_sessions(db, user_id)
+    principal_cache.invalidate_user(username)
     
-    await manager.broadcast({
+    bus.publish({
         "type": "user_deleted",
         "username": username,
-        "deleted_by": current_user.username
+        "deleted_by": current_user.username,
+        "changes": [entity_delete("user", user_id)]
     })
     
     return {"success": True, "message": "User deleted"}
@@ -133,7 +138,11 @@ async def get_active_sessions(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    sessions = db.query(UserSession).filter(UserSession.active == True).all()
+    now = datetime.utcnow()
+    sessions = db.query(UserSession).filter(
+        UserSession.active == True,
+        (UserSession.expires_at == None) | (UserSession.expires_at > now)
+    ).all()
     return sessions
 
 @router.post("/kick/{user_id}")
@@ -142,21 +151,13 @@ async def kick_user(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # End all active sessions for the user
-    sessions = db.query(UserSession).filter(
-        UserSession.user_id == user_id,
-        UserSession.active == True
-    ).all()
-    
-    for session in sessions:
-        session.active = False
-        session.ended_at = datetime.utcnow()
-    
-    db.commit()
+    # End all active sessions for the user; their tokens stop working immediately
+    sessions_ended = revoke_sessions(db, user_id)
     
     # Create alert
     user = db.query(User).filter(User.id == user_id).first()
     if user:
+        principal_cache.invalidate_user(user.username)
         alert = Alert(
             message=f"User {user.username} was kicked by {current_user.username}",
             level="warning",
@@ -165,11 +166,12 @@ async def kick_user(
         db.add(alert)
         db.commit()
         
-        await manager.broadcast({
+        bus.publish({
             "type": "user_kicked",
             "user_id": user_id,
             "username": user.username,
-            "kicked_by": current_user.username
+            "kicked_by": current_user.username,
+            "changes": [entity_upsert("alert", AlertResponse.model_validate(alert).model_dump(mode="json"))]
         })
     
-    return {"success": True, "sessions_ended": len(sessions)}
\ No newline at end of file
+    return {"success": True, "sessions_ended": sessions_ended}
\ No newline at end of file
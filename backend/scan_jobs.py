@@ -0,0 +1,159 @@
+import asyncio
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from network import async_scan_networks, get_local_networks
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 0.5  # seconds between scan_progress events
+
+class ScanJob:
+    def __init__(self, networks: List[str]):
+        self.id = uuid.uuid4().hex
+        self.networks = networks
+        self.network_range = ",".join(networks)
+        self.status = "pending"  # pending, running, completed, failed
+        self.hosts_total = 0
+        self.hosts_scanned = 0
+        self.devices: List[Dict] = []
+        self.summary: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "network_range": self.network_range,
+            "networks": self.networks,
+            "hosts_total": self.hosts_total,
+            "hosts_scanned": self.hosts_scanned,
+            "progress": self.hosts_scanned / self.hosts_total if self.hosts_total else 0,
+            "discovered": len(self.devices),
+            "summary": self.summary,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class ScanJobManager:
+    """Runs network scans as background jobs, one sweep per set of networks at a time"""
+
+    def __init__(self, max_jobs: int = 20):
+        self.jobs: "OrderedDict[str, ScanJob]" = OrderedDict()
+        self.max_jobs = max_jobs
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        return self.jobs.get(job_id)
+
+    def active_job(self, network_range: str) -> Optional[ScanJob]:
+        for job in self.jobs.values():
+            if job.network_range == network_range and not job.done:
+                return job
+        return None
+
+    def submit(
+        self,
+        broadcast: Callable[[Dict], Awaitable[None]],
+        reconcile: Callable[[List[Dict]], Dict],
+        networks: List[str] = None
+    ) -> Tuple[ScanJob, bool]:
+        """Start a scan job, or join the one already running for these networks.
+
+        ``networks`` defaults to every prefix on the local interfaces.
+
+        ``reconcile(devices)`` is a blocking DB write run in the default executor
+        once the sweep finishes; its return value becomes the job summary.
+        Returns the job and whether it was newly created.
+        """
+        if networks is None:
+            networks = get_local_networks()
+
+        existing = self.active_job(",".join(networks))
+        if existing is not None:
+            return existing, False
+
+        job = ScanJob(networks)
+        self.jobs[job.id] = job
+        self._trim()
+        job.task = asyncio.ensure_future(self._run(job, broadcast, reconcile))
+        return job, True
+
+    def _trim(self):
+        while len(self.jobs) > self.max_jobs:
+            oldest = next((jid for jid, job in self.jobs.items() if job.done), None)
+            if oldest is None:
+                break
+            del self.jobs[oldest]
+
+    async def _run(self, job: ScanJob, broadcast, reconcile):
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        last_progress = 0.0
+
+        def on_host(device: Dict):
+            job.devices.append(device)
+            events.put_nowait({"type": "scan_host", "job_id": job.id, "device": device})
+
+        def on_progress(scanned: int, total: int):
+            nonlocal last_progress
+            job.hosts_scanned = scanned
+            job.hosts_total = total
+            now = time.monotonic()
+            if scanned == total or now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                events.put_nowait({
+                    "type": "scan_progress",
+                    "job_id": job.id,
+                    "scanned": scanned,
+                    "total": total,
+                    "discovered": len(job.devices)
+                })
+
+        async def publish():
+            # Single publisher keeps per-job events in order
+            while True:
+                message = await events.get()
+                if message is None:
+                    return
+                try:
+                    await broadcast(message)
+                except Exception as e:
+                    logger.error(f"Error publishing scan event: {e}")
+
+        publisher = asyncio.ensure_future(publish())
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        events.put_nowait({"type": "scan_started", "job_id": job.id, "network_range": job.network_range})
+
+        try:
+            devices = await async_scan_networks(job.networks, on_host=on_host, on_progress=on_progress)
+            job.devices = devices
+            job.summary = await loop.run_in_executor(None, reconcile, devices)
+            job.status = "completed"
+            events.put_nowait({"type": "scan_complete", "job_id": job.id, **job.summary})
+        except Exception as e:
+            logger.error(f"Scan job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+            events.put_nowait({"type": "scan_failed", "job_id": job.id, "error": job.error})
+        finally:
+            job.finished_at = datetime.utcnow()
+            events.put_nowait(None)
+            await publisher
+
+scan_jobs = ScanJobManager()
@@ -0,0 +1,291 @@
+import asyncio
+import os
+import socket
+import struct
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ECHO_PAYLOAD = b"network-dashboard"
+
+DEFAULT_WINDOW = 256
+DEFAULT_TIMEOUT = 1.0
+
+def icmp_checksum(data: bytes) -> int:
+    """Compute the RFC 1071 internet checksum"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def build_echo_request(ident: int, seq: int, payload: bytes = ECHO_PAYLOAD) -> bytes:
+    """Build an ICMP echo request packet"""
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = icmp_checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+class IcmpTransport:
+    """Single non-blocking ICMP socket shared by every probe of a scan.
+
+    Prefers an unprivileged datagram socket (Linux ``ping_group_range``) and
+    falls back to a raw socket when running as root/admin.
+    """
+
+    def __init__(self):
+        self.ident = os.getpid() & 0xFFFF
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            self.raw = False
+        except OSError:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self.raw = True
+        self.sock.setblocking(False)
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def send(self, ip: str, seq: int):
+        self.sock.sendto(build_echo_request(self.ident, seq), (ip, 0))
+
+    def recv(self) -> List[Tuple[str, int]]:
+        """Drain the socket and return (ip, seq) for every echo reply"""
+        replies = []
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+
+            offset = (data[0] & 0x0F) * 4 if self.raw else 0
+            if len(data) < offset + 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack_from("!BBHHH", data, offset)
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # Datagram sockets get their id rewritten and filtered by the kernel
+            if self.raw and ident != self.ident:
+                continue
+            replies.append((addr[0], seq))
+        return replies
+
+    def close(self):
+        self.sock.close()
+
+def open_transport() -> Optional[IcmpTransport]:
+    """Open an ICMP transport, or return None when ICMP sockets are not permitted"""
+    try:
+        return IcmpTransport()
+    except (OSError, PermissionError) as e:
+        logger.info(f"ICMP socket unavailable, falling back to ping subprocesses: {e}")
+        return None
+
+class EchoScanner:
+    """Send ICMP echo requests over one transport and match replies by (ip, seq).
+
+    Sends go through ``pacer`` (see pacing.ProbePacer) when one is given.
+    """
+
+    def __init__(
+        self,
+        transport,
+        window: int = DEFAULT_WINDOW,
+        timeout: float = DEFAULT_TIMEOUT,
+        pacer=None
+    ):
+        self.transport = transport
+        self.window = max(1, window)
+        self.timeout = timeout
+        self.pacer = pacer
+        self.pending: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    def _on_readable(self):
+        for key in self.transport.recv():
+            future = self.pending.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(True)
+
+    async def _probe(self, ip: str, seq: int) -> bool:
+        loop = asyncio.get_running_loop()
+        key = (ip, seq)
+        future = loop.create_future()
+        self.pending[key] = future
+        try:
+            if self.pacer is not None:
+                await self.pacer.acquire(ip)
+            self.transport.send(ip, seq)
+            return await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            return False
+        finally:
+            self.pending.pop(key, None)
+
+    async def scan(
+        self,
+        ips: Iterable[str],
+        on_result: Optional[Callable[[str, bool], None]] = None
+    ) -> List[str]:
+        """Probe every address with at most ``window`` requests in flight.
+
+        ``on_result(ip, alive)`` is called as soon as each probe settles.
+        """
+        loop = asyncio.get_running_loop()
+        targets = iter(enumerate(ips))
+        alive: List[str] = []
+
+        async def worker():
+            for index, ip in targets:
+                answered = await self._probe(ip, index & 0xFFFF)
+                if answered:
+                    alive.append(ip)
+                if on_result is not None:
+                    on_result(ip, answered)
+
+        loop.add_reader(self.transport.fileno(), self._on_readable)
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.window)))
+        finally:
+            loop.remove_reader(self.transport.fileno())
+        return alive
+
+# Ports that ICMP-silent hosts usually still answer on (SSH, HTTP(S), SMB,
+# RDP, Apple mobile devices)
+DEFAULT_TCP_PORTS = (22, 80, 443, 445, 3389, 62078)
+DEFAULT_UDP_PORTS = ()
+DEFAULT_CONNECT_DEADLINE = 5.0
+DEFAULT_CONNECT_CONCURRENCY = 512
+
+class ConnectProber:
+    """Liveness probing with TCP connects (and optional UDP pings) for hosts that drop ICMP.
+
+    A SYN-ACK or a RST on any port counts as proof of life, as does an ICMP
+    port-unreachable (ECONNREFUSED) or any reply on a UDP port. All probes
+    of a scan share one deadline, stretched by the time the pacer needs to
+    send them; ``concurrency`` bounds open sockets. Hosts the deadline cut
+    off before any probe went out are counted in ``unprobed``.
+    """
+
+    def __init__(
+        self,
+        tcp_ports: Iterable[int] = DEFAULT_TCP_PORTS,
+        udp_ports: Iterable[int] = DEFAULT_UDP_PORTS,
+        concurrency: int = DEFAULT_CONNECT_CONCURRENCY,
+        pacer=None
+    ):
+        self.tcp_ports = tuple(tcp_ports)
+        self.udp_ports = tuple(udp_ports)
+        self.concurrency = max(1, concurrency)
+        self.pacer = pacer
+        self.attempts = 0
+        self.unprobed = 0
+        self._sent: Set[str] = set()  # hosts with at least one probe out, per scan
+
+    async def _tcp(self, ip: str, port: int) -> bool:
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        # RST on close: no TIME_WAIT buildup from thousands of probes
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        try:
+            await loop.sock_connect(sock, (ip, port))
+            return True
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
+    async def _udp(self, ip: str, port: int) -> bool:
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        try:
+            sock.connect((ip, port))
+            sock.send(b"\x00")
+            await loop.sock_recv(sock, 512)
+            return True
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
+    async def probe_host(self, ip: str, slots: asyncio.Semaphore) -> bool:
+        """True as soon as any port on ``ip`` answers"""
+        async def attempt(probe, port):
+            # Token first: a slot is an open socket and should not sit idle while paced
+            if self.pacer is not None:
+                await self.pacer.acquire(ip)
+            async with slots:
+                self.attempts += 1
+                self._sent.add(ip)
+                return await probe(ip, port)
+
+        tasks = [asyncio.ensure_future(attempt(self._tcp, port)) for port in self.tcp_ports]
+        tasks += [asyncio.ensure_future(attempt(self._udp, port)) for port in self.udp_ports]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                if await next_done:
+                    return True
+            return False
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def pacing_time(self, hosts: int) -> float:
+        """Seconds the pacer needs to release every probe for ``hosts`` addresses"""
+        if self.pacer is None:
+            return 0.0
+        rates = [rate for rate in (self.pacer.rate, self.pacer.subnet_rate) if rate]
+        if not rates:
+            return 0.0
+        return hosts * (len(self.tcp_ports) + len(self.udp_ports)) / min(rates)
+
+    async def scan(
+        self,
+        ips: Iterable[str],
+        deadline: float = DEFAULT_CONNECT_DEADLINE,
+        on_result: Optional[Callable[[str, bool], None]] = None
+    ) -> List[str]:
+        """Probe every address concurrently; hosts unresolved at the deadline count as down.
+
+        ``deadline`` is how long the last probes get to answer, on top of the
+        time the pacer takes to send them all.
+        """
+        ips = list(ips)
+        slots = asyncio.Semaphore(self.concurrency)
+        alive: List[str] = []
+        self._sent = set()
+        self.unprobed = 0
+
+        async def check(ip: str):
+            answered = await self.probe_host(ip, slots)
+            if answered:
+                alive.append(ip)
+            if on_result is not None:
+                on_result(ip, answered)
+
+        tasks = [asyncio.ensure_future(check(ip)) for ip in ips]
+        if not tasks:
+            return alive
+        deadline += self.pacing_time(len(ips))
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.unprobed = len(ips) - len(self._sent)
+            logger.warning(
+                f"Connect probing stopped at its {deadline:.1f}s deadline: {len(pending)} of "
+                f"{len(ips)} hosts unresolved, {self.unprobed} never probed"
+            )
+        return alive
@@ -1,66 +1,805 @@
 from fastapi import WebSocket
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from collections import Counter, deque
+from datetime import datetime
+import asyncio
+import itertools
 import json
 import logging
+import operator
+import os
+import threading
+import time
+import uuid
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used instead
+    orjson = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class ConnectionManager:
+# Event type -> topic. Anything unlisted goes to DEFAULT_TOPIC.
+TOPICS = {
+    "device_updated": "devices",
+    "device_deleted": "devices",
+    "device_kicked": "devices",
+    "device_status_changed": "devices",
+    "scan_started": "scans",
+    "scan_host": "scans",
+    "scan_progress": "scans",
+    "scan_complete": "scans",
+    "scan_failed": "scans",
+    "firewall_action": "firewall",
+    "user_created": "users",
+    "user_deleted": "users",
+    "user_kicked": "users",
+    "alert_created": "alerts",
+    "alert_updated": "alerts",
+    "alert_deleted": "alerts",
+    "alerts_changed": "alerts",
+    "rate_limited": "alerts",
+    "devices_changed": "devices",
+    "snort_alert": "snort",
+    "snort_update": "snort",
+    "tokens_revoked": "internal",
+}
+DEFAULT_TOPIC = "events"
+# Entity -> topic: an event is also delivered under the topic of every entity
+# it changes, so e.g. the alert a new device raises reaches "alerts" subscribers
+ENTITY_TOPICS = {
+    "device": "devices",
+    "alert": "alerts",
+    "snort_alert": "snort",
+    "user": "users",
+    "firewall_log": "firewall",
+}
+CLIENT_TOPIC = "client"  # messages sent by dashboards over /ws/sync
+INTERNAL_TOPIC = "internal"  # server-side coordination between workers, never sent to sockets
+
+# Per-client outbound queue bound and what to do when it fills up:
+# "coalesce" keeps the newest event per entity, and otherwise drops the whole
+# queue for a single resync_required so the client refetches instead of missing
+# deltas; "disconnect" closes the slow client so it reconnects and resyncs
+SEND_QUEUE_SIZE = int(os.getenv("SYNC_QUEUE_SIZE", "256"))
+DROP_POLICY = os.getenv("SYNC_DROP_POLICY", "coalesce")
+SLOW_CONSUMER_CLOSE_CODE = 1013  # try again later
+
+# Events kept for reconnect replay (/ws/sync?since=<seq>)
+EVENT_LOG_SIZE = int(os.getenv("SYNC_LOG_SIZE", "1024"))
+HISTORY_ON_CONNECT = 10
+
+# Ordering used by "severity >= high" style filters; Alert.level values
+# (info/warning/danger) sit on the same scale as Snort severities
+SEVERITY_RANK = {"info": 0, "low": 1, "medium": 2, "warning": 2, "high": 3, "danger": 3, "critical": 4}
+ALL_TOPICS = "*"
+
+# Micro-batching: events published within the window go out as one
+# "batch" frame, with superseded entity states merged away. 0 disables it.
+BATCH_WINDOW = float(os.getenv("SYNC_BATCH_WINDOW_MS", "50")) / 1000
+RATE_WINDOW = 10  # seconds averaged for frames/bytes per second
+
+# Fields that identify the entity an event is about, most specific first
+ENTITY_FIELDS = ("device_id", "alert_id", "mac", "job_id", "user_id", "username", "ip", "target_ip")
+# Events that carry the entity's whole state, so a newer one replaces an older one.
+# Others (scan_host, firewall_action, ...) each add something and are never merged.
+COALESCE_TYPES = {"device_updated", "alert_updated", "scan_progress"}
+
+# Entity deltas. Events that change state carry a "changes" list so
+# dashboards can apply them locally instead of refetching:
+#   {"entity": "device", "op": "upsert", "id": 4, "version": ..., "data": {...}}
+#   {"entity": "device", "op": "patch", "id": 4, "version": ..., "patch": [RFC 6902 ops]}
+#   {"entity": "alert", "op": "delete", "id": 9, "version": ...}
+#   {"entity": "alert", "op": "reset", "version": ...}  (bulk change: refetch the list)
+# Versions only grow, so a client ignores any change older than what it holds.
+MAX_DELTA_ENTITIES = 500  # beyond this a bulk change is sent as "reset"
+
+_version_lock = threading.Lock()
+_last_version = 0
+
+def next_version() -> int:
+    """Strictly increasing version stamp; wall-clock based so it also orders across restarts.
+
+    Microseconds keep it below 2**53, so browsers compare it exactly.
+    """
+    global _last_version
+    with _version_lock:
+        _last_version = max(_last_version + 1, time.time_ns() // 1000)
+        return _last_version
+
+def entity_upsert(entity: str, data: Dict) -> Dict:
+    """Full entity state, as returned by the REST API"""
+    return {"entity": entity, "op": "upsert", "id": data["id"], "version": next_version(), "data": data}
+
+def entity_patch(entity: str, id: int, values: Dict) -> Dict:
+    """JSON Patch replacing the given top-level fields"""
+    return {
+        "entity": entity,
+        "op": "patch",
+        "id": id,
+        "version": next_version(),
+        "patch": [
+            {"op": "replace", "path": f"/{field}", "value": value.isoformat() if isinstance(value, datetime) else value}
+            for field, value in values.items()
+        ]
+    }
+
+def entity_delete(entity: str, id: int) -> Dict:
+    return {"entity": entity, "op": "delete", "id": id, "version": next_version()}
+
+def entity_reset(entity: str) -> Dict:
+    return {"entity": entity, "op": "reset", "version": next_version()}
+
+def encode_frame(message: Dict) -> str:
+    """Serialize an event once into the text frame sent to every client"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(message).decode()
+        except TypeError:
+            pass  # non-str keys or exotic values; let json's default=str cope
+    return json.dumps(message, default=str, separators=(",", ":"))
+
+def history_frame(frames: Iterable[str]) -> str:
+    """Wrap already-encoded frames in a history message without re-encoding them"""
+    return '{"type":"history","messages":[' + ",".join(frames) + "]}"
+
+def client_topics(message: Dict) -> set:
+    """Topics a socket subscription can receive ``message`` under"""
+    topics = {message.get("topic") or TOPICS.get(message.get("type"), DEFAULT_TOPIC)}
+    for change in message.get("changes") or ():
+        topic = ENTITY_TOPICS.get(change.get("entity"))
+        if topic is not None:
+            topics.add(topic)
+    return topics
+
+def coalesce_key(message: Dict) -> Optional[tuple]:
+    """(type, entity) for events where only the latest state matters, else None"""
+    if message.get("type") not in COALESCE_TYPES:
+        return None
+    for field in ENTITY_FIELDS:
+        if message.get(field) is not None:
+            return (message.get("type"), field, message[field])
+    return None
+
+def compact_changes(events: List[Dict]) -> Tuple[List[Dict], int]:
+    """Drop entity changes superseded by a later upsert/delete in the same batch.
+
+    Returns the events (copied where trimmed) and how many changes were dropped.
+    """
+    latest: Dict[tuple, int] = {}
+    for event in events:
+        for change in event.get("changes") or ():
+            if change["op"] in ("upsert", "delete") and change.get("id") is not None:
+                key = (change["entity"], change["id"])
+                latest[key] = max(latest.get(key, 0), change["version"])
+
+    compacted, dropped = [], 0
+    for event in events:
+        changes = event.get("changes")
+        if changes:
+            kept = [
+                change for change in changes
+                if change.get("id") is None or change["version"] >= latest.get((change["entity"], change["id"]), 0)
+            ]
+            if len(kept) != len(changes):
+                dropped += len(changes) - len(kept)
+                event = {**event, "changes": kept}
+        compacted.append(event)
+    return compacted, dropped
+
+class RateMeter:
+    """Frames and bytes per second averaged over the last ``window`` whole seconds"""
+
+    def __init__(self, window: int = RATE_WINDOW):
+        self.window = window
+        self.buckets: deque = deque()  # [second, frames, bytes]
+        self.frames = 0
+        self.bytes = 0
+
+    def record(self, size: int):
+        now = int(time.monotonic())
+        if not self.buckets or self.buckets[-1][0] != now:
+            self.buckets.append([now, 0, 0])
+            while self.buckets[0][0] < now - self.window:
+                self.buckets.popleft()
+        bucket = self.buckets[-1]
+        bucket[1] += 1
+        bucket[2] += size
+        self.frames += 1
+        self.bytes += size
+
+    def rates(self) -> Dict:
+        now = int(time.monotonic())
+        recent = [bucket for bucket in self.buckets if now - self.window <= bucket[0] < now]
+        return {
+            "frames_per_sec": sum(bucket[1] for bucket in recent) / self.window,
+            "bytes_per_sec": sum(bucket[2] for bucket in recent) / self.window,
+            "frames": self.frames,
+            "bytes": self.bytes
+        }
+
+_COMPARISONS = (
+    (">=", operator.ge), ("<=", operator.le), ("!=", operator.ne),
+    (">", operator.gt), ("<", operator.lt), ("=", operator.eq),
+)
+
+def _rank(value):
+    if isinstance(value, str):
+        return SEVERITY_RANK.get(value.lower(), value)
+    return value
+
+def _field_values(message: Dict, field: str) -> List:
+    """Values of ``field`` on an event: top level, else from the entity changes it carries"""
+    if field in message:
+        return [message[field]]
+    values = []
+    for change in message.get("changes") or ():
+        data = change.get("data")
+        if isinstance(data, dict) and field in data:
+            values.append(data[field])
+        for op in change.get("patch") or ():
+            if op.get("path") == "/" + field and "value" in op:
+                values.append(op["value"])
+    return values
+
+class TopicFilter:
+    """Predicate from a /ws/sync subscribe message.
+
+    ``{"severity": ">=high", "role": ["Server", "Router"], "status": "active"}``
+    matches events where every listed field satisfies its condition. Events
+    that do not carry a field (deletes, resets) are not filtered on it, so a
+    client's copy of an entity never goes stale.
+    """
+
+    def __init__(self, spec: Optional[Dict] = None):
+        if spec is not None and not isinstance(spec, dict):
+            raise ValueError("filter must be an object")
+        self.spec = spec or {}
+        self.conditions = [(field, *self._compile(condition)) for field, condition in self.spec.items()]
+
+    @staticmethod
+    def _compile(condition):
+        if isinstance(condition, list):
+            return operator.contains, [_rank(value) for value in condition]
+        if isinstance(condition, str):
+            for symbol, compare in _COMPARISONS:
+                if condition.startswith(symbol):
+                    operand = condition[len(symbol):].strip()
+                    try:
+                        operand = float(operand)
+                    except ValueError:
+                        if compare not in (operator.eq, operator.ne) and operand.lower() not in SEVERITY_RANK:
+                            raise ValueError(f"unknown severity {operand!r} in {condition!r}")
+                    return compare, _rank(operand)
+        if isinstance(condition, (str, int, float, bool)) or condition is None:
+            return operator.eq, _rank(condition)
+        raise ValueError(f"unsupported condition {condition!r}")
+
+    def _satisfied(self, value, compare, operand) -> bool:
+        try:
+            if compare is operator.contains:
+                return operand.__contains__(_rank(value))
+            return compare(_rank(value), operand)
+        except TypeError:
+            return False
+
+    def matches(self, message: Dict) -> bool:
+        for field, compare, operand in self.conditions:
+            values = _field_values(message, field)
+            if values and not any(self._satisfied(value, compare, operand) for value in values):
+                return False
+        return True
+
+class Subscription:
+    __slots__ = ("id", "handler", "topics")
+
+    def __init__(self, id: int, handler: Callable[[Dict], None], topics: Optional[Iterable[str]] = None):
+        self.id = id
+        self.handler = handler
+        self.topics = frozenset(topics) if topics is not None else None
+
+    def matches(self, topic: str) -> bool:
+        return self.topics is None or topic in self.topics
+
+class EventBus:
+    """Process-wide publish/subscribe hub for real-time events.
+
+    ``publish`` never awaits: handlers are plain callables that must hand the
+    message off (e.g. to a queue) rather than do I/O themselves.
+    """
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.message_history: List[Dict] = []
-        self.max_history = 100
-    
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"New WebSocket connection. Total: {len(self.active_connections)}")
-        
-        # Send recent history to new connection
-        if self.message_history:
+        self.subscriptions: Dict[int, Subscription] = {}
+        self._ids = itertools.count(1)
+        self.published: Counter = Counter()
+        self.delivered: Counter = Counter()
+        self.failed: Counter = Counter()
+
+    def topic_for(self, message: Dict) -> str:
+        return message.get("topic") or TOPICS.get(message.get("type"), DEFAULT_TOPIC)
+
+    def subscribe(self, handler: Callable[[Dict], None], topics: Optional[Iterable[str]] = None) -> Subscription:
+        """Call ``handler(message)`` for every event on ``topics`` (all topics when None)"""
+        subscription = Subscription(next(self._ids), handler, topics)
+        self.subscriptions[subscription.id] = subscription
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.pop(subscription.id, None)
+
+    def publish(self, message: Dict, topic: Optional[str] = None, exclude: Optional[Subscription] = None) -> int:
+        """Hand ``message`` to every matching subscriber; returns how many received it.
+
+        ``exclude`` skips one subscription, so a backplane can publish events
+        from other processes without relaying them straight back.
+        """
+        topic = topic or self.topic_for(message)
+        message["topic"] = topic
+        if "timestamp" not in message:
+            message["timestamp"] = datetime.utcnow().isoformat()
+
+        self.published[topic] += 1
+        delivered = 0
+        for subscription in list(self.subscriptions.values()):
+            if subscription is exclude or not subscription.matches(topic):
+                continue
             try:
-                await websocket.send_json({
-                    "type": "history",
-                    "messages": self.message_history[-10:]
-                })
+                subscription.handler(message)
+                delivered += 1
             except Exception as e:
-                logger.error(f"Error sending history: {e}")
-    
+                logger.error(f"Error delivering {topic} event: {e}")
+                self.failed[topic] += 1
+        self.delivered[topic] += delivered
+        return delivered
+
+    async def broadcast(self, message: Dict):
+        """Awaitable publish, for callers that take an async broadcast callback"""
+        self.publish(message)
+
+    def stats(self) -> Dict:
+        topics = set(self.published) | set(self.delivered)
+        return {
+            "subscribers": len(self.subscriptions),
+            "topics": {
+                topic: {
+                    "published": self.published[topic],
+                    "delivered": self.delivered[topic],
+                    "failed": self.failed[topic]
+                }
+                for topic in sorted(topics)
+            }
+        }
+
+bus = EventBus()
+
+class EventLog:
+    """Fixed-size ring of encoded frames addressed by sequence number.
+
+    ``epoch`` changes on every restart so clients never resume against
+    sequence numbers from a previous process.
+    """
+
+    def __init__(self, capacity: int = EVENT_LOG_SIZE):
+        self.capacity = max(1, capacity)
+        self.frames: List[Optional[str]] = [None] * self.capacity
+        self.last_seq = 0
+        self.epoch = uuid.uuid4().hex[:12]
+
+    @property
+    def first_seq(self) -> int:
+        """Oldest sequence number still held"""
+        return max(1, self.last_seq - self.capacity + 1)
+
+    def append(self, frame: str) -> int:
+        """Store the frame encoded for sequence number ``last_seq + 1``"""
+        self.last_seq += 1
+        self.frames[self.last_seq % self.capacity] = frame
+        return self.last_seq
+
+    def since(self, seq: int) -> Optional[List[str]]:
+        """Frames after ``seq``, or None when some of them were already overwritten"""
+        if seq < 0 or seq > self.last_seq:
+            return None
+        if seq + 1 < self.first_seq:
+            return None
+        return [self.frames[s % self.capacity] for s in range(seq + 1, self.last_seq + 1)]
+
+    def tail(self, count: int) -> List[str]:
+        start = max(self.first_seq, self.last_seq - count + 1)
+        return [self.frames[s % self.capacity] for s in range(start, self.last_seq + 1)]
+
+class ClientConnection:
+    """One WebSocket with a bounded outbound queue drained by its own writer task.
+
+    Queue entries are (coalesce key, encoded frame) pairs. ``resync_frame``
+    builds the ``resync_required`` frame that replaces the queue on overflow.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int = SEND_QUEUE_SIZE,
+        policy: str = DROP_POLICY,
+        meter: Optional[RateMeter] = None,
+        resync_frame: Optional[Callable[[], str]] = None
+    ):
+        self.websocket = websocket
+        self.meter = meter
+        self.resync_frame = resync_frame or (lambda: encode_frame({"type": "resync_required"}))
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.queue: deque = deque()
+        self.ready = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.resyncs = 0
+        self.max_depth = 0
+        # Topic -> filter from subscribe messages; None until the first one (every topic)
+        self.topics: Optional[Dict[str, TopicFilter]] = None
+        self.topics_key: Optional[tuple] = None
+        self.filtered = 0
+
+    def subscribe(self, topics: Iterable[str], spec: Optional[Dict] = None):
+        topic_filter = TopicFilter(spec)
+        current = dict(self.topics or {})
+        for topic in topics:
+            current[str(topic)] = topic_filter
+        self._set_topics(current)
+
+    def unsubscribe(self, topics: Iterable[str]):
+        current = dict(self.topics or {})
+        for topic in topics:
+            current.pop(str(topic), None)
+        self._set_topics(current)
+
+    def _set_topics(self, topics: Dict[str, TopicFilter]):
+        self.topics = topics
+        # Clients with equal subscriptions share filtering work in fan-out
+        self.topics_key = tuple(sorted(
+            (topic, json.dumps(topic_filter.spec, sort_keys=True, default=str))
+            for topic, topic_filter in topics.items()
+        ))
+
+    def wants(self, message: Dict) -> bool:
+        if self.topics is None:
+            return True
+        for topic in client_topics(message):
+            topic_filter = self.topics.get(topic) or self.topics.get(ALL_TOPICS)
+            if topic_filter is not None and topic_filter.matches(message):
+                return True
+        return False
+
+    def enqueue(self, frame: str, key: Optional[tuple] = None) -> bool:
+        """Queue a frame without waiting; False means the client should be evicted"""
+        if len(self.queue) >= self.max_queue:
+            if self.policy == "disconnect":
+                self.dropped += 1
+                return False
+            if key is not None:
+                for index, (queued_key, _) in enumerate(self.queue):
+                    if queued_key == key:
+                        # Newer state for the same entity: replace, keep position
+                        self.queue[index] = (key, frame)
+                        self.coalesced += 1
+                        return True
+            # Dropping a single event (a batch of deltas, say) would leave the client
+            # silently stale: drop everything and have it refetch from this point
+            self.dropped += len(self.queue) + 1
+            self.resyncs += 1
+            self.queue.clear()
+            key, frame = None, self.resync_frame()
+        self.queue.append((key, frame))
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self.ready.set()
+        return True
+
+    def preload(self, frames: Iterable[str]):
+        """Queue reconnect replay ahead of live events; bounded by the event log, not the queue"""
+        self.queue.extend((None, frame) for frame in frames)
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self.ready.set()
+
+    async def run(self):
+        """Writer task: send queued messages in order until the socket fails"""
+        while True:
+            await self.ready.wait()
+            while self.queue:
+                _, frame = self.queue.popleft()
+                await self.websocket.send_text(frame)
+                self.sent += 1
+                if self.meter is not None:
+                    self.meter.record(len(frame))
+            self.ready.clear()
+
+class ConnectionManager:
+    """WebSocket fan-out for bus events.
+
+    Attached to the bus once. Each event is encoded to a frame once; each
+    socket gets its own bounded queue and writer task, so publishing is a
+    non-blocking append per client and one stalled browser never delays
+    the others.
+
+    Events published within ``window`` seconds are merged into one batch
+    frame that keeps only the newest state per entity, so a burst (a scan
+    reconciling hundreds of hosts) costs clients one frame, not hundreds.
+
+    Every frame gets a sequence number and is kept in an EventLog, so a
+    reconnecting client can resume with ``since=<seq>`` and receive
+    exactly what it missed, with no re-serialization.
+
+    A client that sends ``subscribe`` messages only gets the topics and
+    events its filters match; filtering happens before anything is queued.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = SEND_QUEUE_SIZE,
+        policy: str = DROP_POLICY,
+        log_size: int = EVENT_LOG_SIZE,
+        window: float = BATCH_WINDOW
+    ):
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.log = EventLog(log_size)
+        self.window = window
+        self.pending: List[Dict] = []
+        self.pending_keys: Dict[tuple, int] = {}
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.events_in = 0
+        self.batches = 0
+        self.merged = 0
+        self.encoded = RateMeter()  # frames built, before per-client fan-out
+        self.outbound = RateMeter()  # frames written to sockets
+        self.max_queue = max_queue
+        self.policy = policy
+        self.bus: Optional[EventBus] = None
+        self.subscription: Optional[Subscription] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.evicted = 0
+        self.replayed = 0
+        self.resyncs = 0
+        # Totals from clients that have since gone away
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.filtered = 0
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
+
+    def attach(self, event_bus: EventBus, topics: Optional[Iterable[str]] = None):
+        """Subscribe to ``event_bus`` so its events reach every connected socket"""
+        if self.subscription is None:
+            self.bus = event_bus
+            self.subscription = event_bus.subscribe(self.deliver, topics)
+
+    async def connect(self, websocket: WebSocket, since: Optional[int] = None, epoch: Optional[str] = None):
+        """Register a socket; with ``since`` replay every event after that sequence number"""
+        await websocket.accept()
+        self.loop = asyncio.get_running_loop()
+        client = ClientConnection(websocket, self.max_queue, self.policy, self.outbound, self._resync_frame)
+        self.clients[websocket] = client
+        logger.info(f"New WebSocket connection. Total: {len(self.clients)}")
+
+        client.enqueue(encode_frame({"type": "sync_hello", "epoch": self.log.epoch, "seq": self.log.last_seq}))
+        if since is None:
+            # Send recent history to new connection
+            if self.log.last_seq:
+                client.enqueue(history_frame(self.log.tail(HISTORY_ON_CONNECT)))
+        else:
+            missed = self.log.since(since) if epoch in (None, self.log.epoch) else None
+            if missed is None:
+                # Gap is older than the log (or the server restarted): refetch everything
+                self.resyncs += 1
+                client.enqueue(self._resync_frame())
+            else:
+                self.replayed += len(missed)
+                client.preload(missed)
+        client.writer = self.loop.create_task(self._write(client))
+
+    def _resync_frame(self) -> str:
+        return encode_frame({"type": "resync_required", "seq": self.log.last_seq})
+
+    async def _write(self, client: ClientConnection):
+        try:
+            await client.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending to client: {e}")
+            self.disconnect(client.websocket)
+
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        logger.info(f"WebSocket disconnected. Total: {len(self.active_connections)}")
-    
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        self.sent += client.sent
+        self.dropped += client.dropped
+        self.coalesced += client.coalesced
+        self.resyncs += client.resyncs
+        self.filtered += client.filtered
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+        logger.info(f"WebSocket disconnected. Total: {len(self.clients)}")
+
+    async def _evict(self, client: ClientConnection):
+        """Close a client whose queue overflowed under the disconnect policy"""
+        self.evicted += 1
+        self.disconnect(client.websocket)
+        try:
+            await client.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+
+    def deliver(self, message: Dict):
+        """Bus handler: record the event and queue it for every client"""
+        if message.get("topic") in (CLIENT_TOPIC, INTERNAL_TOPIC):
+            # Dashboard messages are for server-side handlers, not other dashboards
+            return
+        if self.loop is None or self.loop.is_closed():
+            self._record(message)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._fan_out(message)
+        else:
+            # Published from a worker thread
+            self.loop.call_soon_threadsafe(self._fan_out, message)
+
+    def _record(self, message: Dict) -> str:
+        """Stamp the next sequence number, encode once and append to the log"""
+        message["seq"] = self.log.last_seq + 1
+        frame = encode_frame(message)
+        self.log.append(frame)
+        return frame
+
+    def _fan_out(self, message: Dict):
+        """Send now, or hold the event for the current batch window"""
+        self.events_in += 1
+        if self.window <= 0:
+            self._send(message)
+            return
+
+        key = coalesce_key(message)
+        if key is not None and key in self.pending_keys:
+            self.pending[self.pending_keys[key]] = message
+            self.merged += 1
+        else:
+            if key is not None:
+                self.pending_keys[key] = len(self.pending)
+            self.pending.append(message)
+        if self.flush_handle is None:
+            self.flush_handle = self.loop.call_later(self.window, self._flush)
+
+    def _flush(self):
+        self.flush_handle = None
+        events, self.pending, self.pending_keys = self.pending, [], {}
+        if len(events) == 1:
+            self._send(events[0])
+        elif events:
+            events, dropped = compact_changes(events)
+            self.merged += dropped
+            self.batches += 1
+            self._send({"type": "batch", "events": events, "timestamp": datetime.utcnow().isoformat()})
+
+    def _send(self, message: Dict):
+        frame = self._record(message)
+        self.encoded.record(len(frame))
+        key = coalesce_key(message)
+        # Subscription -> frame it receives (None: nothing), built once per distinct subscription
+        frames: Dict[Optional[tuple], Optional[str]] = {None: frame}
+        for client in list(self.clients.values()):
+            if client.topics_key not in frames:
+                frames[client.topics_key] = self._filtered_frame(client, message, frame)
+            client_frame = frames[client.topics_key]
+            if client_frame is None:
+                client.filtered += 1
+                continue
+            if not client.enqueue(client_frame, key):
+                self.loop.create_task(self._evict(client))
+
+    def _filtered_frame(self, client: ClientConnection, message: Dict, frame: str) -> Optional[str]:
+        """The part of ``message`` the client subscribed to, or None"""
+        if message.get("type") != "batch":
+            return frame if client.wants(message) else None
+        events = [event for event in message["events"] if client.wants(event)]
+        if not events:
+            return None
+        if len(events) == len(message["events"]):
+            return frame
+        return encode_frame({**message, "events": events})
+
+    def handle_message(self, websocket: WebSocket, message: Dict) -> bool:
+        """Apply a subscribe/unsubscribe message from a client; False for anything else.
+
+        ``{"type": "subscribe", "topics": ["snort"], "filter": {"severity": ">=high"}}``
+        limits the socket to the listed topics (``"*"`` for all) from then on.
+        """
+        client = self.clients.get(websocket)
+        kind = message.get("type") if isinstance(message, dict) else None
+        if client is None or kind not in ("subscribe", "unsubscribe"):
+            return False
+        topics = message.get("topics") or []
+        if isinstance(topics, str):
+            topics = [topics]
+        try:
+            if not isinstance(topics, list) or not all(isinstance(topic, str) for topic in topics):
+                raise ValueError("topics must be a string or a list of strings")
+            if kind == "subscribe":
+                client.subscribe(topics, message.get("filter"))
+            else:
+                client.unsubscribe(topics)
+        except ValueError as e:
+            reply = {"type": "subscription_error", "message": str(e)}
+        else:
+            reply = {
+                "type": "subscriptions",
+                "topics": {topic: topic_filter.spec for topic, topic_filter in client.topics.items()}
+            }
+        if not client.enqueue(encode_frame(reply)):
+            self.loop.create_task(self._evict(client))
+        return True
+
     async def broadcast(self, message: Dict):
         """Broadcast message to all connected clients"""
         # Add timestamp if not present
         if "timestamp" not in message:
-            from datetime import datetime
             message["timestamp"] = datetime.utcnow().isoformat()
-        
-        # Add to history
-        self.message_history.append(message)
-        if len(self.message_history) > self.max_history:
-            self.message_history.pop(0)
-        
-        # Broadcast to all connections
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {e}")
-                disconnected.append(connection)
-        
-        # Remove disconnected clients
-        for conn in disconnected:
-            self.disconnect(conn)
-    
+        self.loop = asyncio.get_running_loop()
+        self._fan_out(message)
+
     async def send_to_client(self, websocket: WebSocket, message: Dict):
         """Send message to specific client"""
-        try:
-            await websocket.send_json(message)
-        except Exception as e:
-            logger.error(f"Error sending to client: {e}")
-            self.disconnect(websocket)
\ No newline at end of file
+        client = self.clients.get(websocket)
+        if client is not None and not client.enqueue(encode_frame(message)):
+            await self._evict(client)
+
+    def stats(self) -> Dict:
+        depths = [len(client.queue) for client in self.clients.values()]
+        return {
+            "connections": len(self.clients),
+            "drop_policy": self.policy,
+            "queue_limit": self.max_queue,
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "peak_queue_depth": max((client.max_depth for client in self.clients.values()), default=0),
+            "sent": self.sent + sum(client.sent for client in self.clients.values()),
+            "dropped": self.dropped + sum(client.dropped for client in self.clients.values()),
+            "coalesced": self.coalesced + sum(client.coalesced for client in self.clients.values()),
+            "filtered": self.filtered + sum(client.filtered for client in self.clients.values()),
+            "subscribed": sum(client.topics is not None for client in self.clients.values()),
+            "evicted": self.evicted,
+            "epoch": self.log.epoch,
+            "seq": self.log.last_seq,
+            "log_size": self.log.capacity,
+            "replayed": self.replayed,
+            "resyncs": self.resyncs + sum(client.resyncs for client in self.clients.values()),
+            "batch_window_ms": self.window * 1000,
+            "events_in": self.events_in,
+            "batches": self.batches,
+            "merged": self.merged,
+            "encoded": self.encoded.rates(),
+            "outbound": self.outbound.rates()
+        }
+
+    async def close(self):
+        if self.subscription is not None:
+            self.bus.unsubscribe(self.subscription)
+            self.subscription = None
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self._flush()
+        writers = [client.writer for client in self.clients.values() if client.writer is not None]
+        for websocket in list(self.clients):
+            self.disconnect(websocket)
+        for writer in writers:
+            try:
+                await writer
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,217 @@
+"""Request throttling with sliding-window counters.
+
+Each key (a client IP, a username) keeps the request count of the current
+and the previous fixed window. The sliding estimate weighs the previous
+count by how much of it still overlaps the last ``window`` seconds, so a
+check is O(1) and an entry is a few numbers, with no per-request timestamps.
+Keys are spread over independently locked shards, each an LRU: keys idle
+for two windows (their counts can only be zero) are dropped as the shard is
+touched, and a shard never holds more than its share of ``max_keys``.
+
+The first rejection of a key in a window is reported through ``on_breach``,
+which the app turns into an Alert.
+"""
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from db import Alert, SessionLocal
+from sync import bus, entity_upsert
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Attempts per window; a limit of 0 disables that check
+LOGIN_WINDOW = float(os.getenv("LOGIN_RATE_WINDOW", "60"))  # seconds
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_RATE_IP", "20"))
+LOGIN_USER_LIMIT = int(os.getenv("LOGIN_RATE_USER", "5"))  # failed attempts
+API_WINDOW = float(os.getenv("API_RATE_WINDOW", "60"))
+API_LIMIT = int(os.getenv("API_RATE_LIMIT", "0"))  # requests per IP, off by default
+THROTTLE_MAX_KEYS = int(os.getenv("THROTTLE_MAX_KEYS", "65536"))  # per limiter
+THROTTLE_SHARDS = 16
+# Breach alerts are throttled too, so a distributed attack cannot flood the alerts table
+ALERT_LIMIT = 30  # per ALERT_WINDOW
+ALERT_WINDOW = 60.0
+
+# Entry fields: [window index, previous count, current count, breached window, last touched]
+_INDEX, _PREVIOUS, _CURRENT, _BREACHED, _TOUCHED = range(5)
+
+class SlidingWindowLimiter:
+    """At most ``limit`` events per key in any ``window`` seconds (sliding estimate)"""
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        window: float,
+        max_keys: int = THROTTLE_MAX_KEYS,
+        shards: int = THROTTLE_SHARDS,
+        on_breach: Optional[Callable[["SlidingWindowLimiter", str], None]] = None
+    ):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.shard_size = max(1, max_keys // shards)
+        self.shards: List["OrderedDict[str, list]"] = [OrderedDict() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self.on_breach = on_breach
+        self.allowed = 0
+        self.rejected = 0
+        self.breaches = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """Count one event for ``key``; returns 0 if allowed, else seconds until it would be"""
+        return self._check(key, now, count=True)
+
+    def retry_after(self, key: str, now: Optional[float] = None) -> float:
+        """Like acquire, without counting an allowed event (count failures with ``add``)"""
+        return self._check(key, now, count=False)
+
+    def add(self, key: str, now: Optional[float] = None):
+        """Count an event regardless of the limit"""
+        if self.limit <= 0:
+            return
+        now = time.time() if now is None else now
+        shard, lock = self._shard(key)
+        with lock:
+            self._entry(shard, key, now)[_CURRENT] += 1
+
+    def _check(self, key: str, now: Optional[float], count: bool) -> float:
+        if self.limit <= 0:
+            return 0.0
+        now = time.time() if now is None else now
+        shard, lock = self._shard(key)
+        breached = False
+        with lock:
+            entry = self._entry(shard, key, now)
+            elapsed = now - entry[_INDEX] * self.window
+            weight = 1 - elapsed / self.window
+            if entry[_PREVIOUS] * weight + entry[_CURRENT] + 1 <= self.limit:
+                if count:
+                    entry[_CURRENT] += 1
+                self.allowed += 1
+                return 0.0
+            self.rejected += 1
+            wait = self._wait(entry[_PREVIOUS], entry[_CURRENT], elapsed)
+            if entry[_BREACHED] != entry[_INDEX]:
+                entry[_BREACHED] = entry[_INDEX]
+                self.breaches += 1
+                breached = True
+        if breached and self.on_breach is not None:
+            try:
+                self.on_breach(self, key)
+            except Exception as e:
+                logger.error(f"Throttle breach handler failed for {self.name} {key}: {e}")
+        return wait
+
+    def _wait(self, previous: int, current: int, elapsed: float) -> float:
+        """Seconds until previous * weight + current + 1 <= limit"""
+        room = self.limit - 1
+        if current <= room:
+            # Within this window, once enough of the previous one has slid out
+            return max(0.0, self.window * (1 - (room - current) / previous) - elapsed)
+        # The current count carries into the next window as its previous count
+        return self.window - elapsed + self.window * (1 - room / current)
+
+    def _shard(self, key: str):
+        index = hash(key) % len(self.shards)
+        return self.shards[index], self._locks[index]
+
+    def _entry(self, shard: "OrderedDict[str, list]", key: str, now: float) -> list:
+        index = int(now // self.window)
+        entry = shard.get(key)
+        if entry is None:
+            entry = shard[key] = [index, 0, 0, -1, now]
+        else:
+            shard.move_to_end(key)
+            if entry[_INDEX] != index:
+                # Roll over: the current window becomes the previous one, unless a whole window passed
+                entry[_PREVIOUS] = entry[_CURRENT] if entry[_INDEX] == index - 1 else 0
+                entry[_CURRENT] = 0
+                entry[_INDEX] = index
+            entry[_TOUCHED] = now
+        # Least recently touched first: stop at the first key that is still live
+        idle = now - 2 * self.window
+        while len(shard) > 1:
+            oldest_key = next(iter(shard))
+            if shard[oldest_key][_TOUCHED] > idle:
+                break
+            del shard[oldest_key]
+            self.expired += 1
+        while len(shard) > self.shard_size:
+            shard.popitem(last=False)
+            self.evicted += 1
+        return entry
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "window": self.window,
+            "keys": sum(len(shard) for shard in self.shards),
+            "max_keys": self.shard_size * len(self.shards),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "breaches": self.breaches,
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
+
+alert_limiter = SlidingWindowLimiter("alerts", ALERT_LIMIT, ALERT_WINDOW, max_keys=1, shards=1)
+
+def breach_alert(limiter: SlidingWindowLimiter, key: str):
+    """Record a throttle breach as a warning Alert and push it to dashboards.
+
+    Called from the request path: on the event loop, the database write goes
+    to the default executor instead of blocking it.
+    """
+    logger.warning(f"Rate limit {limiter.name} exceeded by {key}")
+    if alert_limiter.acquire("breach"):
+        return
+    message = f"Rate limit exceeded: {limiter.name} by {key} ({limiter.limit} per {limiter.window:g}s)"
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _store_breach(limiter.name, key, message)
+        return
+    future = loop.run_in_executor(None, _store_breach, limiter.name, key, message)
+    future.add_done_callback(_log_breach_failure)
+
+def _store_breach(name: str, key: str, message: str):
+    # Imported here: the alerts router itself depends on auth, which uses this module
+    from routers.alerts import AlertResponse
+
+    db = SessionLocal()
+    try:
+        alert = Alert(message=message, level="warning", timestamp=datetime.utcnow())
+        db.add(alert)
+        db.commit()
+        bus.publish({
+            "type": "rate_limited",
+            "limiter": name,
+            "key": key,
+            "changes": [entity_upsert("alert", AlertResponse.model_validate(alert).model_dump(mode="json"))]
+        })
+    finally:
+        db.close()
+
+def _log_breach_failure(future: "asyncio.Future"):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Could not record throttle breach: {future.exception()}")
+
+def retry_header(wait: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(wait)))}
+
+login_ip_limiter = SlidingWindowLimiter("login per IP", LOGIN_IP_LIMIT, LOGIN_WINDOW, on_breach=breach_alert)
+login_user_limiter = SlidingWindowLimiter("failed logins per user", LOGIN_USER_LIMIT, LOGIN_WINDOW, on_breach=breach_alert)
+api_limiter = SlidingWindowLimiter("API requests per IP", API_LIMIT, API_WINDOW, on_breach=breach_alert)
+
+def stats() -> Dict:
+    return {limiter.name: limiter.stats() for limiter in (login_ip_limiter, login_user_limiter, api_limiter)}
@@ -1,10 +1,26 @@
-import React, { createContext, useContext, useEffect, useState, useRef } from 'react';
+import React, { createContext, useCallback, useContext, useEffect, useState, useRef } from 'react';
 import { useAuth } from './AuthContext';
+import { applyChanges, takeNewer } from '../utils/deltas';
+import type { EntityChange } from '../utils/deltas';
+
+type MessageListener = (message: any) => void;
+
+// Server topic that carries every change to each entity, whatever the event
+// type (see ENTITY_TOPICS in backend/sync.py)
+const ENTITY_TOPICS: Record<string, string[]> = {
+  device: ['devices'],
+  alert: ['alerts'],
+  snort_alert: ['snort'],
+  user: ['users'],
+  firewall_log: ['firewall']
+};
 
 interface WebSocketContextType {
   ws: WebSocket | null;
   lastMessage: any;
   sendMessage: (message: any) => void;
+  subscribe: (listener: MessageListener) => () => void;
+  requestTopics: (topics: string[]) => () => void;
 }
 
 const WebSocketContext = createContext<WebSocketContextType | undefined>(undefined);
@@ -14,25 +30,64 @@ export function WebSocketProvider({ children }: { children: React.ReactNode }) {
   const [lastMessage, setLastMessage] = useState<any>(null);
   const { token } = useAuth();
   const reconnectTimeout = useRef<NodeJS.Timeout>();
+  // Position in the server's event log, used to resume after a reconnect
+  const lastSeq = useRef<number | null>(null);
+  const epoch = useRef<string | null>(null);
+  // Called for every message, unlike lastMessage which React may batch away
+  const listeners = useRef(new Set<MessageListener>());
+  // Topics the mounted pages need, with how many hooks asked for each; the
+  // server only sends these once the first subscribe message arrives
+  const topicCounts = useRef(new Map<string, number>());
+  const socket = useRef<WebSocket | null>(null);
 
   useEffect(() => {
     if (!token) return;
 
     const connectWebSocket = () => {
       const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-      const wsUrl = `${protocol}//${window.location.host}/ws/sync`;
+      const resume = lastSeq.current !== null && epoch.current
+        ? `?since=${lastSeq.current}&epoch=${epoch.current}`
+        : '';
+      const wsUrl = `${protocol}//${window.location.host}/ws/sync${resume}`;
       
       const websocket = new WebSocket(wsUrl);
 
       websocket.onopen = () => {
         console.log('WebSocket connected');
+        socket.current = websocket;
         setWs(websocket);
+        if (topicCounts.current.size > 0) {
+          websocket.send(JSON.stringify({ type: 'subscribe', topics: [...topicCounts.current.keys()] }));
+        }
       };
 
       websocket.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data);
-          setLastMessage(data);
+          if (data.type === 'sync_hello') {
+            epoch.current = data.epoch;
+            if (lastSeq.current === null) {
+              lastSeq.current = data.seq;
+            }
+            return;
+          }
+          if (data.type === 'subscriptions' || data.type === 'subscription_error') {
+            if (data.type === 'subscription_error') {
+              console.error('WebSocket subscription rejected:', data.message);
+            }
+            return;
+          }
+          if (typeof data.seq === 'number') {
+            lastSeq.current = data.seq;
+          }
+          // A batch frame carries every event published in one server window
+          const messages = data.type === 'batch' ? data.events : [data];
+          for (const message of messages) {
+            listeners.current.forEach((listener) => listener(message));
+          }
+          if (messages.length > 0) {
+            setLastMessage(messages[messages.length - 1]);
+          }
         } catch (error) {
           console.error('Failed to parse WebSocket message:', error);
         }
@@ -44,6 +99,7 @@ export function WebSocketProvider({ children }: { children: React.ReactNode }) {
 
       websocket.onclose = () => {
         console.log('WebSocket disconnected');
+        socket.current = null;
         setWs(null);
         
         // Attempt to reconnect after 3 seconds
@@ -73,8 +129,46 @@ export function WebSocketProvider({ children }: { children: React.ReactNode }) {
     }
   };
 
+  const subscribe = useCallback((listener: MessageListener) => {
+    listeners.current.add(listener);
+    return () => {
+      listeners.current.delete(listener);
+    };
+  }, []);
+
+  const sendControl = (message: any) => {
+    if (socket.current && socket.current.readyState === WebSocket.OPEN) {
+      socket.current.send(JSON.stringify(message));
+    }
+  };
+
+  const requestTopics = useCallback((topics: string[]) => {
+    const added = topics.filter((topic) => !topicCounts.current.has(topic));
+    for (const topic of topics) {
+      topicCounts.current.set(topic, (topicCounts.current.get(topic) || 0) + 1);
+    }
+    if (added.length > 0) {
+      sendControl({ type: 'subscribe', topics: added });
+    }
+    return () => {
+      const removed: string[] = [];
+      for (const topic of topics) {
+        const count = (topicCounts.current.get(topic) || 1) - 1;
+        if (count === 0) {
+          topicCounts.current.delete(topic);
+          removed.push(topic);
+        } else {
+          topicCounts.current.set(topic, count);
+        }
+      }
+      if (removed.length > 0) {
+        sendControl({ type: 'unsubscribe', topics: removed });
+      }
+    };
+  }, []);
+
   return (
-    <WebSocketContext.Provider value={{ ws, lastMessage, sendMessage }}>
+    <WebSocketContext.Provider value={{ ws, lastMessage, sendMessage, subscribe, requestTopics }}>
       {children}
     </WebSocketContext.Provider>
   );
@@ -86,4 +180,63 @@ export function useWebSocket() {
     throw new Error('useWebSocket must be used within a WebSocketProvider');
   }
   return context;
-}
\ No newline at end of file
+}
+
+// Ask the server for the events of these topics while the component is mounted
+export function useSyncTopics(topics: string[]) {
+  const { requestTopics } = useWebSocket();
+  const key = topics.join(',');
+
+  useEffect(() => requestTopics(key.split(',')), [key, requestTopics]);
+}
+
+// Call listener for every sync event on the given topics, including each
+// event of a batch
+export function useSyncMessages(listener: MessageListener, topics: string[]) {
+  const { subscribe } = useWebSocket();
+  const latest = useRef(listener);
+  latest.current = listener;
+  useSyncTopics(topics);
+
+  useEffect(() => subscribe((message) => latest.current(message)), [subscribe]);
+}
+
+// Keep a list of entities in sync by applying the deltas carried on sync
+// events; falls back to refetch() when the server asks for a resync or
+// reports a bulk change
+export function useEntitySync<T extends { id: number }>(
+  entity: string,
+  setItems: React.Dispatch<React.SetStateAction<T[]>>,
+  refetch: () => void,
+  options: { prepend?: boolean; keep?: (item: T) => boolean } = {}
+) {
+  const { subscribe } = useWebSocket();
+  const versions = useRef(new Map<number, number>());
+  useSyncTopics(ENTITY_TOPICS[entity] || [entity]);
+  const latest = useRef({ refetch, options });
+  latest.current = { refetch, options };
+
+  useEffect(() => subscribe((message) => {
+    if (message.type === 'resync_required') {
+      versions.current.clear();
+      latest.current.refetch();
+      return;
+    }
+    const changes: EntityChange[] = (message.changes || []).filter(
+      (change: EntityChange) => change.entity === entity
+    );
+    if (changes.length === 0) return;
+    if (changes.some((change) => change.op === 'reset')) {
+      versions.current.clear();
+      latest.current.refetch();
+      return;
+    }
+    const fresh = takeNewer(changes, versions.current);
+    if (fresh.length === 0) return;
+    const { prepend, keep } = latest.current.options;
+    setItems((items) => {
+      const next = applyChanges(items, fresh, prepend);
+      return keep ? next.filter(keep) : next;
+    });
+  }), [entity, subscribe, setItems]);
+}
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
-import { useWebSocket } from '../context/WebSocketContext';
+import { useEntitySync } from '../context/WebSocketContext';
 import { AlertTriangle, Info, XCircle, CheckCircle, Trash2 } from 'lucide-react';
 
 interface Alert {
@@ -14,17 +14,13 @@ interface Alert {
 export default function Alerts() {
   const [alerts, setAlerts] = useState<Alert[]>([]);
   const [filter, setFilter] = useState('all');
-  const { lastMessage } = useWebSocket();
 
   useEffect(() => {
     fetchAlerts();
   }, []);
 
-  useEffect(() => {
-    if (lastMessage) {
-      fetchAlerts();
-    }
-  }, [lastMessage]);
+  // Newest first, like /api/alerts/
+  useEntitySync<Alert>('alert', setAlerts, () => fetchAlerts(), { prepend: true });
 
   const fetchAlerts = async () => {
     try {
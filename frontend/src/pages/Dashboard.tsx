@@ -1,6 +1,6 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
-import { useWebSocket } from '../context/WebSocketContext';
+import { useEntitySync, useSyncMessages } from '../context/WebSocketContext';
 import { 
   Wifi, UserCheck, UserX, AlertTriangle, RefreshCw, Shield, 
   Activity, TrendingUp, Clock, Bell, Eye, Edit, Trash2, Ban, Check,
@@ -12,6 +12,7 @@ interface Device {
   mac: string;
   ip: string;
   hostname: string;
+  vendor?: string | null;
   role: string;
   status: string;
   last_seen: string;
@@ -64,23 +65,45 @@ export default function Dashboard() {
   const [scanning, setScanning] = useState(false);
   const [activeTab, setActiveTab] = useState<'devices' | 'security' | 'snort' | 'activity'>('devices');
   const [snortLoading, setSnortLoading] = useState(false);
-  const { lastMessage } = useWebSocket();
+  // Job started by handleScan; scan_complete / scan_failed for it end the scan.
+  // Ended jobs are remembered in case the event beats the POST response.
+  const scanJob = useRef<string | null>(null);
+  const endedJobs = useRef(new Set<string>());
 
   useEffect(() => {
     fetchAllData();
   }, []);
 
+  // Device and Snort alert lists follow the deltas on sync events
+  useEntitySync<Device>('device', setDevices, () => fetchDevices());
+  useEntitySync<RecentAlert>('snort_alert', setRecentAlerts, () => fetchSnortData(), {
+    prepend: true,
+    keep: (alert) => !alert.acknowledged
+  });
+
   useEffect(() => {
-    if (lastMessage) {
-      console.log('Received WebSocket message:', lastMessage);
-      if (lastMessage.type === 'scan_complete' || lastMessage.type === 'device_updated') {
-        fetchDevices();
-      }
-      if (lastMessage.type === 'snort_alert' || lastMessage.type === 'snort_update') {
-        fetchSnortData();
-      }
+    setStats({
+      total: devices.length,
+      active: devices.filter((d) => d.status === 'active').length,
+      blocked: devices.filter((d) => d.status === 'blocked').length,
+      kicked: devices.filter((d) => d.status === 'kicked').length
+    });
+  }, [devices]);
+
+  useSyncMessages((message) => {
+    if (message.type === 'scan_complete' || message.type === 'scan_failed') {
+      endedJobs.current.add(message.job_id);
+      finishScan(message.job_id, message.type === 'scan_failed' ? 'failed' : 'completed');
+    }
+    if (message.type === 'resync_required' && scanJob.current) {
+      // The end of the scan may be in the gap: ask for the job once
+      checkScanJob(scanJob.current);
     }
-  }, [lastMessage]);
+    if (message.type === 'snort_alert' || message.type === 'snort_update') {
+      // Only the aggregate counters need the server
+      fetchSnortStats();
+    }
+  }, ['scans', 'snort']);
 
   const fetchAllData = () => {
     fetchDevices();
@@ -90,20 +113,21 @@ export default function Dashboard() {
   const fetchDevices = async () => {
     try {
       const response = await axios.get('/api/devices/');
-      const devicesData = response.data;
-      setDevices(devicesData);
-      
-      const total = devicesData.length;
-      const active = devicesData.filter((d: Device) => d.status === 'active').length;
-      const blocked = devicesData.filter((d: Device) => d.status === 'blocked').length;
-      const kicked = devicesData.filter((d: Device) => d.status === 'kicked').length;
-      
-      setStats({ total, active, blocked, kicked });
+      setDevices(response.data);
     } catch (error) {
       console.error('Failed to fetch devices:', error);
     }
   };
 
+  const fetchSnortStats = async () => {
+    try {
+      const statsResponse = await axios.get('/api/snort/stats');
+      setSnortStats(statsResponse.data);
+    } catch (error) {
+      console.error('Failed to fetch Snort stats:', error);
+    }
+  };
+
   const fetchSnortData = async () => {
     try {
       const statusResponse = await axios.get('/api/snort/status');
@@ -121,14 +145,35 @@ export default function Dashboard() {
     }
   };
 
+  const finishScan = (jobId: string, status: string) => {
+    const ended = status === 'completed' || status === 'failed' || endedJobs.current.has(jobId);
+    if (scanJob.current === jobId && ended) {
+      scanJob.current = null;
+      setScanning(false);
+    }
+  };
+
+  const checkScanJob = async (jobId: string) => {
+    try {
+      const job = await axios.get(`/api/devices/scan/${jobId}`);
+      finishScan(jobId, job.data.status);
+    } catch (error) {
+      console.error('Failed to fetch scan job:', error);
+    }
+  };
+
   const handleScan = async () => {
     setScanning(true);
     try {
-      await axios.post('/api/devices/scan');
+      // Scan runs in the background: its devices_changed deltas update the
+      // list through useEntitySync, and scan_complete / scan_failed end it
+      const response = await axios.post('/api/devices/scan');
+      scanJob.current = response.data.job_id;
+      finishScan(response.data.job_id, response.data.status);
     } catch (error) {
       console.error('Scan failed:', error);
-    } finally {
-      setTimeout(() => setScanning(false), 2000);
+      scanJob.current = null;
+      setScanning(false);
     }
   };
 
@@ -438,7 +483,10 @@ export default function Dashboard() {
                               'bg-orange-500'
                             }`} />
                           </td>
-                          <td className="px-6 py-4 text-sm text-gray-800 font-medium">{device.hostname}</td>
+                          <td className="px-6 py-4 text-sm text-gray-800 font-medium">
+                            {device.hostname}
+                            {device.vendor && <div className="text-xs text-gray-500 font-normal">{device.vendor}</div>}
+                          </td>
                           <td className="px-6 py-4 text-sm text-gray-600 font-mono">{device.ip}</td>
                           <td className="px-6 py-4 text-sm text-gray-600 font-mono">{device.mac}</td>
                           <td className="px-6 py-4">
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
-import { useWebSocket } from '../context/WebSocketContext';
+import { useEntitySync, useSyncMessages } from '../context/WebSocketContext';
 import { 
   Shield, Play, Square, RefreshCw, Settings, CheckCircle, XCircle, 
   AlertTriangle, Plus, Edit, Trash2, Eye, Download, Upload 
@@ -68,7 +68,6 @@ export default function Snort() {
   const [loading, setLoading] = useState(false);
   const [activeTab, setActiveTab] = useState<'overview' | 'alerts' | 'rules'>('overview');
   const [showRuleModal, setShowRuleModal] = useState(false);
-  const { lastMessage } = useWebSocket();
 
   useEffect(() => {
     fetchStatus();
@@ -77,12 +76,15 @@ export default function Snort() {
     fetchRules();
   }, []);
 
-  useEffect(() => {
-    if (lastMessage && (lastMessage.type === 'snort_alert' || lastMessage.type === 'snort_update')) {
-      fetchAlerts();
+  useEntitySync<SnortAlert>('snort_alert', setAlerts, () => fetchAlerts(), { prepend: true });
+
+  useSyncMessages((message) => {
+    if (message.type === 'snort_alert' || message.type === 'snort_update' ||
+        message.type === 'resync_required') {
+      // Alerts arrive as deltas; only the aggregate counters need the server
       fetchStats();
     }
-  }, [lastMessage]);
+  }, ['snort']);
 
   const fetchStatus = async () => {
     try {
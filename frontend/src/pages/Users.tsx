@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
-import { useWebSocket } from '../context/WebSocketContext';
+import { useEntitySync } from '../context/WebSocketContext';
 import { Shield, Ban, UserX, Edit2, Trash2 } from 'lucide-react';
 
 interface Device {
@@ -18,17 +18,12 @@ export default function Users() {
   const [filter, setFilter] = useState('all');
   const [searchTerm, setSearchTerm] = useState('');
   const [editingDevice, setEditingDevice] = useState<Device | null>(null);
-  const { lastMessage } = useWebSocket();
 
   useEffect(() => {
     fetchDevices();
   }, []);
 
-  useEffect(() => {
-    if (lastMessage && (lastMessage.type === 'device_updated' || lastMessage.type === 'device_kicked')) {
-      fetchDevices();
-    }
-  }, [lastMessage]);
+  useEntitySync<Device>('device', setDevices, () => fetchDevices());
 
   const fetchDevices = async () => {
     try {
@@ -0,0 +1,78 @@
+// Entity changes carried by sync events (see backend/sync.py)
+export interface PatchOperation {
+  op: 'add' | 'replace' | 'remove';
+  path: string;
+  value?: any;
+}
+
+export interface EntityChange {
+  entity: string;
+  op: 'upsert' | 'patch' | 'delete' | 'reset';
+  id?: number;
+  version: number;
+  data?: any;
+  patch?: PatchOperation[];
+}
+
+const parsePointer = (path: string) =>
+  path.split('/').slice(1).map((part) => part.replace(/~1/g, '/').replace(/~0/g, '~'));
+
+// Apply RFC 6902 add/replace/remove operations to a copy of an object
+export function applyPatch<T>(target: T, patch: PatchOperation[]): T {
+  const result: any = structuredClone(target);
+  for (const operation of patch) {
+    const keys = parsePointer(operation.path);
+    const last = keys.pop();
+    if (last === undefined) continue;
+    let parent = result;
+    for (const key of keys) {
+      parent = parent?.[key];
+    }
+    if (parent == null) continue;
+    if (operation.op === 'remove') {
+      delete parent[last];
+    } else {
+      parent[last] = operation.value;
+    }
+  }
+  return result;
+}
+
+// Drop changes older than the version already held for their item and
+// record the versions of the rest
+export function takeNewer(changes: EntityChange[], versions: Map<number, number>): EntityChange[] {
+  return changes.filter((change) => {
+    if (change.id === undefined) return true;
+    const seen = versions.get(change.id);
+    if (seen !== undefined && seen >= change.version) return false;
+    versions.set(change.id, change.version);
+    return true;
+  });
+}
+
+// Apply the changes for one entity type to a list without mutating it
+export function applyChanges<T extends { id: number }>(
+  items: T[],
+  changes: EntityChange[],
+  prepend = false
+): T[] {
+  if (changes.length === 0) return items;
+  const next = items.slice();
+  for (const change of changes) {
+    const index = next.findIndex((item) => item.id === change.id);
+    if (change.op === 'delete') {
+      if (index >= 0) next.splice(index, 1);
+    } else if (change.op === 'upsert') {
+      if (index >= 0) {
+        next[index] = change.data;
+      } else if (prepend) {
+        next.unshift(change.data);
+      } else {
+        next.push(change.data);
+      }
+    } else if (change.op === 'patch' && index >= 0 && change.patch) {
+      next[index] = applyPatch(next[index], change.patch);
+    }
+  }
+  return next;
+}